@@ -0,0 +1,234 @@
+"""Benchmark the streaming cleaning path stage by stage against baselines.
+
+Stages mirror clean_open_platform_streaming: parse JSON lines, clean CDC
+records and write partitioned parquet files, chunk by chunk. Each stage
+reports rows/sec, peak RSS and peak traced allocations. Rows/sec is the
+best of repeated runs to reduce noise. Allocations are traced in a
+separate run as tracing slows the stages down.
+
+Every run measures a single stage in a new process, which prepares the
+stage input with the previous stages first. Peak RSS is the growth over
+the RSS holding that input, so it does not carry memory of other stages.
+
+With --check, exits with status 1 when a stage's rows/sec drops more than
+the threshold below its stored baseline. Baselines depend on the machine,
+so update them with --update-baseline on the machine running the checks.
+Checks are refused when records or chunk size differ from the baseline.
+
+Usage: python -m benchmarks.bench_clean_open_platform_stages [--check]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from fixtures.cdc_workload import make_cdc_lines
+from flowaccount.etl.lambdas.clean_open_platform import (
+    PARTITION_COLUMNS, clean_open_platform_cdc)
+from flowaccount.parquet import PartitionedParquetWriter
+from flowaccount.utils import chunked
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "baselines", "clean_open_platform_stages.json"
+)
+
+
+def reset_peak_rss():
+    # Linux only, otherwise peak RSS is the process's high-water mark
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def get_status_mb(field: str) -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def get_rss_mb() -> float:
+    return get_status_mb("VmRSS")
+
+
+def get_peak_rss_mb() -> float:
+    peak = get_status_mb("VmHWM")
+    if peak > 0:
+        return peak
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_stage(chunks: List[List[bytes]]) -> List[List[dict]]:
+    return [[json.loads(line) for line in lines] for lines in chunks]
+
+
+def clean_stage(chunks: List[List[dict]]) -> list:
+    return [clean_open_platform_cdc(records) for records in chunks]
+
+
+def write_stage(chunks: list) -> Dict[str, List[str]]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer = PartitionedParquetWriter(tmp_dir, PARTITION_COLUMNS)
+        for clean_df in chunks:
+            writer.write(clean_df)
+        return writer.close()
+
+
+STAGES: Dict[str, Callable] = {
+    "parse": parse_stage,
+    "clean": clean_stage,
+    "write": write_stage,
+}
+
+
+def prepare_stage(name: str, lines: List[bytes], chunk_size: int):
+    """Get the input of a stage by running the stages before it."""
+
+    data = list(chunked(lines, chunk_size))
+    for stage_name, stage in STAGES.items():
+        if stage_name == name:
+            return data
+        data = stage(data)
+    raise KeyError(name)
+
+
+def run_stage(name: str, options: dict, trace: bool) -> dict:
+    lines = make_cdc_lines(**options["workload"])
+    data = prepare_stage(name, lines, options["chunk_size"])
+    del lines
+    gc.collect()
+
+    reset_peak_rss()
+    start_rss = get_rss_mb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    STAGES[name](data)
+    elapsed = time.perf_counter() - start
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"alloc_peak_mb": peak / 1024 / 1024}
+    return {
+        "rows_per_sec": options["workload"]["count"] / elapsed,
+        "peak_rss_mb": get_peak_rss_mb() - start_rss,
+    }
+
+
+def run_stages(options: dict, trace: bool) -> Dict[str, dict]:
+    # Spawned processes start without memory of the previous stage runs
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in STAGES:
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(run_stage, (name, options, trace))
+    return results
+
+
+def check_baseline(
+    results: Dict[str, dict], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """Get stages whose rows/sec dropped more than threshold below baseline."""
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["rows_per_sec"]
+        if result["rows_per_sec"] < expected * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['rows_per_sec']:,.0f} rows/s is below "
+                f"baseline {expected:,.0f} rows/s by more than {threshold:.0%}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--missing-rate", type=float, default=0.3)
+    parser.add_argument("--extra-rate", type=float, default=0.05)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.check and not args.update_baseline:
+        # Rows/sec of other workloads are not comparable to the baseline
+        expected = (baseline["records"], baseline["chunk_size"])
+        if (args.records, args.chunk_size) != expected:
+            parser.error(
+                f"--check needs --records {expected[0]} --chunk-size "
+                f"{expected[1]} of the baseline, or --update-baseline"
+            )
+
+    options = {
+        "workload": {
+            "count": args.records,
+            "seed": args.seed,
+            "missing_rate": args.missing_rate,
+            "extra_rate": args.extra_rate,
+        },
+        "chunk_size": args.chunk_size,
+    }
+    results = run_stages(options, trace=False)
+    for _ in range(args.repeat - 1):
+        for name, result in run_stages(options, trace=False).items():
+            if result["rows_per_sec"] > results[name]["rows_per_sec"]:
+                results[name] = result
+    for name, traced in run_stages(options, trace=True).items():
+        results[name].update(traced)
+
+    print(f"{args.records:,} records in chunks of {args.chunk_size:,}")
+    print(
+        f"{'stage':>8} {'rows/s':>12} {'baseline':>12} "
+        f"{'peak RSS MB':>12} {'alloc MB':>10}"
+    )
+    for name, result in results.items():
+        expected = baseline["stages"].get(name, {}).get("rows_per_sec", 0)
+        print(
+            f"{name:>8} {result['rows_per_sec']:>12,.0f} {expected:>12,.0f} "
+            f"{result['peak_rss_mb']:>12,.1f} {result['alloc_peak_mb']:>10,.1f}"
+        )
+
+    if args.update_baseline:
+        baseline = {"records": args.records, "chunk_size": args.chunk_size}
+        baseline["stages"] = {
+            name: {metric: round(value, 1) for metric, value in result.items()}
+            for name, result in results.items()
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Updated baseline {args.baseline}")
+
+    if args.check:
+        regressions = check_baseline(results, baseline["stages"], args.threshold)
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
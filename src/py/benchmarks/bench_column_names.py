@@ -0,0 +1,59 @@
+"""Benchmark column renames with ColumnNameTranslator on wide frames.
+
+Usage: python -m benchmarks.bench_column_names [--widths 100 1000] [--repeat 100]
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from flowaccount.utils import KNOWN_COLUMN_NAMES, ColumnNameTranslator
+
+
+def legacy_format_column_name(col: str) -> str:
+    """Reference rename the translator replaced, compiling a regex per call."""
+
+    pattern = re.compile(r"[A-Z]")
+    name = col.rsplit(".", maxsplit=1)[0]
+    lower_words = pattern.split(name)
+    big_chars = pattern.findall(name)
+    words = [t[0] + t[1] for t in zip([""] + big_chars, lower_words)]
+    return ("_").join(words).lower()
+
+
+def make_wide_frame(width: int) -> pd.DataFrame:
+    known = list(KNOWN_COLUMN_NAMES)
+    columns = [
+        f"{known[i % len(known)]}Attr{i}.{'N' if i % 2 else 'S'}" for i in range(width)
+    ]
+    return pd.DataFrame(np.zeros((10, width)), columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--widths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'columns':>8} {'rename ms':>10} {'translator ms':>14} {'speedup':>8}")
+    for width in args.widths:
+        df = make_wide_frame(width)
+        translator = ColumnNameTranslator(KNOWN_COLUMN_NAMES)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            df.rename(columns=legacy_format_column_name)
+        legacy = (time.perf_counter() - start) / args.repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            df.copy(deep=False).columns = translator.translate_columns(df.columns)
+        cached = (time.perf_counter() - start) / args.repeat * 1000
+
+        print(f"{width:>8} {legacy:>10.2f} {cached:>14.2f} {legacy / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark date and time key generation and dim_date validation.
+
+Compares the string based keys previously built by convert_to_fact_table
+with integer arithmetic on datetime64 arrays, then validates the keys
+against a date dimension of ten years held by DateKeySet.
+
+Usage: python -m benchmarks.bench_date_keys [--rows 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from flowaccount.keys import DateKeySet, get_date_keys, get_time_keys
+
+
+def get_string_keys(timestamps: pd.Series):
+    date_key = pd.to_numeric(
+        timestamps.dt.year.astype("str")
+        + timestamps.dt.month.astype("str").str.zfill(2)
+        + timestamps.dt.day.astype("str").str.zfill(2),
+        errors="coerce",
+    )
+    time_key = pd.to_numeric(
+        timestamps.dt.hour.astype("str")
+        + timestamps.dt.minute.astype("str").str.zfill(2)
+        + timestamps.dt.second.astype("str").str.zfill(2),
+        errors="coerce",
+    )
+    return date_key, time_key
+
+
+def get_arithmetic_keys(timestamps: pd.Series):
+    return get_date_keys(timestamps), get_time_keys(timestamps)
+
+
+def make_timestamps(rows: int, seed: int) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2022-01-01").value
+    seconds = rng.integers(0, 3 * 365 * 24 * 3600, size=rows)
+    return pd.Series(pd.to_datetime(start + seconds * 1_000_000_000))
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timestamps = make_timestamps(args.rows, args.seed)
+    expected_date, expected_time = get_string_keys(timestamps)
+    date_keys, time_keys = get_arithmetic_keys(timestamps)
+    assert (date_keys == expected_date).all() and (time_keys == expected_time).all()
+
+    dim_dates = pd.date_range("2020-01-01", "2029-12-31", freq="D")
+    dim_keys = pd.Series(dim_dates.year * 10000 + dim_dates.month * 100 + dim_dates.day)
+    key_set = DateKeySet()
+    key_set.is_valid(date_keys, lambda after_key: dim_keys[dim_keys > after_key])
+
+    results = {
+        "string keys": best_of(lambda: get_string_keys(timestamps), args.repeat),
+        "arithmetic keys": best_of(
+            lambda: get_arithmetic_keys(timestamps), args.repeat
+        ),
+        "dim_date validation": best_of(
+            lambda: key_set.is_valid(date_keys, lambda after_key: []), args.repeat
+        ),
+    }
+
+    print(f"{args.rows:,} timestamps")
+    print(f"{'step':>20} {'seconds':>8} {'rows/s':>14}")
+    for name, elapsed in results.items():
+        print(f"{name:>20} {elapsed:>8.3f} {args.rows / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark exporting HubSpot update inputs of CDC files to S3.
+
+CDC records are cleaned and aggregated to the latest status like
+load_hubspot_streaming, then exported to an in-process moto S3 by:
+
+- legacy: a .loc lookup per company, joined in memory and put at once
+- streaming: inputs built in one pass, written by a multipart upload
+
+Peak memory is traced in a second run, as tracing slows down both.
+
+Usage: python -m benchmarks.bench_hubspot_export [--sizes 100000 1000000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import boto3
+import pandas as pd
+from fixtures.cdc_workload import iter_cdc_records
+from flowaccount.etl.lambdas.clean_open_platform import clean_open_platform_cdc
+from flowaccount.etl.open_platform_status.load_hubspot_streaming import (
+    aggregate_latest_status, convert_to_json_line,
+    convert_to_platform_status_dict, filter_event, filter_platform,
+    iter_hubspot_inputs, write_json_lines)
+from flowaccount.utils import MultipartUploadWriter, chunked
+from moto import mock_aws
+
+BUCKET = "bench-hubspot-svc"
+
+
+def make_latest_status(size: int) -> pd.DataFrame:
+    # Records are cleaned in chunks to keep large workloads in memory
+    cdc_df = pd.concat(
+        [
+            clean_open_platform_cdc(records)
+            for records in chunked(iter_cdc_records(size, extra_rate=0), 100_000)
+        ],
+        ignore_index=True,
+    )
+    cdc_df["hubspot_id"] = (cdc_df["company_id"] + 10**9).astype(str)
+    platform_df, _ = filter_platform(cdc_df)
+    event_df, _ = filter_event(platform_df)
+    return aggregate_latest_status(event_df)
+
+
+def legacy_export(s3, key: str, agg_df: pd.DataFrame) -> int:
+    """Reference implementation building all inputs and the body in memory."""
+
+    inputs = [
+        {
+            "id": company_id,
+            "properties": convert_to_platform_status_dict(agg_df.loc[company_id]),
+        }
+        for company_id in agg_df.index.drop_duplicates()
+    ]
+    body = bytes(convert_to_json_line(inputs).encode("utf-8"))
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    return len(inputs)
+
+
+def streaming_export(s3, key: str, agg_df: pd.DataFrame) -> int:
+    with MultipartUploadWriter(s3, BUCKET, key) as writer:
+        return write_json_lines(writer, iter_hubspot_inputs(agg_df))
+
+
+def measure(func: Callable[[], int]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    count = func()
+    return time.perf_counter() - start, count
+
+
+def measure_peak(func: Callable[[], int]) -> float:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+
+        print(
+            f"{'records':>10} {'inputs':>8} {'method':>10} {'seconds':>8} "
+            f"{'inputs/s':>10} {'peak MiB':>9}"
+        )
+        for size in args.sizes:
+            agg_df = make_latest_status(size)
+            bodies = {}
+            for name, export in [
+                ("legacy", legacy_export),
+                ("streaming", streaming_export),
+            ]:
+                key = f"{name}/{size}.json"
+                elapsed, count = measure(lambda: export(s3, key, agg_df))
+                peak = measure_peak(lambda: export(s3, key, agg_df))
+                bodies[name] = s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+                print(
+                    f"{size:>10,} {count:>8,} {name:>10} {elapsed:>8.2f} "
+                    f"{count / elapsed:>10,.0f} {peak:>9,.1f}"
+                )
+            assert bodies["legacy"] == bodies["streaming"]
+
+
+if __name__ == "__main__":
+    main()
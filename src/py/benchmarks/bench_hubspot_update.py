@@ -0,0 +1,85 @@
+"""Benchmark HubSpot company batch updates against a local stub server.
+
+The stub answers like HubSpot after a fixed latency and rejects requests
+beyond its rate limit with 429. Updates are sent with the HubSpot client:
+
+- sequential: batches of 10 one after another, as hubspot-svc used to
+- concurrent: batches of 100 by concurrent workers within the rate limit
+- unlimited: like concurrent without limiter, relying on 429 retries
+
+Usage: python -m benchmarks.bench_hubspot_update [--inputs 2000]
+"""
+
+import argparse
+from typing import List
+
+import hubspot
+from fixtures.hubspot_stub import HubSpotStub
+from flowaccount.hubspot import BatchUpdater, TokenBucket
+from hubspot.crm.companies import BatchInputSimplePublicObjectBatchInput
+
+
+def make_update(client: hubspot.Client):
+    def update(batch: List[dict]):
+        client.crm.companies.batch_api.update(
+            batch_input_simple_public_object_batch_input=(
+                BatchInputSimplePublicObjectBatchInput(inputs=batch)
+            )
+        )
+
+    return update
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", type=int, default=2_000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    inputs = [
+        {"id": i, "properties": {"lazada_api": "true", "shopee_api": "false"}}
+        for i in range(args.inputs)
+    ]
+    scenarios = {
+        "sequential": dict(batch_size=10, max_workers=1, rate=args.rate),
+        "concurrent": dict(batch_size=100, max_workers=args.workers, rate=args.rate),
+        "unlimited": dict(batch_size=100, max_workers=args.workers, rate=1e6),
+    }
+
+    print(
+        f"{args.inputs:,} inputs, {args.latency * 1000:.0f} ms latency, "
+        f"{args.rate:g} requests/s"
+    )
+    print(
+        f"{'scenario':>10} {'inputs/s':>10} {'elapsed s':>10} {'batches':>8} "
+        f"{'retries':>8} {'p50 ms':>8} {'p95 ms':>8}"
+    )
+    for name, scenario in scenarios.items():
+        with HubSpotStub(
+            latency=args.latency, requests_per_second=args.rate, retry_after=1.0
+        ) as stub:
+            client = hubspot.Client.create(
+                access_token="token", api_factory=stub.api_factory
+            )
+            updater = BatchUpdater(
+                make_update(client),
+                batch_size=scenario["batch_size"],
+                max_workers=scenario["max_workers"],
+                limiter=TokenBucket(scenario["rate"]),
+                max_attempts=10,
+            )
+            report = updater.update_all(inputs)
+
+        assert stub.updated == args.inputs, f"{name} updated {stub.updated} inputs"
+        print(
+            f"{name:>10} {report['inputs_per_sec']:>10,.0f} "
+            f"{report['elapsed']:>10,.2f} {report['batches']:>8,} "
+            f"{report['retries']:>8,} {report['latency_p50'] * 1000:>8,.0f} "
+            f"{report['latency_p95'] * 1000:>8,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Benchmark Lambda handler init time with `python -X importtime`.
+
+Each handler module is imported in a fresh interpreter the way Lambda
+imports it, from its service directory with flowaccount on the path and
+placeholder environment variables, so module level clients are created
+too. Init time is the cumulative import time of the handler module, the
+median of repeated runs. Modules imported by the interpreter at startup
+are left out.
+
+Lightweight handlers must not import heavy dependencies at all. With
+--check, exits with status 1 when a handler imports one of them, or when
+its init time rises more than the threshold above its stored baseline.
+Baselines depend on the machine, so update them with --update-baseline
+on the machine running the checks.
+
+Usage: python -m benchmarks.bench_import_time [--check] [handler ...]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Set
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "import_time.json")
+
+HEAVY_MODULES = {"awswrangler", "hubspot", "numpy", "pandas", "pyarrow", "psycopg2"}
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+ENVIRON_PATTERN = re.compile(r"os\.environ\[[\"'](\w+)[\"']\]")
+
+
+class Handler(NamedTuple):
+    # Handler file relative to src/py, imported from its service directory
+    path: str
+    service_dir: str
+    # Top level packages the handler must not import
+    forbidden: Set[str] = set()
+
+    @property
+    def module(self) -> str:
+        relative = os.path.relpath(self.path, self.service_dir)
+        return relative[: -len(".py")].replace(os.sep, ".")
+
+
+HANDLERS: Dict[str, Handler] = {
+    "export_table": Handler(
+        "etl/open_platform_status/handlers/export_table.py",
+        "etl/open_platform_status",
+        HEAVY_MODULES,
+    ),
+    "parse_export_manifest": Handler(
+        "etl/open_platform_status/handlers/parse_export_manifest.py",
+        "etl/open_platform_status",
+        HEAVY_MODULES,
+    ),
+    "forward_dynamodb_cdc": Handler(
+        "etl/forward_dynamodb_cdc/handler.py",
+        "etl/forward_dynamodb_cdc",
+        HEAVY_MODULES,
+    ),
+    "hubspot_svc": Handler(
+        "etl/hubspot-svc/handler.py",
+        "etl/hubspot-svc",
+        HEAVY_MODULES - {"hubspot"},
+    ),
+    "compact_open_platform_streaming": Handler(
+        "etl/open_platform_status/handlers/compact_open_platform_streaming.py",
+        "etl/open_platform_status",
+        HEAVY_MODULES,
+    ),
+    "load_coupon_to_dimension": Handler(
+        "etl/subscription/handlers/load_coupon_to_dimension.py",
+        "etl/subscription",
+        HEAVY_MODULES - {"psycopg2"},
+    ),
+    "load_coupon_to_fact": Handler(
+        "etl/subscription/handlers/load_coupon_to_fact.py",
+        "etl/subscription",
+        HEAVY_MODULES - {"psycopg2"},
+    ),
+    "clean_open_platform_streaming": Handler(
+        "etl/open_platform_status/handlers/clean_open_platform_streaming.py",
+        "etl/open_platform_status",
+        {"hubspot", "psycopg2"},
+    ),
+    "load_redshift_streaming": Handler(
+        "etl/open_platform_status/handlers/load_redshift_streaming.py",
+        "etl/open_platform_status",
+        {"hubspot", "psycopg2"},
+    ),
+    "load_hubspot_streaming": Handler(
+        "etl/open_platform_status/handlers/load_hubspot_streaming.py",
+        "etl/open_platform_status",
+        {"psycopg2"},
+    ),
+}
+
+
+class ImportProfile(NamedTuple):
+    init_ms: float
+    # Cumulative import time of each top level package imported
+    packages: Dict[str, float]
+
+
+def get_environment(handler: Handler) -> Dict[str, str]:
+    """Get placeholder values of the variables the handler reads at import."""
+
+    with open(os.path.join(SRC_ROOT, handler.path)) as f:
+        names = ENVIRON_PATTERN.findall(f.read())
+
+    env = dict(os.environ)
+    env.update({name: "1" for name in names})
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env["PYTHONPATH"] = SRC_ROOT
+    return env
+
+
+def parse_import_time(stderr: str, module: str) -> ImportProfile:
+    init_ms = None
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+
+        # Modules imported by the interpreter at startup are reported up to
+        # site, so only the handler's own imports are counted
+        if len(indent) == 1 and name == "site":
+            packages = {}
+            continue
+
+        package = name.split(".")[0]
+        if len(indent) == 1 and name == module:
+            init_ms = int(cumulative) / 1000
+        if package != module.split(".")[0]:
+            packages[package] = max(packages.get(package, 0), int(cumulative) / 1000)
+
+    if init_ms is None:
+        raise ValueError(f"Import of {module} not found in -X importtime output")
+    return ImportProfile(init_ms, packages)
+
+
+def profile_import(handler: Handler) -> ImportProfile:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {handler.module}"],
+        cwd=os.path.join(SRC_ROOT, handler.service_dir),
+        env=get_environment(handler),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {handler.path}:\n{result.stderr}")
+    return parse_import_time(result.stderr, handler.module)
+
+
+def check_handler(
+    name: str,
+    init_ms: float,
+    packages: Set[str],
+    baseline: Dict[str, float],
+    threshold: float,
+) -> List[str]:
+    """Get regressions of a handler against its forbidden packages and baseline."""
+
+    regressions = []
+    imported = sorted(HANDLERS[name].forbidden & packages)
+    if len(imported) > 0:
+        regressions.append(f"{name}: imports {', '.join(imported)} at init")
+
+    expected = baseline.get(name)
+    if expected is not None and init_ms > expected * (1 + threshold):
+        regressions.append(
+            f"{name}: init {init_ms:,.0f} ms is above baseline "
+            f"{expected:,.0f} ms by more than {threshold:.0%}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("handlers", nargs="*", help=", ".join(HANDLERS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        baseline = {}
+
+    names = args.handlers or list(HANDLERS)
+    unknown = set(names) - set(HANDLERS)
+    if len(unknown) > 0:
+        parser.error(f"unknown handlers: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'handler':>32} {'init ms':>9} {'baseline':>9}  heaviest packages")
+    for name in names:
+        profiles = [profile_import(HANDLERS[name]) for _ in range(args.repeat)]
+        init_ms = statistics.median(profile.init_ms for profile in profiles)
+        packages = profiles[0].packages
+        results[name] = (init_ms, set(packages))
+
+        heaviest = sorted(packages, key=packages.get, reverse=True)[: args.top]
+        expected = baseline.get("handlers", {}).get(name, 0)
+        print(
+            f"{name:>32} {init_ms:>9,.0f} {expected:>9,.0f}  "
+            + ", ".join(f"{package} {packages[package]:,.0f}" for package in heaviest)
+        )
+
+    if args.update_baseline:
+        baseline.setdefault("handlers", {}).update(
+            {name: round(init_ms, 1) for name, (init_ms, _) in results.items()}
+        )
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Updated baseline {args.baseline}")
+
+    if args.check:
+        regressions = [
+            regression
+            for name, (init_ms, packages) in results.items()
+            for regression in check_handler(
+                name, init_ms, packages, baseline.get("handlers", {}), args.threshold
+            )
+        ]
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
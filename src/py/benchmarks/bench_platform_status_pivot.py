@@ -0,0 +1,138 @@
+"""Benchmark the open platform status pivot against the groupby lambdas.
+
+Usage: python -m benchmarks.bench_platform_status_pivot [--sizes 10000 100000]
+"""
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdtest
+from flowaccount.etl.open_platform_status.load_hubspot import (
+    aggregate_open_platform_status, convert_to_hubspot_inputs)
+from flowaccount.etl.open_platform_status.platforms import platforms
+
+
+def make_platform_status(
+    companies: int, seed: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Make connections of companies, 1 to 3 each, and their HubSpot IDs."""
+
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, 4, size=companies)
+    names = [platform.source_name for platform in platforms] + ["grab"]
+    platform_df = pd.DataFrame(
+        {
+            "company_id": np.repeat(np.arange(companies), counts),
+            "platform_name": rng.choice(names, size=counts.sum()),
+            "is_delete": rng.random(counts.sum()) < 0.2,
+        }
+    )
+    hubspot_df = pd.DataFrame(
+        {"id": np.arange(companies), "hubspot_id": np.arange(companies) + 10**9}
+    )
+    return platform_df, hubspot_df
+
+
+def measure(func: Callable, *args) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'companies':>10} {'step':>8} {'legacy s':>10} {'pivot s':>10} "
+        f"{'speedup':>8}"
+    )
+    for size in args.sizes:
+        platform_df, hubspot_df = make_platform_status(size)
+
+        legacy_agg, legacy_df = measure(
+            legacy_aggregate_open_platform_status, platform_df, hubspot_df
+        )
+        pivot_agg, agg_df = measure(
+            aggregate_open_platform_status, platform_df, hubspot_df
+        )
+        pdtest.assert_frame_equal(agg_df, legacy_df, check_dtype=False)
+
+        legacy_convert, legacy_inputs = measure(
+            legacy_convert_to_hubspot_inputs, agg_df
+        )
+        pivot_convert, inputs = measure(convert_to_hubspot_inputs, agg_df)
+        assert inputs == legacy_inputs
+
+        for step, legacy, pivot in [
+            ("agg", legacy_agg, pivot_agg),
+            ("convert", legacy_convert, pivot_convert),
+        ]:
+            print(
+                f"{size:>10,} {step:>8} {legacy:>10,.3f} {pivot:>10,.3f} "
+                f"{legacy / pivot:>7.1f}x"
+            )
+
+
+def legacy_aggregate_open_platform_status(
+    platform_df: pd.DataFrame, hubspot_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Reference implementation with a lambda per platform and group."""
+
+    def has_connection(platform: str):
+        return lambda x: platform in set(x)
+
+    connected_df = platform_df[~platform_df["is_delete"]]
+    merge_df = hubspot_df.merge(
+        connected_df, how="left", left_on="id", right_on="company_id"
+    )
+    merge_df = merge_df[["hubspot_id", "platform_name"]]
+    agg_df = merge_df.groupby("hubspot_id").agg(
+        has_lazada_connection=pd.NamedAgg(
+            column="platform_name", aggfunc=has_connection("lazada")
+        ),
+        has_shopee_connection=pd.NamedAgg(
+            column="platform_name", aggfunc=has_connection("shopee")
+        ),
+        has_kcash_connection=pd.NamedAgg(
+            column="platform_name", aggfunc=has_connection("kcash")
+        ),
+        has_foodstory_connection=pd.NamedAgg(
+            column="platform_name", aggfunc=has_connection("foodstory")
+        ),
+    )
+    return agg_df.reset_index()
+
+
+def legacy_convert_to_hubspot_inputs(df: pd.DataFrame) -> List[dict]:
+    """Reference implementation mapping each status column to yes or no."""
+
+    yes_no = {True: "yes", False: "no"}
+    return [
+        {
+            "id": hubspot_id,
+            "properties": {
+                "foodstory_api": foodstory,
+                "k_cash_connect_api": kcash,
+                "lazada_api": lazada,
+                "shopee_api": shopee,
+            },
+        }
+        for hubspot_id, foodstory, kcash, lazada, shopee in zip(
+            df["hubspot_id"],
+            df["has_foodstory_connection"].map(yes_no),
+            df["has_kcash_connection"].map(yes_no),
+            df["has_lazada_connection"].map(yes_no),
+            df["has_shopee_connection"].map(yes_no),
+        )
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark reading DynamoDB export data files with different worker counts.
+
+Files are served by an in-process moto S3, with --latency seconds added to
+every GetObject to stand in for S3 first-byte latency. Set --endpoint-url to
+run against a local S3 stand-in such as MinIO instead.
+
+Usage: python -m benchmarks.bench_read_exported_files [--workers 1 4 8 16]
+"""
+
+import argparse
+import gzip
+import json
+import time
+
+import boto3
+import pandas as pd
+from fixtures.cdc_workload import iter_cdc_records
+from flowaccount.etl.open_platform_status.clean_open_platform import \
+    read_exported_files
+from moto import mock_aws
+
+BUCKET = "bench-export"
+PREFIX = "dynamodb/tables/flowaccount-open-platform-company-user-v2/data"
+
+
+def make_export_file(items: int, seed: int) -> bytes:
+    lines = []
+    for record in iter_cdc_records(items, seed=seed, event_mix={"INSERT": 1}):
+        lines.append(json.dumps({"Item": record["dynamodb"]["NewImage"]}))
+    return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+def run(args: argparse.Namespace):
+    s3 = boto3.client("s3", endpoint_url=args.endpoint_url)
+    if args.latency > 0:
+        s3.meta.events.register(
+            "after-call.s3.GetObject", lambda **kwargs: time.sleep(args.latency)
+        )
+
+    s3.create_bucket(Bucket=BUCKET)
+    keys = []
+    for i in range(args.files):
+        key = f"{PREFIX}/{i:04d}.json.gz"
+        s3.put_object(Bucket=BUCKET, Key=key, Body=make_export_file(args.items, seed=i))
+        keys.append(key)
+
+    files_df = pd.DataFrame({"data_file_s3_key": keys})
+    total = args.files * args.items
+    print(f"{args.files} files of {args.items:,} items, {args.latency}s latency")
+    print(f"{'workers':>8} {'seconds':>8} {'items/s':>10}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        df, _ = read_exported_files(s3, BUCKET, files_df, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert df.shape[0] == total
+        print(f"{workers:>8} {elapsed:>8.2f} {total / elapsed:>10,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--items", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--endpoint-url")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        run(args)
+    else:
+        with mock_aws():
+            run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark loading fact snapshots by INSERT and by staged COPY.
+
+Runs against a local PostgreSQL stand-in for RedShift, e.g.
+`docker run -e POSTGRES_PASSWORD=postgres -p 5432:5432 postgres`, through
+PostgresTableLoader. Absolute numbers differ from RedShift, but the gap
+between row-based INSERTs and bulk COPY shows where the threshold belongs.
+
+Usage: python -m benchmarks.bench_table_loader [--rows 1000 10000 100000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pg8000
+from flowaccount.redshift import PostgresTableLoader
+
+SCHEMA = "bench"
+TABLE = "fact_open_platform_connection"
+
+
+def make_fact_snapshot(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "date_key": 20220301,
+            "time_key": 91500,
+            "company_key": np.arange(1, rows + 1),
+            "platform": rng.choice(["Lazada", "Shopee"], size=rows),
+            "status": rng.random(rows) < 0.3,
+        }
+    )
+
+
+def create_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+    cursor.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.{TABLE} (
+            date_key INTEGER,
+            time_key INTEGER,
+            company_key BIGINT,
+            platform VARCHAR(256),
+            status BOOLEAN
+        )
+        """)
+    conn.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--database", default="postgres")
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default="postgres")
+    args = parser.parse_args()
+
+    conn = pg8000.connect(
+        host=args.host,
+        port=args.port,
+        database=args.database,
+        user=args.user,
+        password=args.password,
+    )
+    create_table(conn)
+
+    print(f"{'rows':>10} {'method':>8} {'seconds':>8} {'rows/s':>10}")
+    for rows in args.rows:
+        df = make_fact_snapshot(rows)
+        for method, copy_min_rows in [("insert", rows + 1), ("copy", 0)]:
+            loader = PostgresTableLoader(copy_min_rows=copy_min_rows)
+            start = time.perf_counter()
+            assert loader.load(df, conn, SCHEMA, TABLE) == method
+            elapsed = time.perf_counter() - start
+            print(f"{rows:>10,} {method:>8} {elapsed:>8.2f} {rows / elapsed:>10,.0f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
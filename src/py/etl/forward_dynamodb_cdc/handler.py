@@ -1,24 +1,20 @@
 import os
 from pathlib import Path
-import urllib.parse
-from unittest import result
+
 import boto3
+from flowaccount.events import S3Object, get_s3_objects
+from flowaccount.utils import map_concurrently
 
 s3 = boto3.client("s3")
 
-src_prefix = os.environ("SRC_PREFIX")
-dst_aws_id = os.environ("DST_AWS_ID")
-dst_bucket = os.environ("DST_BUCKET")
-dst_prefix = os.environ("DST_PREFIX")
+src_prefix = os.environ["SRC_PREFIX"]
+dst_aws_id = os.environ["DST_AWS_ID"]
+dst_bucket = os.environ["DST_BUCKET"]
+dst_prefix = os.environ["DST_PREFIX"]
 
 
-def handle(event, context):
-    src_bucket = event["Records"][0]["s3"]["bucket"]["name"]
-    src_key = urllib.parse.unquote_plus(
-        event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
-    )
-
-    path = Path(src_key)
+def forward(src: S3Object) -> dict:
+    path = Path(src.key)
 
     # Extract partitions and filename from key
     try:
@@ -26,17 +22,17 @@ def handle(event, context):
         partition_cols = path_after_prefix.parent
         filename = path_after_prefix.name
     except ValueError:
-        return {"statusCode": 400, "error": f"Invalid source key {src_key}"}
-    
+        return {"statusCode": 400, "error": f"Invalid source key {src.key}"}
+
     # Construct destination key
     dst_key = str(Path(dst_prefix) / partition_cols / filename)
 
     # Copy file
     result = s3.copy_object(
         Bucket=dst_bucket,
-        Key=f"s3://{dst_bucket}/${dst_key}/",
-        CopySource={"Bucket": src_bucket, "Key": src_key},
-        ExpectedBucketOwner=dst_aws_id
+        Key=dst_key,
+        CopySource={"Bucket": src.bucket, "Key": src.key},
+        ExpectedBucketOwner=dst_aws_id,
     )
 
     return {
@@ -44,5 +40,12 @@ def handle(event, context):
         "destination_bucket": dst_bucket,
         "destination_key": dst_key,
         "etag": result["CopyObjectResult"]["ETag"],
-        "checksum_sha256": result["CopyObjectResult"]["ChecksumSHA256"]
-    }
\ No newline at end of file
+        "checksum_sha256": result["CopyObjectResult"].get("ChecksumSHA256"),
+    }
+
+
+def handle(event, context):
+    # Copy all files in the event concurrently
+    results = map_concurrently(forward, get_s3_objects(event))
+
+    return {"status": 200, "results": results}
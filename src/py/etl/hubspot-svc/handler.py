@@ -1,19 +1,35 @@
-import base64
 import json
 import os
-import urllib.parse
-from typing import List, TypedDict
+from typing import List, Tuple, TypedDict
 
 import boto3
-import hubspot
+from flowaccount.clients import (get_hubspot_client, get_secret,
+                                 invalidate_hubspot_client,
+                                 is_hubspot_auth_failure)
+from flowaccount.events import S3Object, get_s3_objects
+from flowaccount.hubspot import (DEFAULT_MAX_WORKERS,
+                                 DEFAULT_REQUESTS_PER_SECOND, BatchUpdater,
+                                 InputCoalescer, TokenBucket)
+from flowaccount.utils import iter_lines, map_concurrently
 from hubspot.crm.companies import (ApiException,
                                    BatchInputSimplePublicObjectBatchInput)
 
 access_token_arn = os.environ["HUBSPOT_ACCESS_TOKEN_ARN"]
 step_size = int(os.environ["HUBSPOT_BATCH_UPDATE_SIZE"])
+max_workers = int(os.environ.get("HUBSPOT_MAX_WORKERS", str(DEFAULT_MAX_WORKERS)))
+requests_per_second = float(
+    os.environ.get("HUBSPOT_REQUESTS_PER_SECOND", str(DEFAULT_REQUESTS_PER_SECOND))
+)
+
+# Seconds kept after the last batch to write failed inputs
+reserved_seconds = 10.0
 
 s3 = boto3.client("s3")
 
+# Shared by warm invocations, so back to back invocations stay within the
+# private app rate limit too
+limiter = TokenBucket(requests_per_second)
+
 
 class HubspotUpdateInput(TypedDict):
     id: int
@@ -21,48 +37,98 @@ class HubspotUpdateInput(TypedDict):
 
 
 def get_hubspot_token(secret_arn: str):
-    sm = boto3.client("secretsmanager")
-    resp = sm.get_secret_value(SecretId=secret_arn)
-    if "SecretString" in resp:
-        secret = json.loads(resp["SecretString"])
-    else:
-        secret = json.loads(base64.b64decode(resp["SecretBinary"]))
+    return get_secret(secret_arn)["HUBSPOT_ACCESS_TOKEN"]
 
-    return secret["HUBSPOT_ACCESS_TOKEN"]
 
+def update_companies(inputs: List[HubspotUpdateInput]):
+    hs_input = BatchInputSimplePublicObjectBatchInput(inputs=inputs)
 
-def batch_company_update(inputs: List[HubspotUpdateInput]):
-    access_token = get_hubspot_token(access_token_arn)
-    client = hubspot.Client.create(access_token=access_token)
-    row_count = len(inputs)
+    # A rotated token fails with 401, so retry once with a fetched token
+    try:
+        get_hubspot_client(access_token_arn).crm.companies.batch_api.update(
+            batch_input_simple_public_object_batch_input=hs_input
+        )
+    except ApiException as e:
+        if not is_hubspot_auth_failure(e):
+            raise
+        invalidate_hubspot_client(access_token_arn)
+        get_hubspot_client(access_token_arn).crm.companies.batch_api.update(
+            batch_input_simple_public_object_batch_input=hs_input
+        )
 
-    for cur_start in range(0, row_count, step_size):
-        if cur_start + step_size <= row_count:
-            cur_end = cur_start + step_size
-        else:
-            cur_end = row_count
 
-        hs_input = BatchInputSimplePublicObjectBatchInput(
-            inputs=inputs[cur_start:cur_end]
-        )
-        try:
-            client.crm.companies.batch_api.update(
-                batch_input_simple_public_object_batch_input=hs_input
-            )
-        except ApiException as e:
-            print("Exception when calling batch_api->update: %s\n" % e)
+def batch_company_update(
+    inputs: List[HubspotUpdateInput], context=None
+) -> Tuple[dict, List[HubspotUpdateInput]]:
+    """Update companies in concurrent batches within the time left of the
+    invocation, and return a report and the inputs of failed batches."""
 
+    remaining = None
+    if context is not None:
+        remaining = (
+            lambda: context.get_remaining_time_in_millis() / 1000 - reserved_seconds
+        )
 
-def handle(event, context):
-    bucket = event["Records"][0]["s3"]["bucket"]["name"]
-    key = urllib.parse.unquote_plus(
-        event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
+    updater = BatchUpdater(
+        update_companies,
+        batch_size=step_size,
+        max_workers=max_workers,
+        limiter=limiter,
+        remaining=remaining,
     )
-    print(f"s3 create event: s3://{bucket}/{key}")
+    report = updater.update_all(inputs)
+    return report, updater.failed
+
+
+def write_failed_inputs(
+    bucket: str, request_id: str, inputs: List[HubspotUpdateInput]
+) -> str:
+    """Keep failed inputs outside of update/company/ to replay them later."""
+
+    key = f"failed/company/{request_id}.json"
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body="\n".join(json.dumps(update_input) for update_input in inputs).encode(
+            "utf-8"
+        ),
+    )
+    return f"s3://{bucket}/{key}"
+
+
+def read_update_inputs(s3_object: S3Object) -> InputCoalescer:
+    """Stream JSON lines of an update file, merging updates of a company."""
+
+    print(f"s3 create event: {s3_object.uri}")
 
-    obj = s3.get_object(Bucket=bucket, Key=key)["Body"]
-    lines = obj.read().decode("utf-8").split("\n")
-    inputs = [json.loads(line) for line in lines]
+    body = s3.get_object(Bucket=s3_object.bucket, Key=s3_object.key)["Body"]
+    coalescer = InputCoalescer()
+    for line in iter_lines(body):
+        coalescer.add(json.loads(line))
+    return coalescer
 
-    batch_company_update(inputs)
-    return {"status": 200}
+
+def handle(event, context):
+    # Read all update files concurrently, then merge updates of the same
+    # company in the order of files, so the latest properties win
+    s3_objects = get_s3_objects(event)
+    coalescer = InputCoalescer()
+    for file_coalescer in map_concurrently(read_update_inputs, s3_objects):
+        coalescer.merge(file_coalescer)
+
+    report, failed = batch_company_update(coalescer.get_inputs(), context)
+    print(report)
+    # Fail the invocation rather than dropping updates, so the failure is
+    # alarmed and the kept inputs can be copied back to update/company/
+    if report["failed_inputs"] > 0:
+        uri = write_failed_inputs(s3_objects[0].bucket, context.aws_request_id, failed)
+        raise RuntimeError(
+            f"Failed to update {report['failed_inputs']} companies, kept in {uri}"
+        )
+    return {
+        "status": 200,
+        "files": len(s3_objects),
+        "total": coalescer.count,
+        "coalesced": coalescer.coalesced,
+        "report": report,
+    }
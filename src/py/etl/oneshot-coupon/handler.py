@@ -2,10 +2,17 @@ import os
 
 import awswrangler as wr
 import pandas as pd
+from flowaccount.redshift import TableLoader
 
 secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 dbname = os.environ["REDSHIFT_DB"]
 
+# Large frames are staged in S3 and loaded with COPY when both are set
+loader = TableLoader(
+    staging_path=os.environ.get("REDSHIFT_STAGING_PATH"),
+    iam_role=os.environ.get("REDSHIFT_COPY_ROLE_ARN"),
+)
+
 
 def handle(event, context):
     coupon_df = pd.read_parquet("coupon.parquet")
@@ -31,13 +38,6 @@ def handle(event, context):
     )
 
     with wr.redshift.connect(secret_id=secret_arn, dbname=dbname) as conn:
-        wr.redshift.to_sql(
-            coupon_df,
-            schema="dim",
-            table="dim_coupon",
-            mode="append",
-            use_column_names=True,
-            con=conn,
-        )
+        loader.load(coupon_df, conn, "dim", "dim_coupon")
 
     return {"status": 200}
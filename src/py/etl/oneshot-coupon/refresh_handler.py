@@ -1,49 +1,41 @@
-import base64
-import json
 import os
 
-import boto3
-import psycopg2
+from flowaccount.clients import (get_psycopg2_connection,
+                                 invalidate_psycopg2_connection_on_error)
+from flowaccount.etl.subscription.load_coupon_to_fact import (
+    CouponKeyBackfill, fill_coupon_keys)
 
 secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 dbname = os.environ["REDSHIFT_DB"]
-sm = boto3.client("secretsmanager")
 
+# Without an arrival time column, the whole fact is scanned for missing keys
+# on every run
+arrival_column = os.environ.get("REDSHIFT_FACT_ARRIVAL_COLUMN")
 
+
+@invalidate_psycopg2_connection_on_error(secret_arn, "etl")
 def handle(event, context):
-    resp = sm.get_secret_value(SecretId=secret_arn)
-    if "SecretString" in resp:
-        secret = json.loads(resp["SecretString"])
-    else:
-        secret = json.loads(base64.b64decode(resp["SecretBinary"]))
-    host = secret["host"]
-    port = secret["port"]
-    user = secret["username"]
-    password = secret["password"]
-    dbname = "etl"
-
-    with psycopg2.connect(host=host, port=port, dbname=dbname, user=user, password=password) as conn:
+    # Credential and connection are reused by warm invocations every 15 minutes
+    conn = get_psycopg2_connection(secret_arn, "etl")
+
+    if arrival_column:
+        # Shares the watermark of etl.subscriptions with load-coupon-to-fact
+        backfill = CouponKeyBackfill(
+            "etl", "subscriptions", "dim", "dim_coupon", arrival_column
+        )
+        # Scheduled sweeps also fill rows missed by the lookback window
+        result = backfill.run(
+            conn,
+            lambda: context.get_remaining_time_in_millis() > 60_000,
+            sweep=bool((event or {}).get("sweep")),
+        )
+        print(f"Done {result}")
+        return {"status": 200, **result}
+
+    with conn:
         with conn.cursor() as cursor:
-            print("Fill missing coupons")
-            cursor.execute(
-                """
-                UPDATE etl.subscriptions AS f
-                SET
-                coupon_key = 1
-                WHERE f.coupon IS NULL AND f.coupon_key IS NULL;
-            """
-            )
-
-            print("Fill coupon keys")
-            cursor.execute(
-                """
-                UPDATE etl.subscriptions AS f
-                SET
-                    coupon_key = d.coupon_key
-                FROM dim.dim_coupon AS d
-                WHERE f.coupon_key IS NULL AND d.mysql_id = f.coupon;
-            """
-            )
+            print("Fill missing coupons and coupon keys")
+            fill_coupon_keys(cursor, "etl.subscriptions", "dim.dim_coupon")
 
         print("Commit")
         conn.commit()
@@ -1,16 +1,24 @@
 import json
 import os
-import urllib.parse
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import awswrangler as wr
 import boto3
 import pandas as pd
-from flowaccount.utils import format_snake_case
+from botocore.exceptions import ClientError
+from flowaccount.etl.open_platform_status.clean_open_platform import (
+    ExportFileMismatchError, read_exported_file, read_exported_files)
+from flowaccount.events import get_s3_objects
+from flowaccount.utils import chunked, column_names, map_concurrently
 
 s3 = boto3.client("s3")
 clean_bucket = os.environ["CLEAN_BUCKET"]
 clean_catalog = os.environ["CLEAN_CATALOG"]
+read_workers = int(os.environ.get("READ_WORKERS", "8"))
+staging_prefix = "dynamodb/staging/tables"
+quarantine_mismatched = (
+    os.environ.get("QUARANTINE_MISMATCHED_FILES", "false").lower() == "true"
+)
 
 
 def get_manifest_from_event(
@@ -30,7 +38,7 @@ def get_manifest_from_event(
 
 def clean_manifest_summary(manifest_summary: dict) -> pd.DataFrame:
     df = pd.DataFrame([manifest_summary])
-    df = df.rename(columns=format_snake_case)
+    df.columns = column_names.translate_columns(df.columns)
     df = df.astype(
         {
             "version": "string",
@@ -62,7 +70,7 @@ def clean_manifest_summary(manifest_summary: dict) -> pd.DataFrame:
 
 def clean_manifest_files(manifiest_files: List[dict]) -> pd.DataFrame:
     df = pd.DataFrame(manifiest_files)
-    df = df.rename(columns=format_snake_case)
+    df.columns = column_names.translate_columns(df.columns)
     df = df.astype(
         {
             "item_count": "int",
@@ -75,64 +83,23 @@ def clean_manifest_files(manifiest_files: List[dict]) -> pd.DataFrame:
     return df
 
 
-def clean_exported_files(bucket: str, files_df: pd.DataFrame) -> pd.DataFrame:
-    def format_column_name(col: str) -> str:
-        name = col.rsplit(".", maxsplit=1)[0]
-        return format_snake_case(name)
-
-    df_list = [
-        wr.s3.select_query(
-            sql="SELECT * FROM s3object[*]",
-            path=f"s3://{bucket}/{key}",
-            input_serialization="JSON",
-            input_serialization_params={"Type": "Document"},
-            compression="gzip",
-        )
-        for key in files_df["data_file_s3_key"]
-    ]
-
-    df = pd.concat(df_list)
-    df = pd.json_normalize(df["Item"])
+def clean_exported_files(
+    bucket: str, files_df: pd.DataFrame
+) -> Tuple[pd.DataFrame, List[ExportFileMismatchError]]:
+    # Stream gzip export files concurrently, decoding items into typed columns
+    # and verifying them against the manifest
+    df, mismatches = read_exported_files(
+        s3,
+        bucket,
+        files_df,
+        max_workers=read_workers,
+        skip_mismatched=quarantine_mismatched,
+    )
 
-    # Rename columns e.g. companyId.N --> company_id
-    df = df.rename(columns=format_column_name)
+    return clean_exported_table(df), mismatches
 
-    # Convert string to int dtype
-    for col in [
-        "company_id",
-        "payment_channel_id",
-        "payment_channel_id",
-        "expires_in",
-        "refresh_expires_in",
-        "user_id",
-    ]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    # Enforce data types
-    df = df.astype(
-        {
-            "company_id": "Int64",
-            "shop_id": "string",
-            "platform_info": "string",
-            "is_delete": "bool",
-            # 'expired_at': 'int64',
-            "payment_channel_id": "Int64",
-            # 'created_at': 'int64',
-            "expires_in": "Int64",
-            "is_vat": "bool",
-            "payload": "string",
-            "guid": "string",
-            "refresh_expires_in": "Int64",
-            "user_id": "Int64",
-            # 'updated_at': 'int64',
-            "platform_name": "string",
-            "refresh_token": "string",
-            "remarks": "string",
-            "access_token": "string",
-            "email": "string",
-        }
-    )
 
+def clean_exported_table(df: pd.DataFrame) -> pd.DataFrame:
     # Clean platform names
     df["platform_name"] = df["platform_name"].map(
         {
@@ -144,11 +111,6 @@ def clean_exported_files(bucket: str, files_df: pd.DataFrame) -> pd.DataFrame:
         }
     )
 
-    # Convert datetime string to datetime64
-    df["expired_at"] = pd.to_datetime(df["expired_at"], unit="s")
-    df["created_at"] = pd.to_datetime(df["created_at"], unit="s")
-    df["updated_at"] = pd.to_datetime(df["updated_at"], unit="s")
-
     # NOTE: Pandas cannot write timedelta to parquet files. It needs 'fastparquet' engine.
     # records['expires_in'] = pd.to_timedelta(records['expires_in'], unit='s')
     # records['refresh_expires_in'] = pd.to_timedelta(records['refresh_expires_in'], unit='s')
@@ -156,19 +118,51 @@ def clean_exported_files(bucket: str, files_df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def handle(event, context):
-    # Extract S3 file URI
-    bucket = event["Records"][0]["s3"]["bucket"]["name"]
-    key = urllib.parse.unquote_plus(
-        event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
+def quarantine_files(
+    bucket: str, mismatches: List[ExportFileMismatchError], table: str, export_id: str
+) -> List[str]:
+    """Copy export data files not matching the manifest aside for inspection."""
+
+    paths = []
+    for mismatch in mismatches:
+        print(f"Quarantine mismatched file: {mismatch}")
+        file_name = mismatch.key.rsplit("/", maxsplit=1)[-1]
+        key = f"dynamodb/quarantine/{table}/{export_id}/{file_name}"
+        s3.copy_object(
+            Bucket=clean_bucket,
+            Key=key,
+            CopySource={"Bucket": bucket, "Key": mismatch.key},
+        )
+        paths.append(f"s3://{clean_bucket}/{key}")
+    return paths
+
+
+def write_manifest(
+    summary_df: pd.DataFrame, files_df: pd.DataFrame, export_id: str
+) -> Dict[str, List[str]]:
+    # Write manifest summary
+    print(f"Write cleaned manifest summary: {export_id}")
+    cleaned_s3_summary = wr.s3.to_parquet(
+        df=summary_df,
+        path=f"s3://{clean_bucket}/dynamodb/manifest/summary/{export_id}.parquet",
     )
-    print(f"s3 create event: s3://{bucket}/{key}")
 
-    # Check S3 file firing the event
-    if key.rsplit("/", maxsplit=1)[1] != "manifest-summary.json":
-        return {"statusCode": 400, "error": "Invalid file trigger"}
+    # Write manifest files
+    print("Write cleaned manifest files")
+    cleaned_s3_files = wr.s3.to_parquet(
+        df=files_df,
+        path=f"s3://{clean_bucket}/dynamodb/manifest/files/{export_id}.parquet",
+    )
+
+    return {
+        "manifest_summary": cleaned_s3_summary["paths"],
+        "manifest_files": cleaned_s3_files["paths"],
+    }
+
+
+def clean_export(bucket: str, summary_key: str) -> Dict[str, List[str]]:
+    """Clean a DynamoDB export and its manifest to the clean bucket."""
 
-    summary_key = key
     manifest_summary, manifest_files = get_manifest_from_event(bucket, summary_key)
 
     # Clean manifest summary
@@ -186,26 +180,13 @@ def handle(event, context):
 
     # Clean exported open platform table
     print("Clean table")
-    table_df = clean_exported_files(bucket, files_df)
+    table_df, mismatches = clean_exported_files(bucket, files_df)
     table_df["export_id"] = export_id
 
-    # Create Glue database catalog if not exists
-    databases = wr.catalog.databases()
-    if clean_catalog not in databases.values:
-        wr.catalog.create_database(clean_catalog)
-
-    # Write manifest summary
-    print(f"Write cleaned manifest summary: {export_id}")
-    cleaned_s3_summary = wr.s3.to_parquet(
-        df=summary_df,
-        path=f"s3://{clean_bucket}/dynamodb/manifest/summary/{export_id}.parquet",
-    )
-
-    # Write manifest files
-    print("Write cleaned manifest files")
-    cleaned_s3_files = wr.s3.to_parquet(
-        df=files_df,
-        path=f"s3://{clean_bucket}/dynamodb/manifest/files/{export_id}.parquet",
+    # Quarantine files failing verification, their items are left out
+    quarantined = quarantine_files(bucket, mismatches, table, export_id)
+    files_df["quarantined"] = files_df["data_file_s3_key"].isin(
+        [mismatch.key for mismatch in mismatches]
     )
 
     # Write table records
@@ -215,11 +196,198 @@ def handle(event, context):
         path=f"s3://{clean_bucket}/dynamodb/tables/{table}/{export_id}.parquet",
     )
 
+    # Write manifest last, so loaders never see a partially cleaned export
+    result = write_manifest(summary_df, files_df, export_id)
+    result["table"] = cleaned_s3_table["paths"]
+    result["quarantined"] = quarantined
+
+    return result
+
+
+def clean_export_file(
+    bucket: str, table: str, export_id: str, export_file: dict
+) -> Dict[str, Optional[str]]:
+    """Clean one export data file into a staged parquet part."""
+
+    data_file_key = export_file["data_file_s3_key"]
+    print(f"Clean export file: {data_file_key}")
+    try:
+        df = read_exported_file(
+            s3,
+            bucket,
+            data_file_key,
+            md5_checksum=export_file.get("md5_checksum"),
+            item_count=export_file.get("item_count"),
+        )
+    except ExportFileMismatchError as mismatch:
+        if not quarantine_mismatched:
+            raise
+        (quarantined,) = quarantine_files(bucket, [mismatch], table, export_id)
+        return {
+            "data_file_s3_key": data_file_key,
+            "path": None,
+            "quarantined": quarantined,
+        }
+
+    df = clean_exported_table(df)
+    df["export_id"] = export_id
+
+    file_name = data_file_key.rsplit("/", maxsplit=1)[-1].split(".")[0]
+    staged_key = f"{staging_prefix}/{table}/{export_id}/{file_name}.parquet"
+    staged_s3_part = wr.s3.to_parquet(df=df, path=f"s3://{clean_bucket}/{staged_key}")
+
     return {
-        "statusCode": 200,
-        "results": {
-            "manifest_summary": cleaned_s3_summary["paths"],
-            "manifest_files": cleaned_s3_files["paths"],
-            "table": cleaned_s3_table["paths"],
-        },
+        "data_file_s3_key": data_file_key,
+        "path": staged_s3_part["paths"][0],
+        "quarantined": None,
     }
+
+
+def object_exists(bucket: str, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise e
+    return True
+
+
+def publish_export_parts(
+    table: str, export_id: str, part_paths: List[str]
+) -> List[str]:
+    """Move staged parts next to whole export files of the table.
+
+    Parts are copied within S3, so publishing does not depend on table size.
+    Loaders read an export by its `{export_id}` prefix, which matches both
+    `{export_id}.parquet` and `{export_id}-part-NNNNN.parquet`.
+
+    Staged parts are deleted only after every part is copied, and parts
+    already published by a previous attempt are skipped, so a failed
+    finalize can be retried.
+    """
+
+    def publish(item: Tuple[int, str]) -> Tuple[str, Optional[str]]:
+        index, path = item
+        staged_key = path[len(f"s3://{clean_bucket}/") :]
+        key = f"dynamodb/tables/{table}/{export_id}-part-{index:05d}.parquet"
+        try:
+            s3.copy_object(
+                Bucket=clean_bucket,
+                Key=key,
+                CopySource={"Bucket": clean_bucket, "Key": staged_key},
+            )
+        except ClientError as e:
+            missing = e.response["Error"]["Code"] in ("404", "NoSuchKey")
+            if not missing or not object_exists(clean_bucket, key):
+                raise e
+            print(f"Skip published part: {key}")
+            return f"s3://{clean_bucket}/{key}", None
+        return f"s3://{clean_bucket}/{key}", staged_key
+
+    published = map_concurrently(publish, list(enumerate(part_paths)))
+
+    staged_keys = [staged_key for _, staged_key in published if staged_key]
+    for keys in chunked(staged_keys, 1000):
+        response = s3.delete_objects(
+            Bucket=clean_bucket,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        if response.get("Errors"):
+            raise RuntimeError(f"Failed to delete staged parts: {response['Errors']}")
+
+    return [path for path, _ in published]
+
+
+def handle(event, context):
+    # Extract S3 file URIs, one export per manifest summary
+    summary_objects = []
+    for s3_object in get_s3_objects(event):
+        print(f"s3 create event: {s3_object.uri}")
+
+        # Check S3 file firing the event
+        if s3_object.key.rsplit("/", maxsplit=1)[-1] == "manifest-summary.json":
+            summary_objects.append(s3_object)
+
+    if len(summary_objects) == 0:
+        return {"statusCode": 400, "error": "Invalid file trigger"}
+
+    # Create Glue database catalog if not exists
+    databases = wr.catalog.databases()
+    if clean_catalog not in databases.values:
+        wr.catalog.create_database(clean_catalog)
+
+    # Exports are cleaned one after another as each of them is loaded
+    # into memory as a whole
+    results = [
+        clean_export(summary_object.bucket, summary_object.key)
+        for summary_object in summary_objects
+    ]
+
+    return {"statusCode": 200, "results": results}
+
+
+def handle_file(event, context):
+    """Clean one export data file, e.g. in a Map state over parsed manifest.
+
+    The event is an item of `export_files` of parse_export_manifest with
+    `bucket`, `export_id` and `table_name` of the export.
+    """
+
+    result = clean_export_file(
+        event["bucket"], event["table_name"], event["export_id"], event
+    )
+
+    return {"statusCode": 200, **result}
+
+
+def handle_finalize(event, context):
+    """Write the manifest tables and publish cleaned parts of an export.
+
+    The event has `bucket` and `manifest_summary_key` of the export and the
+    results of handle_file for every export data file in `files`.
+    """
+
+    manifest_summary, manifest_files = get_manifest_from_event(
+        event["bucket"], event["manifest_summary_key"]
+    )
+    summary_df = clean_manifest_summary(manifest_summary)
+    export_id = summary_df["export_id"][0]
+    table = summary_df["table"][0]
+
+    files_df = clean_manifest_files(manifest_files)
+    files_df["export_id"] = export_id
+
+    # Every export data file must have been cleaned or quarantined
+    results = {result["data_file_s3_key"]: result for result in event["files"]}
+    missing = set(files_df["data_file_s3_key"]).difference(results)
+    if len(missing) > 0:
+        raise ValueError(f"Export files are not cleaned: {sorted(missing)}")
+
+    file_results = [results[key] for key in files_df["data_file_s3_key"]]
+    files_df["quarantined"] = [
+        result["quarantined"] is not None for result in file_results
+    ]
+
+    print(f"Publish cleaned table: {table}")
+    table_paths = publish_export_parts(
+        table,
+        export_id,
+        [result["path"] for result in file_results if result["path"] is not None],
+    )
+
+    # Write manifest last, so loaders never see a partially cleaned export
+    response = write_manifest(summary_df, files_df, export_id)
+    response.update(
+        {
+            "statusCode": 200,
+            "export_id": export_id,
+            "table": table_paths,
+            "quarantined": [
+                result["quarantined"]
+                for result in file_results
+                if result["quarantined"] is not None
+            ],
+        }
+    )
+    return response
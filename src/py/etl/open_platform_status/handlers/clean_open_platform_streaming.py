@@ -1,35 +1,142 @@
 import json
 import os
-import urllib.parse
+import tempfile
+from typing import Dict, Iterator, List
 
 import awswrangler as wr
 import boto3
-from flowaccount.etl.lambdas.clean_open_platform import clean_open_platform_cdc
+import pandas as pd
+from flowaccount.etl.lambdas.clean_open_platform import (
+    PARTITION_COLUMNS, clean_open_platform_cdc, collapse_latest_images,
+    drop_duplicate_events)
+from flowaccount.events import S3Object, get_s3_objects
+from flowaccount.parquet import PartitionedParquetWriter
+from flowaccount.utils import chunked
 
 s3 = boto3.client("s3")
 clean_bucket = os.environ["CLEAN_BUCKET"]
 clean_catalog = os.environ["CLEAN_CATALOG"]
+chunk_size = int(os.environ.get("CHUNK_SIZE", "10000"))
+collapse_cdc = os.environ.get("COLLAPSE_CDC", "false").lower() == "true"
+
+table_prefix = "dynamodb/streaming/tables/flowaccount-open-platform-company-user-v2"
+catalog_table = "dynamodb_streaming_flowaccount-open-platform-company-user-v2"
+
+latest_prefix = "dynamodb/streaming/latest/flowaccount-open-platform-company-user-v2"
+latest_catalog_table = (
+    "dynamodb_streaming_latest_flowaccount-open-platform-company-user-v2"
+)
+
+
+def iter_cdc_lines(cdc_objects: List[S3Object]) -> Iterator[bytes]:
+    for cdc_object in cdc_objects:
+        cdc_obj = s3.get_object(Bucket=cdc_object.bucket, Key=cdc_object.key)
+        for line in cdc_obj["Body"].iter_lines():
+            if line:
+                yield line
+
+
+def upload_dataset(
+    tmp_dir: str,
+    files: Dict[str, List[str]],
+    prefix: str,
+    table: str,
+    columns_types: Dict[str, str],
+    partitions_types: Dict[str, str],
+) -> List[str]:
+    """Upload partition files and register them in Glue catalog."""
+
+    # Upload partition files
+    partitions_values = {}
+    for path, values in files.items():
+        s3.upload_file(os.path.join(tmp_dir, path), clean_bucket, f"{prefix}/{path}")
+        partition_path = path.rsplit("/", maxsplit=1)[0]
+        partitions_values[f"s3://{clean_bucket}/{prefix}/{partition_path}/"] = values
+
+    # Register new columns and partitions in Glue catalog
+    if len(partitions_values) > 0:
+        wr.catalog.create_parquet_table(
+            database=clean_catalog,
+            table=table,
+            path=f"s3://{clean_bucket}/{prefix}/",
+            columns_types=columns_types,
+            partitions_types=partitions_types,
+            compression="snappy",
+            mode="append",
+        )
+        wr.catalog.add_parquet_partitions(
+            database=clean_catalog,
+            table=table,
+            partitions_values=partitions_values,
+            compression="snappy",
+        )
+
+    return [f"s3://{clean_bucket}/{prefix}/{path}" for path in files]
 
 
 def handle(event, context):
-    bucket = event["Records"][0]["s3"]["bucket"]["name"]
-    key = urllib.parse.unquote_plus(
-        event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
-    )
-
-    cdc_obj = s3.get_object(Bucket=bucket, Key=key)
-    cdc_lines = cdc_obj["Body"].read().decode("utf-8").splitlines()
-    cdc_list = [json.loads(line) for line in cdc_lines]
-
-    clean_df = clean_open_platform_cdc(cdc_list)
-    wr.s3.to_parquet(
-        clean_df,
-        path=f"s3://{clean_bucket}/dynamodb/streaming/tables/flowaccount-open-platform-company-user-v2",
-        dataset=True,
-        database=clean_catalog,
-        table="dynamodb_streaming_flowaccount-open-platform-company-user-v2",
-        partition_cols=["year", "month"],
-    )
-
-    response = {"statusCode": 200}
+    cdc_objects = get_s3_objects(event)
+
+    # Stream the CDC objects and clean them chunk by chunk, so memory usage
+    # depends on the chunk size rather than the object sizes. All objects
+    # in the event are merged into the same partition files.
+    cdc_lines = iter_cdc_lines(cdc_objects)
+
+    columns_types, partitions_types = {}, {}
+    seen_event_ids, latest_dfs, total = set(), [], 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer = PartitionedParquetWriter(
+            os.path.join(tmp_dir, "changes"), PARTITION_COLUMNS
+        )
+        for lines in chunked(cdc_lines, chunk_size):
+            clean_df = clean_open_platform_cdc([json.loads(line) for line in lines])
+            total += clean_df.shape[0]
+
+            # Optionally drop duplicate events and keep latest images aside
+            if collapse_cdc:
+                clean_df = drop_duplicate_events(clean_df, seen_event_ids)
+                latest_dfs.append(collapse_latest_images(clean_df))
+
+            writer.write(clean_df)
+
+            chunk_columns_types, partitions_types = wr.catalog.extract_athena_types(
+                clean_df, index=False, partition_cols=PARTITION_COLUMNS
+            )
+            columns_types.update(chunk_columns_types)
+        files = writer.close()
+
+        paths = upload_dataset(
+            writer.root,
+            files,
+            table_prefix,
+            catalog_table,
+            columns_types,
+            partitions_types,
+        )
+
+        latest_paths = []
+        if len(latest_dfs) > 0:
+            latest_df = collapse_latest_images(pd.concat(latest_dfs))
+            latest_writer = PartitionedParquetWriter(
+                os.path.join(tmp_dir, "latest"), PARTITION_COLUMNS
+            )
+            latest_writer.write(latest_df)
+            latest_paths = upload_dataset(
+                latest_writer.root,
+                latest_writer.close(),
+                latest_prefix,
+                latest_catalog_table,
+                columns_types,
+                partitions_types,
+            )
+
+    response = {
+        "statusCode": 200,
+        "sources": [cdc_object.uri for cdc_object in cdc_objects],
+        "total": total,
+        "duplicates": total - writer.row_count,
+        "paths": paths,
+    }
+    if collapse_cdc:
+        response["latest_paths"] = latest_paths
     return response
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+import boto3
+from flowaccount.compaction import (COMPACTED_DIR, DEFAULT_TARGET_FILE_SIZE,
+                                    compact_partition, list_late_files)
+
+s3 = boto3.client("s3")
+glue = boto3.client("glue")
+clean_catalog = os.environ["CLEAN_CATALOG"]
+target_file_size = int(
+    os.environ.get("TARGET_FILE_SIZE", str(DEFAULT_TARGET_FILE_SIZE))
+)
+
+catalog_table = "dynamodb_streaming_flowaccount-open-platform-company-user-v2"
+sort_by = ["company_id", "approximate_creation_date_time"]
+
+
+def get_closed_partitions() -> list:
+    """Get year and month partitions to compact before the current month.
+
+    These are the partitions which were never compacted, and compacted ones
+    with files written to their Hive directory since, e.g. late or replayed
+    files of an older month.
+    """
+
+    now = datetime.utcnow()
+    table = glue.get_table(DatabaseName=clean_catalog, Name=catalog_table)["Table"]
+    table_location = table["StorageDescriptor"]["Location"].rstrip("/")
+
+    partitions = []
+    paginator = glue.get_paginator("get_partitions")
+    for page in paginator.paginate(DatabaseName=clean_catalog, TableName=catalog_table):
+        for partition in page["Partitions"]:
+            year, month = partition["Values"]
+            if (int(year), int(month)) >= (now.year, now.month):
+                continue
+
+            location = partition["StorageDescriptor"]["Location"]
+            hive_location = f"{table_location}/year={year}/month={month}/"
+            compacted = location.startswith(f"{hive_location}{COMPACTED_DIR}/")
+            if not compacted or len(list_late_files(s3, hive_location, location)) > 0:
+                partitions.append(partition["Values"])
+    return sorted(partitions, key=lambda values: [int(value) for value in values])
+
+
+def handle(event, context):
+    # Compact given partitions e.g. [["2022", "8"]] or closed partitions.
+    # The current month is still written by the streaming cleaner.
+    partitions = event.get("partitions") or get_closed_partitions()
+
+    results = [
+        compact_partition(
+            s3,
+            glue,
+            clean_catalog,
+            catalog_table,
+            [str(value) for value in values],
+            sort_by,
+            target_file_size=target_file_size,
+        )
+        for values in partitions
+    ]
+
+    return {
+        "statusCode": 200,
+        "results": results,
+        "files_before": sum(result["files_before"] for result in results),
+        "files_after": sum(result["files_after"] for result in results),
+        "bytes_read": sum(result["bytes_read"] for result in results),
+        "skipped": sum(result["skipped"] for result in results),
+    }
@@ -2,6 +2,8 @@ import os
 
 import awswrangler as wr
 import pandas as pd
+from flowaccount.dimension import DimensionCache
+from flowaccount.redshift import TableLoader, read_sql_by_keys
 from redshift_connector import Connection as RedShiftConnection
 
 clean_bucket = os.environ["CLEAN_BUCKET"]
@@ -10,6 +12,17 @@ secret_id = os.environ["REDSHIFT_SECRET_ARN"]
 dbname = os.environ["REDSHIFT_DB"]
 dim_schema = os.environ["REDSHIFT_DIMENSION_SCHEMA"]
 
+# Large frames are staged in S3 and loaded with COPY when both are set
+loader = TableLoader(
+    staging_path=os.environ.get("REDSHIFT_STAGING_PATH"),
+    iam_role=os.environ.get("REDSHIFT_COPY_ROLE_ARN"),
+)
+
+# Kept across warm invocations, only new companies are fetched on refresh
+company_cache = DimensionCache(
+    "dynamodb_key", "company_key", path="/tmp/dim_company.parquet"
+)
+
 
 def get_company_from_s3(s3_key: str):
     s3_df = wr.s3.read_parquet(s3_key)
@@ -17,13 +30,31 @@ def get_company_from_s3(s3_key: str):
     return s3_df
 
 
-def get_company_from_redshift(schema: str, conn: RedShiftConnection):
+def get_company_from_redshift(
+    schema: str, conn: RedShiftConnection, after_key: int = 0
+):
     redshift_df = wr.redshift.read_sql_query(
-        f"SELECT dynamodb_key FROM {schema}.dim_company", con=conn
+        f"""
+        SELECT company_key, dynamodb_key
+        FROM {schema}.dim_company
+        WHERE company_key > {int(after_key)}
+        """,
+        con=conn,
     )
     return redshift_df
 
 
+def get_company_by_keys_from_redshift(
+    schema: str, conn: RedShiftConnection, company_ids: list
+):
+    query = f"""
+        SELECT company_key, dynamodb_key
+        FROM {schema}.dim_company
+        """
+    redshift_df = read_sql_by_keys(query, "dynamodb_key", company_ids, con=conn)
+    return redshift_df
+
+
 def get_new_company(redshift_df: pd.DataFrame, s3_df: pd.DataFrame):
     """Find new companies in s3_df which are not in redshift_df."""
 
@@ -43,28 +74,33 @@ def get_new_company(redshift_df: pd.DataFrame, s3_df: pd.DataFrame):
 def load_company(company_df: pd.DataFrame, schema: str, conn: RedShiftConnection):
     """Append RedShift company dimension with company_df."""
 
-    wr.redshift.to_sql(
-        df=company_df,
-        table="dim_company",
-        schema=schema,
-        con=conn,
-        mode="append",
-        use_column_names=True,
-    )
+    loader.load(company_df, conn, schema, "dim_company")
 
 
 def handle(event, context):
     export_id = event["export_id"]
 
-    # Get company ids from the export
-    s3_df = get_company_from_s3(f"s3://{clean_bucket}/{table_key}/{export_id}.parquet")
+    # Get company ids from the export, a whole file or parts by export id
+    s3_df = get_company_from_s3(f"s3://{clean_bucket}/{table_key}/{export_id}")
 
     with wr.redshift.connect(secret_id=secret_id, dbname=dbname) as conn:
-        # Get DynamoDB company ids from RedShift
-        redshift_df = get_company_from_redshift(dim_schema, conn)
-
+        # Get DynamoDB company ids from RedShift, new ones since the last run
+        company_cache.refresh(
+            lambda after_key: get_company_from_redshift(dim_schema, conn, after_key)
+        )
         # Get new companies not in RedShift
-        new_company_df = get_new_company(redshift_df, s3_df)
+        new_company_df = get_new_company(company_cache.df, s3_df)
+
+        # Companies committed with keys below the cached maximum are missed
+        # by the refresh, so look them up by id before inserting
+        if not new_company_df.empty:
+            company_cache.refresh_keys(
+                new_company_df["dynamodb_key"],
+                lambda company_ids: get_company_by_keys_from_redshift(
+                    dim_schema, conn, company_ids
+                ),
+            )
+            new_company_df = get_new_company(company_cache.df, s3_df)
 
         # Write new companies to RedShift
         if not new_company_df.empty:
@@ -85,4 +121,5 @@ def handle(event, context):
                 },
             }
 
+    response["companyCache"] = company_cache.stats()
     return response
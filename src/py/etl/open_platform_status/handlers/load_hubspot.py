@@ -1,12 +1,14 @@
-import base64
-import json
 import os
 from typing import List
 
 import awswrangler as wr
-import boto3
 import hubspot as hs
 import pandas as pd
+from flowaccount.clients import get_hubspot_client
+from flowaccount.etl.open_platform_status.load_hubspot import (
+    aggregate_open_platform_status, convert_to_hubspot_inputs,
+    get_changed_status, read_snapshot, update_snapshot, write_snapshot)
+from flowaccount.redshift import read_sql_by_keys
 from hubspot.crm.companies import (ApiException,
                                    BatchInputSimplePublicObjectBatchInput)
 
@@ -17,6 +19,9 @@ dbname = os.environ["REDSHIFT_DB"]
 hubspot_schema = os.environ["REDSHIFT_HUBSPOT_SCHEMA"]
 hubspot_token_arn = os.environ["HUBSPOT_ACCESS_TOKEN_ARN"]
 
+# Parquet file of the last pushed status on S3 or local disk, if any
+snapshot_path = os.environ.get("HUBSPOT_SNAPSHOT_PATH")
+
 
 def get_platform_connection_from_catalog(
     catalog_db: str, catalog_table: str
@@ -41,87 +46,37 @@ def get_hubspot_mapping_from_redshift(
             FROM {hubspot_schema}.company_ref
         """
 
-    if company_ids is not None:
-        query += f"""
-            WHERE id IN {str(company_ids).replace("[", "(").replace("]", ")")}
-        """
-
-    hubspot_df = wr.redshift.read_sql_query(query, con=conn)
-    return hubspot_df
-
+    if company_ids is None:
+        return wr.redshift.read_sql_query(query, con=conn)
 
-def aggregate_open_platform_status(
-    platform_df: pd.DataFrame, hubspot_df: pd.DataFrame
-) -> pd.DataFrame:
-    def has_connection(platform: str):
-        return lambda x: platform in set(x)
-
-    connected_df = platform_df[~platform_df["is_delete"]]
-    merge_df = hubspot_df.merge(
-        connected_df, how="left", left_on="id", right_on="company_id"
-    )
-    merge_df = merge_df[["hubspot_id", "platform_name"]]
-    agg_df = merge_df.groupby("hubspot_id").agg(
-        has_lazada_connection=pd.NamedAgg(
-            column="platform_name", aggfunc=has_connection("lazada")
-        ),
-        has_shopee_connection=pd.NamedAgg(
-            column="platform_name", aggfunc=has_connection("shopee")
-        ),
-        has_kcash_connection=pd.NamedAgg(
-            column="platform_name", aggfunc=has_connection("kcash")
-        ),
-        has_foodstory_connection=pd.NamedAgg(
-            column="platform_name", aggfunc=has_connection("foodstory")
-        ),
-    )
-    return agg_df.reset_index()
-
-
-def convert_open_platform_status_to_hubspot_inputs(df: pd.DataFrame):
-    return BatchInputSimplePublicObjectBatchInput(
-        [
-            {
-                "id": hubspot_id,
-                "properties": {
-                    "foodstory_api": foodstory_api,
-                    "k_cash_connect_api": k_cash_connect_api,
-                    "lazada_api": lazada_api,
-                    "shopee_api": shopee_api,
-                },
-            }
-            for hubspot_id, foodstory_api, k_cash_connect_api, lazada_api, shopee_api in zip(
-                df["hubspot_id"],
-                df["has_foodstory_connection"].map({True: "yes", False: "no"}),
-                df["has_kcash_connection"].map({True: "yes", False: "no"}),
-                df["has_lazada_connection"].map({True: "yes", False: "no"}),
-                df["has_shopee_connection"].map({True: "yes", False: "no"}),
-            )
-        ]
+    # Company ids of a whole table are looked up through a temporary table
+    return read_sql_by_keys(
+        query, "CAST(flowaccount_id AS BIGINT)", company_ids, con=conn
     )
 
 
 def hubspot_batch_update_platform(
     agg_df: pd.DataFrame, step_size: int, client: hs.Client
-):
-    row_count = agg_df.shape[0]
-    for cur_start in range(0, row_count, step_size):
-        if cur_start + step_size <= row_count:
-            cur_end = cur_start + step_size
-        else:
-            cur_end = row_count
-
-        inputs = convert_open_platform_status_to_hubspot_inputs(
-            agg_df.iloc[cur_start:cur_end]
-        )
+) -> List:
+    """Update HubSpot companies and return HubSpot IDs of succeeded batches."""
+
+    pushed_ids = []
+    inputs = convert_to_hubspot_inputs(agg_df)
+    for cur_start in range(0, len(inputs), step_size):
+        batch = inputs[cur_start : cur_start + step_size]
         try:
             api_response = client.crm.companies.batch_api.update(
-                batch_input_simple_public_object_batch_input=inputs
+                batch_input_simple_public_object_batch_input=(
+                    BatchInputSimplePublicObjectBatchInput(batch)
+                )
             )
             print(api_response)
+            pushed_ids.extend(item["id"] for item in batch)
         except ApiException as e:
             print("Exception when calling batch_api->update: %s\n" % e)
 
+    return pushed_ids
+
 
 def handle(event, context):
     """Load latest open platform status to HubSpot."""
@@ -136,16 +91,34 @@ def handle(event, context):
 
     agg_df = aggregate_open_platform_status(platform_df, hubspot_df)
 
-    # Retrieve HubSpot access token
-    sm_client = boto3.client("secretsmanager")
-    resp = sm_client.get_secret_value(SecretId=hubspot_token_arn)
-    if "SecretString" in resp:
-        secret = json.loads(resp["SecretString"])
+    # Push only companies whose status changed since the last push, unless
+    # a full load is requested
+    if snapshot_path is None:
+        snapshot_df = None
+        changed_df = agg_df
     else:
-        secret = json.loads(base64.b64decode(resp["SecretBinary"]))
+        snapshot_df = read_snapshot(snapshot_path)
+        changed_df = (
+            agg_df
+            if event.get("full_load")
+            else get_changed_status(agg_df, snapshot_df)
+        )
+    print(f"Changed companies: {changed_df.shape[0]} of {agg_df.shape[0]}")
+
+    # Update HubSpot companies, with a client reused by warm invocations
+    pushed_ids = []
+    if changed_df.shape[0] > 0:
+        hs_client = get_hubspot_client(hubspot_token_arn)
+        pushed_ids = hubspot_batch_update_platform(changed_df, 10, hs_client)
 
-    # Update HubSpot companies
-    hs_client = hs.Client.create(access_token=secret["HUBSPOT_ACCESS_TOKEN"])
-    hubspot_batch_update_platform(agg_df, 10, hs_client)
+    if snapshot_df is not None and len(pushed_ids) > 0:
+        write_snapshot(
+            update_snapshot(snapshot_df, changed_df, pushed_ids), snapshot_path
+        )
 
-    return {"status": 200}
+    return {
+        "status": 200,
+        "total": agg_df.shape[0],
+        "changed": changed_df.shape[0],
+        "pushed": len(pushed_ids),
+    }
@@ -1,15 +1,14 @@
-import json
 import logging
 import os
-import urllib.parse
 import uuid
 
 import awswrangler as wr
 import boto3
 from flowaccount.etl.open_platform_status.load_hubspot_streaming import (
-    aggregate_latest_status, attach_hubspot_id, convert_to_json_line,
-    convert_to_platform_status_dict, filter_event, filter_platform,
-    get_hubspot_mapping)
+    aggregate_latest_status, attach_hubspot_id, filter_event, filter_platform,
+    get_hubspot_mapping, iter_hubspot_inputs, write_json_lines)
+from flowaccount.events import get_s3_objects
+from flowaccount.utils import MultipartUploadWriter
 
 rs_secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 rs_dbname = os.environ["REDSHIFT_DB"]
@@ -23,20 +22,14 @@ s3 = boto3.client("s3")
 
 
 def handle(event, context):
-    # Extract S3 event from SNS message
-    sns_body = event["Records"][0]["Sns"]["Message"]
-    s3_event = json.loads(sns_body)
+    # Extract S3 file URIs from SNS or SQS messages
+    paths = [s3_object.uri for s3_object in get_s3_objects(event)]
+    print(f"s3 create events: {paths}")
+    if len(paths) == 0:
+        return {"status": 200, "paths": paths, "total": 0}
 
-    # Extract S3 file URI
-    bucket = s3_event["Records"][0]["s3"]["bucket"]["name"]
-    key = urllib.parse.unquote_plus(
-        s3_event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
-    )
-    print(f"s3 create event: s3://{bucket}/{key}")
-
-    cdc_df = wr.s3.read_parquet(
-        f"s3://{bucket}/{key}"
-    )
+    # Read all CDC files concurrently into one dataframe
+    cdc_df = wr.s3.read_parquet(paths, use_threads=True)
 
     with wr.redshift.connect(secret_id=rs_secret_arn, dbname=rs_dbname) as conn:
         companies = cdc_df["company_id"].drop_duplicates().to_list()
@@ -67,30 +60,20 @@ def handle(event, context):
     # Aggregate latest status for each company and platform pair
     agg_df = aggregate_latest_status(event_df)
 
-    # Transform to HubSpot update input format
-    inputs = [
-        {
-            "id": company_id,
-            "properties": convert_to_platform_status_dict(agg_df.loc[company_id]),
-        }
-        for company_id in agg_df.index.drop_duplicates()
-    ]
-
-    # Export to HubSpot service bucket
-    if len(inputs) > 0:
-        body = bytes(convert_to_json_line(inputs).encode("utf-8"))
+    # Stream HubSpot update inputs as JSON lines to HubSpot service bucket
+    if agg_df.shape[0] > 0:
         file_name = str(uuid.uuid4()) + ".json"
         export_key = f"{hs_svc_prefix}/{file_name}"
-        s3.put_object(Bucket=hs_svc_bucket, Key=export_key, Body=body)
+        with MultipartUploadWriter(s3, hs_svc_bucket, export_key) as writer:
+            success = write_json_lines(writer, iter_hubspot_inputs(agg_df))
 
         response = {
             "status": 200,
-            "bucket": bucket,
-            "key": key,
+            "paths": paths,
             "dst_bucket": hs_svc_bucket,
             "dst_key": export_key,
             "total": cdc_df.shape[0],
-            "success": len(inputs),
+            "success": success,
             "failed": {
                 "missing_hubspot_id": missing_rel_df.shape[0],
                 "missing_platform": missing_platform_df.shape[0],
@@ -99,8 +82,7 @@ def handle(event, context):
     else:
         response = {
             "status": 200,
-            "bucket": bucket,
-            "key": key,
+            "paths": paths,
             "total": cdc_df.shape[0],
             "failed": {
                 "missing_hubspot_id": missing_rel_df.shape[0],
@@ -4,6 +4,9 @@ from typing import Tuple
 
 import awswrangler as wr
 import pandas as pd
+from flowaccount.dimension import DimensionCache
+from flowaccount.keys import DateKeySet, format_date_key, format_time_key
+from flowaccount.redshift import TableLoader
 from redshift_connector import Connection as RedShiftConnection
 
 clean_bucket = os.environ["CLEAN_BUCKET"]
@@ -12,16 +15,68 @@ secret_id = os.environ["REDSHIFT_SECRET_ARN"]
 dbname = os.environ["REDSHIFT_DB"]
 dim_schema = os.environ["REDSHIFT_DIMENSION_SCHEMA"]
 fact_schema = os.environ["REDSHIFT_FACT_SCHEMA"]
+delta_facts = os.environ.get("DELTA_FACTS", "false").lower() == "true"
 
+# Large frames are staged in S3 and loaded with COPY when both are set
+loader = TableLoader(
+    staging_path=os.environ.get("REDSHIFT_STAGING_PATH"),
+    iam_role=os.environ.get("REDSHIFT_COPY_ROLE_ARN"),
+)
 
-def format_date_key(date_obj: date) -> int:
-    year, month, day = date_obj.year, date_obj.month, date_obj.day
-    return int(f"{year}{month:02}{day:02}")
+# Kept across warm invocations, only new companies are fetched on refresh
+company_cache = DimensionCache(
+    "dynamodb_key", "company_key", path="/tmp/dim_company.parquet"
+)
+date_key_set = DateKeySet()
 
+# Latest status of each company and platform pair with any fact
+LATEST_VIEW_SQL = """
+CREATE OR REPLACE VIEW {fact_schema}.fact_open_platform_connection_latest AS
+SELECT company_key, platform, status, date_key, time_key
+FROM (
+    SELECT
+        company_key,
+        platform,
+        status,
+        date_key,
+        time_key,
+        ROW_NUMBER() OVER (
+            PARTITION BY company_key, platform
+            ORDER BY date_key DESC, time_key DESC
+        ) AS event_rank
+    FROM {fact_schema}.fact_open_platform_connection
+) AS events
+WHERE event_rank = 1
+"""
 
-def format_time_key(time_obj: time) -> int:
-    hour, minute, second = time_obj.hour, time_obj.minute, time_obj.second
-    return int(f"{hour}{minute:02}{second:02}")
+# Status of company and platform pairs at the end of each day like daily
+# full snapshots. Only pairs with facts have rows, from the date of their
+# first fact, as pairs without facts are not connected.
+SNAPSHOT_VIEW_SQL = """
+CREATE OR REPLACE VIEW {fact_schema}.fact_open_platform_connection_snapshot AS
+WITH events AS (
+    SELECT
+        company_key,
+        platform,
+        status,
+        date_key AS valid_from,
+        LEAD(date_key) OVER (
+            PARTITION BY company_key, platform
+            ORDER BY date_key, time_key
+        ) AS valid_to
+    FROM {fact_schema}.fact_open_platform_connection
+)
+SELECT
+    d.date_key,
+    e.company_key,
+    e.platform,
+    e.status
+FROM events AS e
+JOIN {dim_schema}.dim_date AS d
+    ON d.date_key >= e.valid_from
+    AND (e.valid_to IS NULL OR d.date_key < e.valid_to)
+WHERE d.date_key <= CAST(TO_CHAR(GETDATE(), 'YYYYMMDD') AS INTEGER)
+"""
 
 
 def get_export_datetime(s3_key: str) -> Tuple[date, time]:
@@ -49,15 +104,34 @@ def get_platform_from_redshift(schema: str, conn: RedShiftConnection) -> pd.Seri
     return redshift_df["platform"]
 
 
-def get_company_from_redshift(schema: str, conn: RedShiftConnection) -> pd.DataFrame:
-    """Get company dimension from RedShift."""
+def get_company_from_redshift(
+    schema: str, conn: RedShiftConnection, after_key: int = 0
+) -> pd.DataFrame:
+    """Get company dimension rows with company_key above after_key from RedShift."""
     redshift_df = wr.redshift.read_sql_query(
-        f"SELECT company_key, dynamodb_key FROM {schema}.dim_company", con=conn
+        f"""
+        SELECT company_key, dynamodb_key
+        FROM {schema}.dim_company
+        WHERE company_key > {int(after_key)}
+        """,
+        con=conn,
     )
 
     return redshift_df
 
 
+def get_date_dimension_from_redshift(
+    schema: str, conn: RedShiftConnection, after_key: int = 0
+) -> pd.Series:
+    """Get date keys after after_key from RedShift date dimension."""
+    date_df = wr.redshift.read_sql_query(
+        f"SELECT date_key FROM {schema}.dim_date WHERE date_key > {int(after_key)}",
+        con=conn,
+    )
+
+    return date_df["date_key"]
+
+
 def get_platform_status(
     company_df: pd.DataFrame, s3_df: pd.DataFrame, platform_sr: pd.Series
 ) -> pd.DataFrame:
@@ -73,11 +147,54 @@ def get_platform_status(
         left_on=["dynamodb_key", "platform"],
         right_on=["company_id", "platform_name"],
     )
-    merged_df["status"] = merged_df["company_id"].isna()
+    merged_df["status"] = merged_df["company_id"].notna()
 
     return merged_df[["company_key", "platform", "status"]]
 
 
+def get_connected_from_redshift(schema: str, conn: RedShiftConnection) -> pd.DataFrame:
+    """Get connected company and platform pairs of the latest facts."""
+
+    return wr.redshift.read_sql_query(
+        f"""
+        SELECT company_key, platform
+        FROM {schema}.fact_open_platform_connection_latest
+        WHERE status
+        """,
+        con=conn,
+    )
+
+
+def get_status_changes(
+    company_df: pd.DataFrame, s3_df: pd.DataFrame, connected_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Get connections and disconnections since the previously connected pairs.
+
+    Only connected pairs are compared, so the work grows with connections
+    instead of companies times platforms.
+    """
+
+    current_df = s3_df.dropna(subset=["platform_name"]).merge(
+        company_df, left_on="company_id", right_on="dynamodb_key"
+    )
+    current_df = current_df[["company_key", "platform_name"]].astype(
+        {"platform_name": "object"}
+    )
+    current_df = current_df.rename(columns={"platform_name": "platform"})
+    current_df = current_df.drop_duplicates()
+
+    merged_df = current_df.merge(
+        connected_df[["company_key", "platform"]].astype({"platform": "object"}),
+        how="outer",
+        on=["company_key", "platform"],
+        indicator=True,
+    )
+    changes_df = merged_df[merged_df["_merge"] != "both"].copy()
+    changes_df["status"] = changes_df["_merge"] == "left_only"
+
+    return changes_df[["company_key", "platform", "status"]].reset_index(drop=True)
+
+
 def handle(event, context):
     export_id = event["export_id"]
 
@@ -87,39 +204,71 @@ def handle(event, context):
     date_key = format_date_key(export_date)
     time_key = format_time_key(export_time)
 
+    # A whole file or parts by export id
     s3_platform_df = get_open_platform_from_s3(
-        f"s3://{clean_bucket}/{table_key}/{export_id}.parquet"
+        f"s3://{clean_bucket}/{table_key}/{export_id}"
     )
 
     with wr.redshift.connect(secret_id=secret_id, dbname=dbname) as conn:
-        # Get all companies in RedShift
-        rs_company_df = get_company_from_redshift(dim_schema, conn)
-
-        # Get all known platforms from both S3 and RedShift
-        rs_platform_sr = get_platform_from_redshift(fact_schema, conn)
-        platform_sr = (
-            pd.concat(
-                [rs_platform_sr, s3_platform_df["platform_name"]], ignore_index=True
-            )
-            .rename("platform")
-            .drop_duplicates()
+        # Get all companies in RedShift, new ones since the last run
+        company_cache.refresh(
+            lambda after_key: get_company_from_redshift(dim_schema, conn, after_key)
         )
+        rs_company_df = company_cache.df
 
-        platform_status_df = get_platform_status(
-            rs_company_df, s3_platform_df, platform_sr
+        # Facts must refer to an existing date
+        valid = date_key_set.is_valid(
+            pd.Series([date_key]),
+            lambda after_key: get_date_dimension_from_redshift(
+                dim_schema, conn, after_key
+            ),
         )
+        if not valid[0]:
+            raise ValueError(f"Date key is missing in dim_date: {date_key}")
+
+        if delta_facts:
+            # Write status changes only, the snapshot view gives full snapshots
+            for view_sql in [LATEST_VIEW_SQL, SNAPSHOT_VIEW_SQL]:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        view_sql.format(fact_schema=fact_schema, dim_schema=dim_schema)
+                    )
+            connected_df = get_connected_from_redshift(fact_schema, conn)
+            platform_status_df = get_status_changes(
+                rs_company_df, s3_platform_df, connected_df
+            )
+        else:
+            # Get all known platforms from both S3 and RedShift
+            rs_platform_sr = get_platform_from_redshift(fact_schema, conn)
+            platform_sr = (
+                pd.concat(
+                    [rs_platform_sr, s3_platform_df["platform_name"]],
+                    ignore_index=True,
+                )
+                .rename("platform")
+                .drop_duplicates()
+            )
+
+            platform_status_df = get_platform_status(
+                rs_company_df, s3_platform_df, platform_sr
+            )
+
         platform_status_df["date_key"] = date_key
         platform_status_df["time_key"] = time_key
 
-        # Write to RedShift
-        wr.redshift.to_sql(
-            df=platform_status_df,
-            table="fact_open_platform_connection",
-            schema=fact_schema,
-            con=conn,
-            mode="append",
-            use_column_names=True,
-        )
+        # Write to RedShift, a snapshot of all companies is loaded with COPY
+        if platform_status_df.shape[0] > 0:
+            loader.load(
+                platform_status_df, conn, fact_schema, "fact_open_platform_connection"
+            )
+
+        # Commit views too, even without new facts
+        conn.commit()
 
-    response = {"statusCode": 200}
+    response = {
+        "statusCode": 200,
+        "deltaFacts": delta_facts,
+        "facts": platform_status_df.shape[0],
+        "companyCache": company_cache.stats(),
+    }
     return response
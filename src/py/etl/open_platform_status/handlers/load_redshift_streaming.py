@@ -1,100 +1,188 @@
-import json
 import logging
 import os
-import urllib.parse
+from typing import Tuple
 
 import awswrangler as wr
+import pandas as pd
+from flowaccount.dimension import DimensionCache
 from flowaccount.etl.open_platform_status.load_redshift_streaming import (
     convert_to_fact_table, filter_new_company)
+from flowaccount.events import get_s3_objects
+from flowaccount.keys import DateKeySet
+from flowaccount.redshift import RedShiftSession, TableLoader, read_sql_by_keys
+from redshift_connector import Connection as RedShiftConnection
 
 rs_secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 rs_db_name = os.environ["REDSHIFT_DB"]
 rs_dim_schema = os.environ["REDSHIFT_DIMENSION_SCHEMA"]
 rs_fact_schema = os.environ["REDSHIFT_FACT_SCHEMA"]
 
+# Large frames are staged in S3 and loaded with COPY when both are set
+loader = TableLoader(
+    staging_path=os.environ.get("REDSHIFT_STAGING_PATH"),
+    iam_role=os.environ.get("REDSHIFT_COPY_ROLE_ARN"),
+)
 
-def handle(event, context):
-    # Extract S3 event from SNS message
-    sns_body = event["Records"][0]["Sns"]["Message"]
-    s3_event = json.loads(sns_body)
-
-    # Extract S3 file URI
-    bucket = s3_event["Records"][0]["s3"]["bucket"]["name"]
-    key = urllib.parse.unquote_plus(
-        s3_event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
+# Kept across warm invocations, so RedShift is only queried for companies
+# not seen by this container yet
+company_cache = DimensionCache(
+    "dynamodb_key", "company_key", path="/tmp/dim_company.parquet"
+)
+date_key_set = DateKeySet()
+
+
+def connect_redshift() -> RedShiftConnection:
+    return wr.redshift.connect(secret_id=rs_secret_arn, dbname=rs_db_name)
+
+
+# One authenticated session reused across steps and warm invocations
+session = RedShiftSession(connect_redshift)
+
+
+def get_company_from_redshift(conn: RedShiftConnection, after_key: int) -> pd.DataFrame:
+    return wr.redshift.read_sql_query(
+        f"""
+        SELECT company_key, dynamodb_key
+        FROM {rs_dim_schema}.dim_company
+        WHERE company_key > {int(after_key)}
+        """,
+        con=conn,
     )
-    logging.info(f"s3 create event: s3://{bucket}/{key}")
 
-    # Get the CDC file
-    cdc_df = wr.s3.read_parquet(
-        f"s3://{bucket}/{key}",
-        columns=[
-            "approximate_creation_date_time",
-            "event_name",
-            "company_id",
-            "platform_name",
-        ],
+
+def get_company_by_keys_from_redshift(
+    conn: RedShiftConnection, company_ids: list
+) -> pd.DataFrame:
+    query = f"""
+        SELECT company_key, dynamodb_key
+        FROM {rs_dim_schema}.dim_company
+        """
+    return read_sql_by_keys(query, "dynamodb_key", company_ids, con=conn)
+
+
+def get_date_dimension_from_redshift(
+    conn: RedShiftConnection, after_key: int
+) -> pd.Series:
+    date_df = wr.redshift.read_sql_query(
+        f"""
+        SELECT date_key
+        FROM {rs_dim_schema}.dim_date
+        WHERE date_key > {int(after_key)}
+        """,
+        con=conn,
     )
+    return date_df["date_key"]
+
+
+def get_company_dimension(conn: RedShiftConnection, company_ids: list) -> pd.DataFrame:
+    # Companies committed with keys below the cached maximum are missed by
+    # the refresh, so missing ones are also looked up by id
+    company_df = company_cache.lookup(
+        company_ids,
+        lambda after_key: get_company_from_redshift(conn, after_key),
+        lambda keys: get_company_by_keys_from_redshift(conn, keys),
+    )
+    return company_df.rename(columns={"dynamodb_key": "company_id"})
+
+
+def load_cdc(
+    conn: RedShiftConnection, cdc_df: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Load new companies and facts of CDC records without committing."""
 
     # Get all company ids
     company_ids = cdc_df["company_id"].drop_duplicates().to_list()
 
-    # Get RedShift company dimension
-    with wr.redshift.connect(secret_id=rs_secret_arn, dbname=rs_db_name) as conn:
-        company_df = wr.redshift.read_sql_query(
-            f"""
-            SELECT company_key, dynamodb_key as company_id
-            FROM {rs_dim_schema}.dim_company
-            WHERE company_id IN ({str(company_ids)[1:-1]})
-            """,
-            con=conn,
-        )
+    # Get RedShift company dimension, cached unless companies are missing
+    company_df = get_company_dimension(conn, company_ids)
 
     # Get unregistered companies in RedShift
     new_company_df = filter_new_company(cdc_df, company_df)
-    new_company_df = new_company_df[["company_id"]].rename(
-        columns={"company_id": "dynamodb_key"}
-    )
+    new_company_df = new_company_df[["company_id"]].drop_duplicates()
+    new_company_df = new_company_df.rename(columns={"company_id": "dynamodb_key"})
 
     # Update the dimension and refresh
     if new_company_df.shape[0] > 0:
-        with wr.redshift.connect(secret_id=rs_secret_arn, dbname=rs_db_name) as conn:
-            wr.redshift.to_sql(
-                new_company_df,
-                schema=rs_dim_schema,
-                table="dim_company",
-                mode="append",
-                use_column_names=True,
-                con=conn,
-            )
-
-            company_df = wr.redshift.read_sql_query(
-                f"""
-                SELECT company_key, dynamodb_key as company_id
-                FROM {rs_dim_schema}.dim_company
-                WHERE company_id IN ({str(company_ids)[1:-1]})
-                """,
-                con=conn,
-            )
+        loader.load(
+            new_company_df,
+            conn,
+            rs_dim_schema,
+            "dim_company",
+            commit_transaction=False,
+        )
+
+        # New companies are missing in the cache, which refreshes it with
+        # keys inserted in this transaction
+        company_df = get_company_dimension(conn, company_ids)
 
     fact_df = convert_to_fact_table(cdc_df, company_df)
 
+    # Facts must refer to existing dates, otherwise nothing is committed and
+    # the message is retried once dim_date has them
+    valid = date_key_set.is_valid(
+        fact_df["date_key"],
+        lambda after_key: get_date_dimension_from_redshift(conn, after_key),
+    )
+    if not valid.all():
+        missing = sorted(fact_df.loc[~valid, "date_key"].unique().tolist())
+        raise ValueError(
+            f"Date keys of {int((~valid).sum())} facts are missing in dim_date: "
+            f"{missing}"
+        )
+
     if fact_df.shape[0] > 0:
-        with wr.redshift.connect(secret_id=rs_secret_arn, dbname=rs_db_name) as conn:
-            wr.redshift.to_sql(
-                fact_df,
-                schema=rs_fact_schema,
-                table="fact_open_platform_connection",
-                mode="append",
-                use_column_names=True,
-                con=conn,
-            )
+        loader.load(
+            fact_df,
+            conn,
+            rs_fact_schema,
+            "fact_open_platform_connection",
+            commit_transaction=False,
+        )
+
+    return new_company_df, fact_df
+
+
+def handle(event, context):
+    # Extract S3 file URIs from SNS or SQS messages
+    paths = [s3_object.uri for s3_object in get_s3_objects(event)]
+    logging.info(f"s3 create events: {paths}")
+    if len(paths) == 0:
+        return {"status": 200, "paths": paths, "total": 0}
+
+    # Read all CDC files concurrently into one dataframe
+    cdc_df = wr.s3.read_parquet(
+        paths,
+        use_threads=True,
+        columns=[
+            "approximate_creation_date_time",
+            "event_name",
+            "company_id",
+            "platform_name",
+        ],
+    )
+
+    # New companies and facts are committed together, or not at all
+    company_snapshot = company_cache.snapshot()
+    try:
+        with session.transaction() as conn:
+            new_company_df, fact_df = load_cdc(conn, cdc_df)
+    except Exception:
+        # Keys of rolled back companies must not be used by later messages,
+        # and IDENTITY keys below the cached maximum may be among them
+        company_cache.restore(company_snapshot)
+        raise
 
     response = {
         "status": 200,
+        "paths": paths,
         "total": cdc_df.shape[0],
         "new_companies": new_company_df.shape[0],
         "new_fact": fact_df.shape[0],
+        # Records without a status, e.g. MODIFY events or unknown platforms
+        "dropped": cdc_df.shape[0] - fact_df.shape[0],
+        "company_cache": company_cache.stats(),
+        "redshift_connects": session.connects,
+        "loads": loader.stats(),
     }
 
     logging.info(response)
@@ -1,44 +1,72 @@
 import json
-import urllib.parse
 
 import boto3
+from flowaccount.events import S3Object, get_s3_objects
 
 s3 = boto3.client("s3")
 
 
-def handle(event, context):
-    bucket = event["Records"][0]["s3"]["bucket"]["name"]
-    manifest_summary_key = urllib.parse.unquote_plus(
-        event["Records"][0]["s3"]["object"]["key"], encoding="utf-8"
-    )
-
-    if manifest_summary_key.rsplit("/")[1] != "manifest-summary.json":
-        return {"status": 400, "error": "Invalid manifest summary key"}
+def parse_manifest(summary_object: S3Object) -> dict:
+    bucket = summary_object.bucket
+    manifest_summary_key = summary_object.key
 
-    manifest_summary = (
-        s3.get_object(Bucket=bucket, key=manifest_summary_key)["Body"]
+    manifest_summary = json.loads(
+        s3.get_object(Bucket=bucket, Key=manifest_summary_key)["Body"]
         .read()
         .decode("utf-8")
     )
-    export_id = manifest_summary["exportArn"].rsplit("/")[1]
-    table_name = manifest_summary["tableArn"].rsplit("/")[1]
+    export_id = manifest_summary["exportArn"].rsplit("/", maxsplit=1)[-1]
+    table_name = manifest_summary["tableArn"].rsplit("/", maxsplit=1)[-1]
 
     manifest_files_key = manifest_summary["manifestFilesS3Key"]
     manifest_files_raw = (
-        s3.get_object(Bucket=bucket, key=manifest_files_key)["Body"]
+        s3.get_object(Bucket=bucket, Key=manifest_files_key)["Body"]
         .read()
         .decode("utf-8")
     )
     manifest_files = [json.loads(line) for line in manifest_files_raw.splitlines()]
 
-    response = {
-        "status": 200,
+    return {
         "export_id": export_id,
         "table_name": table_name,
         "bucket": bucket,
         "manifest_summary_key": manifest_summary_key,
         "manifest_files_key": manifest_files_key,
         "export_file_keys": [manifest["dataFileS3Key"] for manifest in manifest_files],
+        # Inputs of clean_open_platform.handle_file for a Map state
+        "export_files": [
+            {
+                "bucket": bucket,
+                "export_id": export_id,
+                "table_name": table_name,
+                "data_file_s3_key": manifest["dataFileS3Key"],
+                "md5_checksum": manifest["md5Checksum"],
+                "item_count": manifest["itemCount"],
+            }
+            for manifest in manifest_files
+        ],
     }
 
-    return response
+
+def handle(event, context):
+    # Parse every manifest summary of S3, SNS or SQS batch events
+    summary_objects = [
+        s3_object
+        for s3_object in get_s3_objects(event)
+        if s3_object.key.rsplit("/", maxsplit=1)[-1] == "manifest-summary.json"
+    ]
+    if len(summary_objects) == 0:
+        return {"status": 400, "error": "Invalid manifest summary key"}
+
+    manifests = [parse_manifest(summary_object) for summary_object in summary_objects]
+
+    return {
+        "status": 200,
+        "manifests": manifests,
+        # Export files of all manifests for a single Map state
+        "export_files": [
+            export_file
+            for manifest in manifests
+            for export_file in manifest["export_files"]
+        ],
+    }
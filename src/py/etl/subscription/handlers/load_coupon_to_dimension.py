@@ -1,10 +1,8 @@
-import base64
-import json
 import logging
 import os
 
-import boto3
-import psycopg2
+from flowaccount.clients import (get_psycopg2_connection,
+                                 invalidate_psycopg2_connection_on_error)
 
 secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 catalog_table = os.environ["CLEAN_TABLE"]
@@ -14,30 +12,40 @@ dim_schema = os.environ["REDSHIFT_DIM_SCHEMA"]
 dim_table = os.environ["REDSHIFT_DIM_TABLE"]
 staging_table = "coupon_staging"
 
-sm = boto3.client("secretsmanager")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-def handle(event, context):
-    logging.info("Retrieving RedShift credential")
-    resp = sm.get_secret_value(SecretId=secret_arn)
-    if "SecretString" in resp:
-        secret = json.loads(resp["SecretString"])
-    else:
-        secret = json.loads(base64.b64decode(resp["SecretBinary"]))
-    host = secret["host"]
-    port = secret["port"]
-    user = secret["username"]
-    password = secret["password"]
+def get_watermark(cursor):
+    """Get the latest creation or modification time loaded into the dimension.
 
-    logger.info("Connecting to RedShift")
-    conn = psycopg2.connect(
-        host=host, port=port, dbname=dbname, user=user, password=password
+    Returns None when the dimension is empty.
+    """
+
+    cursor.execute(
+        f"""
+        SELECT MAX(COALESCE(coupon_modified_on, coupon_created_on))
+        FROM {dim_schema}.{dim_table}
+    """
     )
+    return cursor.fetchone()[0]
+
+
+@invalidate_psycopg2_connection_on_error(secret_arn, dbname)
+def handle(event, context):
+    # Credential and connection are reused by warm invocations
+    logger.info("Connecting to RedShift")
+    conn = get_psycopg2_connection(secret_arn, dbname)
 
+    # Commit on success, otherwise roll back the staging table too
     logger.info("Begin transaction")
-    with conn.cursor() as cursor:
+    with conn, conn.cursor() as cursor:
+        # Only coupons created or modified since the latest loaded change are
+        # staged, unless a full load is requested. Coupons changed in the
+        # same second as the watermark are staged again and merged as is.
+        watermark = None if event.get("full_load") else get_watermark(cursor)
+        logger.info(f"Staging coupons changed since {watermark}")
+
         logger.info("Creating staging table")
         cursor.execute(
             f"""
@@ -64,9 +72,14 @@ def handle(event, context):
                 active, is_delete,
                 created_on, created_by,
                 modified_on, modified_by
-            FROM {spectrum_schema}.{catalog_table})
-        """
+            FROM {spectrum_schema}.{catalog_table}
+            WHERE %(watermark)s IS NULL
+                OR created_on >= %(watermark)s
+                OR modified_on >= %(watermark)s)
+        """,
+            {"watermark": watermark},
         )
+        staged = cursor.rowcount
 
         logger.info("Updating rows")
         cursor.execute(
@@ -93,6 +106,7 @@ def handle(event, context):
             WHERE staging.mysql_id = dst.mysql_id
             """
         )
+        updated = cursor.rowcount
         cursor.execute(
             f"""
             DELETE FROM {staging_table}
@@ -124,6 +138,7 @@ def handle(event, context):
             FROM {staging_table})
         """
         )
+        inserted = cursor.rowcount
 
         logger.info("Dropping staging table")
         cursor.execute(
@@ -133,9 +148,13 @@ def handle(event, context):
         )
 
     logger.info("End transaction")
-    conn.commit()
-
-    logger.info("Closing connection")
-    conn.close()
 
-    return {"status": 200}
+    response = {
+        "status": 200,
+        "watermark": None if watermark is None else watermark.isoformat(),
+        "staged": staged,
+        "updated": updated,
+        "inserted": inserted,
+    }
+    logger.info(response)
+    return response
@@ -1,12 +1,11 @@
-import base64
-import json
 import logging
 import os
 
-import boto3
-import psycopg2
-
-COUPON_NA_KEY = 1
+from flowaccount.clients import (get_psycopg2_connection,
+                                 invalidate_psycopg2_connection_on_error)
+from flowaccount.etl.subscription.load_coupon_to_fact import (
+    DEFAULT_BATCH_ROWS, DEFAULT_LOOKBACK_HOURS, CouponKeyBackfill,
+    fill_coupon_keys)
 
 secret_arn = os.environ["REDSHIFT_SECRET_ARN"]
 dbname = os.environ["REDSHIFT_DB"]
@@ -15,52 +14,51 @@ dim_table = os.environ["REDSHIFT_DIM_TABLE"]
 fact_schema = os.environ["REDSHIFT_FACT_SCHEMA"]
 fact_table = os.environ["REDSHIFT_FACT_TABLE"]
 
-sm = boto3.client("secretsmanager")
+# Without an arrival time column, the whole fact is scanned for missing keys
+# on every run
+arrival_column = os.environ.get("REDSHIFT_FACT_ARRIVAL_COLUMN")
+batch_rows = int(os.environ.get("BACKFILL_BATCH_ROWS", str(DEFAULT_BATCH_ROWS)))
+lookback_hours = int(
+    os.environ.get("BACKFILL_LOOKBACK_HOURS", str(DEFAULT_LOOKBACK_HOURS))
+)
 
+# No new batch is started with less time left, in milliseconds
+min_remaining_time = 60_000
 
-def handle(event, context):
-    logging.info("Retrieving RedShift credential")
-    resp = sm.get_secret_value(SecretId=secret_arn)
-    if "SecretString" in resp:
-        secret = json.loads(resp["SecretString"])
-    else:
-        secret = json.loads(base64.b64decode(resp["SecretBinary"]))
-    host = secret["host"]
-    port = secret["port"]
-    user = secret["username"]
-    password = secret["password"]
 
+@invalidate_psycopg2_connection_on_error(secret_arn, dbname)
+def handle(event, context):
+    # Credential and connection are reused by warm invocations
     logging.info("Connecting to RedShift")
-    conn = psycopg2.connect(
-        host=host, port=port, dbname=dbname, user=user, password=password
-    )
-    with conn.cursor() as cursor:
-        logging.info("Fill missing coupons")
-        cursor.execute(
-            f"""
-            UPDATE {fact_schema}.{fact_table} AS f
-            SET
-            coupon_key = {COUPON_NA_KEY}
-            WHERE f.coupon IS NULL AND f.coupon_key IS NULL;
-        """
+    conn = get_psycopg2_connection(secret_arn, dbname)
+
+    if arrival_column:
+        backfill = CouponKeyBackfill(
+            fact_schema,
+            fact_table,
+            dim_schema,
+            dim_table,
+            arrival_column,
+            batch_rows=batch_rows,
+            lookback_hours=lookback_hours,
+        )
+        # Scheduled sweeps also fill rows missed by the lookback window
+        result = backfill.run(
+            conn,
+            lambda: context is None
+            or context.get_remaining_time_in_millis() > min_remaining_time,
+            sweep=bool((event or {}).get("sweep")),
         )
+        logging.info(f"Done {result}")
+        return {"status": 200, **result}
 
-        logging.info("Fill coupon keys")
-        cursor.execute(
-            f"""
-            UPDATE {fact_schema}.{fact_table} AS f
-            SET
-                coupon_key = d.coupon_key
-            FROM {dim_schema}.{dim_table} AS d
-            WHERE f.coupon_key IS NULL AND d.mysql_id = f.coupon;
-        """
+    with conn, conn.cursor() as cursor:
+        logging.info("Fill missing coupons and coupon keys")
+        fill_coupon_keys(
+            cursor, f"{fact_schema}.{fact_table}", f"{dim_schema}.{dim_table}"
         )
 
         logging.info("Commit")
-        conn.commit()
-
-    logging.info("Closing connection")
-    conn.close()
 
     logging.info("Done")
     return {"status": 200}
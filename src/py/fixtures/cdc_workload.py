@@ -0,0 +1,139 @@
+"""Synthetic DynamoDB stream records of the open platform company user table."""
+
+import json
+import random
+from typing import Dict, Iterator, List
+
+TABLE_NAME = "flowaccount-open-platform-company-user-v2"
+
+DEFAULT_EVENT_MIX = {"INSERT": 0.2, "MODIFY": 0.7, "REMOVE": 0.1}
+
+# Attributes which are not set on every item
+OPTIONAL_ATTRIBUTES = [
+    "platformInfo",
+    "expiredAt",
+    "paymentChannelId",
+    "createdAt",
+    "expiresIn",
+    "isVat",
+    "payload",
+    "guid",
+    "refreshExpiresIn",
+    "updatedAt",
+    "refreshToken",
+    "remarks",
+    "accessToken",
+]
+
+# Attributes which are unknown to the cleaner
+EXTRA_ATTRIBUTES = {
+    "sellerId": lambda rng: {"S": str(rng.randint(1, 10**9))},
+    "region": lambda rng: {"S": rng.choice(["TH", "SG", "MY"])},
+    "syncCount": lambda rng: {"N": str(rng.randint(0, 1000))},
+    "tags": lambda rng: {"SS": ["orders", "products"]},
+    "settings": lambda rng: {
+        "M": {"autoSync": {"BOOL": True}, "interval": {"N": "3600"}}
+    },
+}
+
+
+def make_image(
+    rng: random.Random,
+    company_id: str,
+    shop_id: str,
+    created_at: int,
+    missing_rate: float,
+    extra_rate: float,
+) -> Dict[str, dict]:
+    image = {
+        "companyId": {"N": company_id},
+        "shopId": {"S": shop_id},
+        "isDelete": {"BOOL": False},
+        "platformName": {"S": rng.choice(["lazada", "shopee"])},
+        "userId": {"N": str(rng.randint(1, 1_000_000))},
+        "platformInfo": {"S": json.dumps({"country": "TH", "name": "shop"})},
+        "expiredAt": {"N": str(created_at + 604800)},
+        "paymentChannelId": {"N": str(rng.randint(1, 50))},
+        "createdAt": {"N": str(created_at)},
+        "expiresIn": {"N": "604800"},
+        "isVat": {"BOOL": rng.random() < 0.5},
+        "payload": {"S": "{}"},
+        "guid": {"S": f"{rng.getrandbits(128):032x}"},
+        "refreshExpiresIn": {"N": "2592000"},
+        "updatedAt": {"N": str(created_at + rng.randint(0, 86400))},
+        "refreshToken": {"S": f"{rng.getrandbits(128):032x}"},
+        "remarks": {"NULL": True},
+        "accessToken": {"S": f"{rng.getrandbits(128):032x}"},
+    }
+    for name in OPTIONAL_ATTRIBUTES:
+        if rng.random() < missing_rate:
+            del image[name]
+    for name, make_value in EXTRA_ATTRIBUTES.items():
+        if rng.random() < extra_rate:
+            image[name] = make_value(rng)
+    return image
+
+
+def iter_cdc_records(
+    count: int,
+    seed: int = 0,
+    event_mix: Dict[str, float] = DEFAULT_EVENT_MIX,
+    companies: int = 500_000,
+    missing_rate: float = 0.3,
+    extra_rate: float = 0.05,
+    start_time: int = 1646021721575,
+) -> Iterator[dict]:
+    """Yield stream records as delivered by Firehose, one change per record.
+
+    MODIFY records carry both images and REMOVE records only the old one,
+    like a NEW_AND_OLD_IMAGES stream. Each optional attribute is missing
+    with missing_rate and each extra attribute is added with extra_rate.
+    """
+
+    rng = random.Random(seed)
+    event_names, weights = zip(*event_mix.items())
+    for i in range(count):
+        event_name = rng.choices(event_names, weights)[0]
+        company_id = str(rng.randint(1, companies))
+        shop_id = str(rng.randint(0, 10))
+        created_at = start_time // 1000 - rng.randint(0, 86400 * 365)
+
+        dynamodb = {
+            "ApproximateCreationDateTime": start_time + i,
+            "Keys": {"companyId": {"N": company_id}, "shopId": {"S": shop_id}},
+        }
+        if event_name != "REMOVE":
+            dynamodb["NewImage"] = make_image(
+                rng, company_id, shop_id, created_at, missing_rate, extra_rate
+            )
+        if event_name != "INSERT":
+            dynamodb["OldImage"] = make_image(
+                rng, company_id, shop_id, created_at, missing_rate, extra_rate
+            )
+        dynamodb["SizeBytes"] = 100 + 20 * len(
+            dynamodb.get("NewImage") or dynamodb["OldImage"]
+        )
+
+        yield {
+            "awsRegion": "ap-southeast-1",
+            "eventID": f"{rng.getrandbits(128):032x}",
+            "eventName": event_name,
+            "userIdentity": None,
+            "recordFormat": "application/json",
+            "tableName": TABLE_NAME,
+            "dynamodb": dynamodb,
+            "eventSource": "aws:dynamodb",
+        }
+
+
+def make_cdc_records(count: int, seed: int = 0, **kwargs) -> List[dict]:
+    return list(iter_cdc_records(count, seed=seed, **kwargs))
+
+
+def make_cdc_lines(count: int, seed: int = 0, **kwargs) -> List[bytes]:
+    """Make newline delimited JSON lines of a Firehose CDC object."""
+
+    return [
+        json.dumps(record).encode("utf-8")
+        for record in iter_cdc_records(count, seed=seed, **kwargs)
+    ]
@@ -0,0 +1,154 @@
+"""Local stub of the HubSpot companies batch update API.
+
+Serves POST /crm/v3/objects/companies/batch/update on localhost like
+HubSpot does, with a configurable latency and rate limit, for tests and
+benchmarks of clients created with `api_factory=stub.api_factory`.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+BATCH_UPDATE_PATH = "/crm/v3/objects/companies/batch/update"
+
+
+class HubSpotStub:
+    """Serve batch updates in a background thread until stopped.
+
+    Requests beyond `requests_per_second`, counted per second, are answered
+    with 429 and a Retry-After of `retry_after` seconds. Statuses listed in
+    `fail_statuses` are returned for the first requests, in order.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        requests_per_second: Optional[float] = None,
+        retry_after: Optional[float] = None,
+        fail_statuses: Optional[List[int]] = None,
+    ):
+        self.latency = latency
+        self.requests_per_second = requests_per_second
+        self.retry_after = retry_after
+        self.fail_statuses = list(fail_statuses or [])
+        self.batches: List[List[dict]] = []
+        self.statuses: List[int] = []
+        self.window = (0, 0)
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def api_factory(self, api_client_package, api_name: str, config: dict):
+        """Create HubSpot APIs sending requests to the stub.
+
+        hubspot-api-client 4 ignores `host` of `hubspot.Client.create`, so
+        APIs are configured by this factory instead.
+        """
+
+        configuration = api_client_package.Configuration()
+        configuration.host = self.url
+        configuration.access_token = config.get("access_token")
+        if config.get("retry") is not None:
+            configuration.retries = config["retry"]
+        api_client = api_client_package.ApiClient(configuration=configuration)
+        return getattr(api_client_package, api_name)(api_client=api_client)
+
+    @property
+    def updated(self) -> int:
+        return sum(len(batch) for batch in self.batches)
+
+    def start(self) -> "HubSpotStub":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "HubSpotStub":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def get_status(self) -> int:
+        with self.lock:
+            if len(self.fail_statuses) > 0:
+                return self.fail_statuses.pop(0)
+
+            if self.requests_per_second is not None:
+                second, count = self.window
+                now = int(time.monotonic())
+                count = count + 1 if now == second else 1
+                self.window = (now, count)
+                if count > self.requests_per_second:
+                    return 429
+        return 200
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path.split("?")[0] != BATCH_UPDATE_PATH:
+                    self.reply(404, {"status": "error", "message": "Not found"})
+                    return
+
+                time.sleep(stub.latency)
+                status = stub.get_status()
+                with stub.lock:
+                    stub.statuses.append(status)
+                if status != 200:
+                    self.reply(status, {"status": "error", "category": "RATE_LIMITS"})
+                    return
+
+                inputs = json.loads(body)["inputs"]
+                with stub.lock:
+                    stub.batches.append(inputs)
+
+                now = datetime.now(timezone.utc).isoformat()
+                self.reply(
+                    200,
+                    {
+                        "status": "COMPLETE",
+                        "results": [
+                            {
+                                "id": str(item["id"]),
+                                "properties": item.get("properties", {}),
+                                "createdAt": now,
+                                "updatedAt": now,
+                                "archived": False,
+                            }
+                            for item in inputs
+                        ],
+                        "startedAt": now,
+                        "completedAt": now,
+                    },
+                )
+
+            def reply(self, status: int, payload: dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429 and stub.retry_after is not None:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
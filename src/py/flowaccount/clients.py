@@ -0,0 +1,211 @@
+import base64
+import functools
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import boto3
+
+# Rotated secrets are picked up by warm containers after this many seconds
+DEFAULT_SECRET_TTL = 300.0
+
+# Connections idle for longer are checked before reuse, as the cluster or a
+# NAT gateway may have dropped them without closing them on this side
+DEFAULT_CONNECTION_CHECK_AFTER = 30.0
+
+_lock = threading.Lock()
+_boto3_clients: Dict[Tuple, Any] = {}
+_psycopg2_connections: Dict[Tuple[str, str], Any] = {}
+_psycopg2_last_used: Dict[Tuple[str, str], float] = {}
+_hubspot_clients: Dict[str, Any] = {}
+
+
+def get_client(service_name: str, **kwargs):
+    """Get a boto3 client, created once per service and arguments.
+
+    Clients live in module state, so warm invocations reuse them along with
+    their connection pools.
+    """
+
+    key = (service_name, tuple(sorted(kwargs.items())))
+    client = _boto3_clients.get(key)
+    if client is None:
+        # Creating clients from the default session is not thread safe
+        with _lock:
+            client = _boto3_clients.get(key)
+            if client is None:
+                client = _boto3_clients[key] = boto3.client(service_name, **kwargs)
+    return client
+
+
+class SecretCache:
+    """Cache decoded Secrets Manager secrets in module state for a TTL.
+
+    Invalidate a secret when it fails authentication, e.g. after rotation,
+    so the next get fetches it again.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_SECRET_TTL):
+        self.ttl = ttl
+        self.secrets: Dict[str, Tuple[float, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, secret_id: str) -> dict:
+        cached = self.secrets.get(secret_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        resp = get_client("secretsmanager").get_secret_value(SecretId=secret_id)
+        if "SecretString" in resp:
+            secret = json.loads(resp["SecretString"])
+        else:
+            secret = json.loads(base64.b64decode(resp["SecretBinary"]))
+
+        self.secrets[secret_id] = (time.monotonic(), secret)
+        return secret
+
+    def invalidate(self, secret_id: Optional[str] = None):
+        if secret_id is None:
+            self.secrets.clear()
+        else:
+            self.secrets.pop(secret_id, None)
+
+
+secrets = SecretCache()
+
+
+def get_secret(secret_id: str) -> dict:
+    """Get a JSON secret from Secrets Manager, cached for a TTL."""
+
+    return secrets.get(secret_id)
+
+
+def is_psycopg2_auth_failure(error: Exception) -> bool:
+    return "password authentication failed" in str(error)
+
+
+def is_psycopg2_alive(conn) -> bool:
+    import psycopg2
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        conn.rollback()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+    return True
+
+
+def get_psycopg2_connection(
+    secret_id: str,
+    dbname: str,
+    check_after: float = DEFAULT_CONNECTION_CHECK_AFTER,
+):
+    """Get a psycopg2 connection with a RedShift credential secret.
+
+    The connection is reused by warm invocations until it is closed. When
+    it has not been got for longer than `check_after` seconds, it is checked
+    with `SELECT 1` and replaced if broken. A failed authentication
+    invalidates the cached secret and connects once more with a fetched
+    secret.
+    """
+
+    import psycopg2
+
+    key = (secret_id, dbname)
+    conn = _psycopg2_connections.get(key)
+    if conn is not None and not conn.closed:
+        idle = time.monotonic() - _psycopg2_last_used.get(key, 0.0)
+        if idle <= check_after or is_psycopg2_alive(conn):
+            _psycopg2_last_used[key] = time.monotonic()
+            return conn
+        print("Reconnect psycopg2 connection")
+        invalidate_psycopg2_connection(secret_id, dbname)
+
+    def connect():
+        secret = get_secret(secret_id)
+        return psycopg2.connect(
+            host=secret["host"],
+            port=secret["port"],
+            dbname=dbname,
+            user=secret["username"],
+            password=secret["password"],
+        )
+
+    try:
+        conn = connect()
+    except psycopg2.OperationalError as e:
+        if not is_psycopg2_auth_failure(e):
+            raise
+        secrets.invalidate(secret_id)
+        conn = connect()
+
+    _psycopg2_connections[key] = conn
+    _psycopg2_last_used[key] = time.monotonic()
+    return conn
+
+
+def invalidate_psycopg2_connection(secret_id: str, dbname: str):
+    """Close and forget a connection, e.g. after a connection error."""
+
+    import psycopg2
+
+    _psycopg2_last_used.pop((secret_id, dbname), None)
+    conn = _psycopg2_connections.pop((secret_id, dbname), None)
+    if conn is not None and not conn.closed:
+        try:
+            conn.close()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            pass
+
+
+def invalidate_psycopg2_connection_on_error(secret_id: str, dbname: str):
+    """Decorate a handler to forget its connection on connection errors.
+
+    The error is raised again, and the next invocation connects anew.
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            import psycopg2
+
+            try:
+                return handler(*args, **kwargs)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                invalidate_psycopg2_connection(secret_id, dbname)
+                raise
+
+        return wrapper
+
+    return decorator
+
+
+def get_hubspot_client(secret_id: str, key: str = "HUBSPOT_ACCESS_TOKEN"):
+    """Get a HubSpot client with an access token secret, created once."""
+
+    import hubspot
+
+    client = _hubspot_clients.get(secret_id)
+    if client is None:
+        access_token = get_secret(secret_id)[key]
+        client = _hubspot_clients[secret_id] = hubspot.Client.create(
+            access_token=access_token
+        )
+    return client
+
+
+def is_hubspot_auth_failure(error: Exception) -> bool:
+    return getattr(error, "status", None) == 401
+
+
+def invalidate_hubspot_client(secret_id: str):
+    """Forget a client and its token, e.g. when HubSpot answers 401."""
+
+    _hubspot_clients.pop(secret_id, None)
+    secrets.invalidate(secret_id)
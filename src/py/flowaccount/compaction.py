@@ -0,0 +1,241 @@
+import io
+import math
+import uuid
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from flowaccount.parquet import format_partition_path
+from flowaccount.utils import chunked, map_concurrently
+
+# pandas and pyarrow are imported when files are compacted, so invocations
+# finding nothing to compact skip their import
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_TARGET_FILE_SIZE = 128 * 1024 * 1024
+
+# Compacted files are staged in a hidden directory of the partition, which is
+# skipped by Athena, Spectrum and Hive readers of the partition directory
+COMPACTED_DIR = "_compacted"
+
+
+def split_s3_uri(uri: str) -> Tuple[str, str]:
+    """Split s3://bucket/prefix into bucket and prefix."""
+
+    bucket, _, prefix = uri[len("s3://") :].partition("/")
+    return bucket, prefix
+
+
+def list_parquet_files(
+    s3, bucket: str, prefix: str, modified_since: Optional[datetime] = None
+) -> Dict[str, int]:
+    """List sizes of parquet files directly under a prefix by key, only of
+    files modified since the given time if any."""
+
+    files = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith(".parquet"):
+                continue
+            # Modified times are in whole seconds, so files of the same
+            # second are listed rather than missed
+            if modified_since is not None and obj["LastModified"] < modified_since:
+                continue
+            files[obj["Key"]] = obj["Size"]
+    return files
+
+
+def get_compacted_at(location: str) -> Optional[datetime]:
+    """Get when files of a compacted location were listed, from its run ID.
+
+    Returns None for locations which are not compacted.
+    """
+
+    parts = location.rstrip("/").split("/")
+    if len(parts) < 2 or parts[-2] != COMPACTED_DIR:
+        return None
+    try:
+        compacted_at = datetime.strptime(parts[-1].split("-")[0], "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+    return compacted_at.replace(tzinfo=timezone.utc)
+
+
+def list_late_files(s3, hive_location: str, location: str) -> Dict[str, int]:
+    """List parquet files of a Hive partition directory written after the
+    partition was compacted to location.
+
+    Files of a partition which was never compacted are all listed.
+    """
+
+    bucket, prefix = split_s3_uri(hive_location)
+    return list_parquet_files(
+        s3, bucket, prefix, modified_since=get_compacted_at(location)
+    )
+
+
+def read_parquet_files(s3, bucket: str, keys: List[str]) -> "pd.DataFrame":
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    def read(key: str) -> pd.DataFrame:
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return pq.read_table(io.BytesIO(body)).to_pandas()
+
+    # Files may have different columns, which are unioned by concat
+    return pd.concat(map_concurrently(read, keys), ignore_index=True)
+
+
+def write_parquet_file(
+    s3, bucket: str, key: str, df: "pd.DataFrame", compression: str = "snappy"
+) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        buffer,
+        compression=compression,
+    )
+    body = buffer.getvalue()
+    s3.put_object(Bucket=bucket, Key=key, Body=body)
+    return len(body)
+
+
+def delete_files(s3, bucket: str, keys: List[str]):
+    for chunk in chunked(keys, 1000):
+        response = s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+        )
+        if response.get("Errors"):
+            raise RuntimeError(
+                f"Failed to delete compacted files: {response['Errors']}"
+            )
+
+
+def compact_partition(
+    s3,
+    glue,
+    database: str,
+    table: str,
+    values: List[str],
+    sort_by: List[str],
+    target_file_size: int = DEFAULT_TARGET_FILE_SIZE,
+    min_files: int = 2,
+    delete_sources: bool = True,
+) -> dict:
+    """Merge small parquet files of a catalog partition into target-sized files.
+
+    Rows are sorted by the given columns and written to a new directory of
+    the partition. The partition location in Glue catalog is then switched
+    to that directory with a single update, so catalog readers either see
+    the old files or the compacted ones, never both. Source files are
+    deleted afterwards.
+
+    Sources are the files at the current partition location plus files
+    written to the Hive partition directory since the last compaction, e.g.
+    late or replayed files.
+    The whole partition is loaded into memory, so compaction is meant for
+    closed partitions which no longer receive new files.
+
+    A compacted partition without new files in its Hive directory is
+    skipped, and so is a partition whose files cannot be merged into fewer
+    target-sized files, so running compaction again is cheap.
+    """
+
+    table_info = glue.get_table(DatabaseName=database, Name=table)["Table"]
+    partition = glue.get_partition(
+        DatabaseName=database, TableName=table, PartitionValues=values
+    )["Partition"]
+
+    partition_cols = [key["Name"] for key in table_info["PartitionKeys"]]
+    table_location = table_info["StorageDescriptor"]["Location"].rstrip("/")
+    hive_location = f"{table_location}/{format_partition_path(partition_cols, values)}/"
+    location = partition["StorageDescriptor"]["Location"].rstrip("/") + "/"
+
+    # Files written from now on are left to the next compaction
+    run_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    bucket, prefix = split_s3_uri(location)
+    files = list_parquet_files(s3, bucket, prefix)
+    new_files = {}
+    if location != hive_location:
+        new_files = list_late_files(s3, hive_location, location)
+        files.update(new_files)
+
+    result = {
+        "partition": values,
+        "previous_location": location,
+        "location": location,
+        "files_before": len(files),
+        "files_after": len(files),
+        "bytes_read": 0,
+        "bytes_written": 0,
+        "rows": 0,
+        "skipped": True,
+    }
+    if len(files) < min_files:
+        return result
+
+    # Already compacted and no late files
+    if location != hive_location and len(new_files) == 0:
+        return result
+
+    # Files are already as few as target-sized files would be
+    if len(files) <= math.ceil(sum(files.values()) / target_file_size):
+        return result
+
+    df = read_parquet_files(s3, bucket, list(files.keys()))
+    bytes_read = sum(files.values())
+    df = df.sort_values(
+        [col for col in sort_by if col in df.columns],
+        kind="mergesort",
+        na_position="last",
+        ignore_index=True,
+    )
+
+    # Estimate rows per file from the compressed size of the sources
+    rows_per_file = max(1, int(target_file_size * df.shape[0] / max(1, bytes_read)))
+
+    new_location = f"{hive_location}{COMPACTED_DIR}/{run_id}/"
+    _, new_prefix = split_s3_uri(new_location)
+
+    bytes_written, files_after = 0, 0
+    for start in range(0, df.shape[0], rows_per_file):
+        key = f"{new_prefix}part-{files_after:05d}.snappy.parquet"
+        bytes_written += write_parquet_file(
+            s3, bucket, key, df.iloc[start : start + rows_per_file]
+        )
+        files_after += 1
+
+    # Swap partition location
+    glue.update_partition(
+        DatabaseName=database,
+        TableName=table,
+        PartitionValueList=values,
+        PartitionInput={
+            "Values": partition["Values"],
+            "StorageDescriptor": dict(
+                partition["StorageDescriptor"], Location=new_location
+            ),
+            "Parameters": partition.get("Parameters", {}),
+        },
+    )
+
+    if delete_sources:
+        delete_files(s3, bucket, list(files.keys()))
+
+    result.update(
+        {
+            "location": new_location,
+            "files_after": files_after,
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+            "rows": df.shape[0],
+            "skipped": False,
+        }
+    )
+    return result
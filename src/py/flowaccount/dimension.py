@@ -0,0 +1,221 @@
+import os
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from flowaccount.utils import chunked
+
+# pandas and pyarrow are imported when rows are loaded or fetched, so
+# creating a cache in module state stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Fetch dimension rows whose surrogate key is greater than the given key
+DimensionFetcher = Callable[[int], "pd.DataFrame"]
+
+# Fetch dimension rows matching the given natural keys
+DimensionKeyFetcher = Callable[[List], "pd.DataFrame"]
+
+
+class DimensionCache:
+    """Cache an append-only dimension table mapping natural to surrogate keys.
+
+    Rows are kept in module state and in a local parquet file, e.g. under
+    /tmp, so warm Lambda containers keep them across invocations. Refreshing
+    only fetches rows with surrogate keys above the cached maximum, so rows
+    updated or deleted in place are not picked up. Duplicate natural keys
+    resolve to the lowest surrogate key.
+
+    IDENTITY keys may be committed out of order, so a row below the cached
+    maximum can appear after a refresh. Natural keys still missing must be
+    fetched by key with `refresh_keys` before inserting them.
+    """
+
+    def __init__(
+        self,
+        natural_key: str,
+        surrogate_key: str,
+        path: Optional[str] = None,
+    ):
+        self.natural_key = natural_key
+        self.surrogate_key = surrogate_key
+        self.path = path
+        self.df: Optional["pd.DataFrame"] = None
+        self.unique_df: Optional["pd.DataFrame"] = None
+        self.index: Optional["pd.Index"] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.fetched_rows = 0
+
+    @property
+    def max_key(self) -> int:
+        if self.df is None or self.df.shape[0] == 0:
+            return 0
+        return int(self.df[self.surrogate_key].max())
+
+    def load(self) -> bool:
+        """Load cached rows from the local file if not in memory yet."""
+
+        if self.df is not None:
+            return True
+        if self.path is None or not os.path.exists(self.path):
+            return False
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            df = pq.read_table(self.path).to_pandas()
+        except (OSError, pa.ArrowInvalid) as e:
+            print(f"Ignore unreadable dimension cache {self.path}: {e}")
+            return False
+
+        self._set(df)
+        return True
+
+    def refresh(self, fetch: DimensionFetcher) -> int:
+        """Fetch new rows above the cached maximum key and save them.
+
+        Returns the number of fetched rows.
+        """
+
+        import pandas as pd
+
+        self.load()
+        new_df = fetch(self.max_key)[[self.surrogate_key, self.natural_key]]
+        self.refreshes += 1
+        self.fetched_rows += new_df.shape[0]
+
+        if self.df is not None and new_df.shape[0] == 0:
+            return 0
+
+        frames = [new_df] if self.df is None else [self.df, new_df]
+        self._set(pd.concat(frames, ignore_index=True))
+        self._save()
+        return new_df.shape[0]
+
+    def refresh_keys(
+        self, keys: Iterable, fetch_keys: DimensionKeyFetcher, chunk_size: int = 1000
+    ) -> int:
+        """Fetch rows of natural keys missing from the cache and save them.
+
+        Returns the number of fetched rows.
+        """
+
+        import pandas as pd
+
+        self.load()
+        keys = pd.Index(keys).drop_duplicates()
+        if self.index is not None:
+            keys = keys[self.index.get_indexer(keys) < 0]
+        missing = keys.tolist()
+        if len(missing) == 0:
+            return 0
+
+        frames = [
+            fetch_keys(chunk)[[self.surrogate_key, self.natural_key]]
+            for chunk in chunked(missing, chunk_size)
+        ]
+        new_df = pd.concat(frames, ignore_index=True)
+        self.refreshes += 1
+        self.fetched_rows += new_df.shape[0]
+        if new_df.shape[0] == 0:
+            return 0
+
+        if self.df is not None:
+            cached = new_df[self.surrogate_key].isin(self.df[self.surrogate_key])
+            new_df = new_df[~cached]
+            frames = [self.df, new_df]
+        else:
+            frames = [new_df]
+        self._set(pd.concat(frames, ignore_index=True))
+        self._save()
+        return new_df.shape[0]
+
+    def lookup(
+        self,
+        keys: Iterable,
+        fetch: DimensionFetcher,
+        fetch_keys: Optional[DimensionKeyFetcher] = None,
+    ) -> "pd.DataFrame":
+        """Get surrogate and natural keys of rows matching natural keys.
+
+        Keys missing from the cache trigger one refresh, then are fetched by
+        key if `fetch_keys` is given. Keys missing after that are left out
+        of the result.
+        """
+
+        import pandas as pd
+
+        keys = pd.Index(keys).drop_duplicates()
+        refreshed = not self.load()
+        if refreshed:
+            self.refresh(fetch)
+
+        positions = self.index.get_indexer(keys)
+        missing = int((positions < 0).sum())
+        self.hits += len(keys) - missing
+        self.misses += missing
+
+        if missing > 0 and not refreshed:
+            self.refresh(fetch)
+            positions = self.index.get_indexer(keys)
+        if (positions < 0).any() and fetch_keys is not None:
+            self.refresh_keys(keys[positions < 0], fetch_keys)
+            positions = self.index.get_indexer(keys)
+
+        rows = self.unique_df.iloc[positions[positions >= 0]]
+        return rows.reset_index(drop=True)
+
+    def snapshot(self) -> Optional["pd.DataFrame"]:
+        """Get the cached rows, to restore them with `restore`."""
+
+        self.load()
+        return self.df
+
+    def restore(self, df: Optional["pd.DataFrame"]):
+        """Replace the cached rows with a snapshot, e.g. taken before a
+        transaction rolled back, dropping every row fetched since."""
+
+        if df is self.df:
+            return
+
+        if df is None:
+            self.df = self.unique_df = self.index = None
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+            return
+
+        self._set(df)
+        self._save()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rows": 0 if self.df is None else self.df.shape[0],
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "fetched_rows": self.fetched_rows,
+        }
+
+    def _set(self, df: "pd.DataFrame"):
+        import pandas as pd
+
+        self.df = df.sort_values(self.surrogate_key, kind="mergesort")
+        self.df = self.df.reset_index(drop=True)
+        self.unique_df = self.df.drop_duplicates(self.natural_key)
+        self.unique_df = self.unique_df.reset_index(drop=True)
+        self.index = pd.Index(self.unique_df[self.natural_key])
+
+    def _save(self):
+        if self.path is None:
+            return
+
+        # Replace the file at once so a timed out invocation cannot leave
+        # a partial cache behind
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tmp_path = f"{self.path}.tmp"
+        table = pa.Table.from_pandas(self.df, preserve_index=False)
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path)
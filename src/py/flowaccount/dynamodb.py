@@ -0,0 +1,153 @@
+import gzip
+import json
+from typing import (IO, TYPE_CHECKING, Any, Callable, Dict, Iterator, List,
+                    Optional)
+
+# pandas and numpy are imported by the converters, so deserializing
+# attributes and reading export items stay cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# DynamoDB JSON attribute types holding a single value
+SCALAR_TYPES = {"S", "N", "B", "BOOL"}
+
+
+def deserialize_attribute(attribute: dict) -> Any:
+    """Convert DynamoDB JSON attribute e.g. {"N": "1"} to a Python value.
+
+    Numbers are kept as strings to avoid losing precision.
+    """
+
+    ((attr_type, value),) = attribute.items()
+    if attr_type in SCALAR_TYPES:
+        return value
+    if attr_type == "NULL":
+        return None
+    if attr_type == "M":
+        return {k: deserialize_attribute(v) for k, v in value.items()}
+    if attr_type == "L":
+        return [deserialize_attribute(v) for v in value]
+    if attr_type in ("SS", "NS", "BS"):
+        return list(value)
+    raise ValueError(f"Unknown DynamoDB attribute type: {attr_type}")
+
+
+def iter_export_items(fileobj: IO[bytes]) -> Iterator[Dict[str, dict]]:
+    """Yield items of a gzip DynamoDB JSON export data file as it is read."""
+
+    with gzip.GzipFile(fileobj=fileobj, mode="rb") as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)["Item"]
+
+
+def to_int_array(values: List[Any]) -> "pd.api.extensions.ExtensionArray":
+    import pandas as pd
+
+    numbers = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce")
+    return numbers.astype("Int64").array
+
+
+def to_datetime_array(values: List[Any], unit: str = "s") -> "np.ndarray":
+    """Convert epoch numbers to datetime64[ns] without going through float."""
+
+    import numpy as np
+
+    ints = to_int_array(values)
+    mask = ints.isna()
+    epochs = ints.to_numpy(dtype="int64", na_value=0).astype(f"datetime64[{unit}]")
+    result = epochs.astype("datetime64[ns]")
+    result[mask] = np.datetime64("NaT")
+    return result
+
+
+def to_string_array(values: List[Any]) -> "pd.api.extensions.ExtensionArray":
+    import pandas as pd
+
+    strings = [v if v is None or isinstance(v, str) else json.dumps(v) for v in values]
+    return pd.array(strings, dtype="string")
+
+
+def to_boolean_array(values: List[Any]) -> "pd.api.extensions.ExtensionArray":
+    import pandas as pd
+
+    return pd.array(
+        [v if isinstance(v, bool) else None for v in values], dtype="boolean"
+    )
+
+
+class ItemDecoder:
+    """Decode DynamoDB JSON items into typed columns in a single pass.
+
+    Values are appended into one Python list per column and converted to the
+    dtypes in `dtypes` once at the end. Attributes without a registered dtype
+    are kept as extra object columns holding their raw values.
+    """
+
+    def __init__(
+        self,
+        dtypes: Dict[str, str],
+        column_name: Callable[[str], str],
+        datetime_units: Optional[Dict[str, str]] = None,
+    ):
+        self.dtypes = dtypes
+        self.column_name = column_name
+        self.datetime_units = datetime_units or {}
+        self.columns: Dict[str, List[Any]] = {col: [] for col in dtypes}
+        self.extra_columns: Dict[str, List[Any]] = {}
+        self.names: Dict[str, str] = {}
+        self.count = 0
+
+    def append(self, item: Dict[str, dict], **values: Any):
+        """Append an item with attribute values and plain column values."""
+
+        row = self.count
+        for attr, attribute in item.items():
+            name = self.names.get(attr)
+            if name is None:
+                name = self.names[attr] = self.column_name(attr)
+            values[name] = deserialize_attribute(attribute)
+
+        for name, value in values.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.extra_columns.get(name)
+                if column is None:
+                    column = self.extra_columns[name] = [None] * row
+            if len(column) > row:
+                column[row] = value
+            else:
+                column.extend([None] * (row - len(column)))
+                column.append(value)
+
+        self.count += 1
+
+    def to_frame(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        data = {}
+        for col, dtype in self.dtypes.items():
+            data[col] = self._to_array(col, dtype, self._pad(self.columns[col]))
+        for col, values in self.extra_columns.items():
+            data[col] = pd.array(self._pad(values), dtype="object")
+        return pd.DataFrame(data, index=pd.RangeIndex(self.count))
+
+    def _pad(self, values: List[Any]) -> List[Any]:
+        if len(values) < self.count:
+            values.extend([None] * (self.count - len(values)))
+        return values
+
+    def _to_array(self, col: str, dtype: str, values: List[Any]):
+        if dtype == "Int64":
+            return to_int_array(values)
+        if dtype.startswith("datetime64"):
+            return to_datetime_array(values, self.datetime_units.get(col, "s"))
+        if dtype == "string":
+            return to_string_array(values)
+        if dtype == "boolean":
+            return to_boolean_array(values)
+
+        import pandas as pd
+
+        return pd.Series(values, dtype="object").astype(dtype).array
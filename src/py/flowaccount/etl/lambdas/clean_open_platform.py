@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional, Set
 
 import pandas as pd
-from flowaccount.utils import format_snake_case
+from flowaccount.dynamodb import ItemDecoder
+from flowaccount.utils import column_names
 
 CLEAN_CDC_DTYPES = {
     # Partition columns
@@ -35,6 +36,10 @@ CLEAN_CDC_DTYPES = {
 
 CLEAN_CDC_COLUMNS = list(CLEAN_CDC_DTYPES.keys())
 
+PARTITION_COLUMNS = ["year", "month"]
+
+LATEST_KEY_COLUMNS = ["company_id", "platform_name"]
+
 
 def clean_open_platform_cdc(cdc_list: List[dict]) -> pd.DataFrame:
     """Clean DynamoDB open-platform-company-user-v2 table's CDC."""
@@ -46,103 +51,73 @@ def clean_open_platform_cdc(cdc_list: List[dict]) -> pd.DataFrame:
     if len(cdc_list) == 0:
         return clean_df
 
-    raw_df = pd.DataFrame(
-        cdc_list,
-        columns=[
-            "awsRegion",
-            "eventID",
-            "eventName",
-            "userIdentity",
-            "recordFormat",
-            "tableName",
-            "dynamodb",
-            "eventSource",
-        ],
+    # Decode records straight into typed columns. Partition columns are
+    # derived from the creation time afterwards.
+    decoder = ItemDecoder(
+        {k: v for k, v in CLEAN_CDC_DTYPES.items() if k not in PARTITION_COLUMNS},
+        column_name=column_names.translate,
+        datetime_units={"approximate_creation_date_time": "ms"},
     )
+    for record in cdc_list:
+        dynamodb = record.get("dynamodb") or {}
 
-    # Extract fields in dynamodb column
-    dynamodb_df = pd.concat(
-        [
-            pd.DataFrame(
-                columns=[
-                    "ApproximateCreationDateTime",
-                    "Keys",
-                    "NewImage",
-                    "OldImage",
-                    "SizeBytes",
-                ]
-            ),
-            pd.json_normalize(raw_df["dynamodb"], max_level=0),
-        ]
-    )
-    df = pd.concat([raw_df, dynamodb_df], axis=1)
-    df = df.drop(columns=["dynamodb"])
-
-    # Consolidate record data
-    df["NewImage"] = df["NewImage"].fillna(df["OldImage"])
-    df = df.rename(columns={"NewImage": "Image"})
-    df = df.drop(columns=["OldImage"])
-
-    # Drop Keys column too because their values are already included in Image column
-    df = df.drop(columns=["Keys"])
-
-    # Extract fields in Image column
-    image_df = pd.json_normalize(df["Image"]).rename(columns=lambda x: x.rsplit(".")[0])
-    df = pd.concat([df, image_df], axis=1)
-    df = df.drop(columns=["Image"])
-
-    # Convert pascal case to camel case
-    df = df.rename(columns=lambda x: x[0].lower() + x[1:] if x[0].isupper() else x)
-    df = df.rename(columns={"eventID": "event_id"})
-
-    # Convert camel case to snake case
-    df = df.rename(columns=format_snake_case)
-
-    # Insert records with arbitrary columns
-    clean_df = pd.concat([clean_df, df])
-
-    # Drop unneeded columns
-    clean_df = clean_df.drop(
-        columns=[
-            "aws_region",
-            "user_identity",
-            "record_format",
-            "event_source",
-            "size_bytes",
-            "year",
-            "month",
-        ]
-    )
+        # Consolidate record data, REMOVE events only have old image
+        image = dynamodb.get("NewImage") or dynamodb.get("OldImage") or {}
 
-    # Convert int columns
-    int_cols = [
-        "company_id",
-        "user_id",
-        "payment_channel_id",
-        "expires_in",
-        "refresh_expires_in",
-    ]
-    for col in int_cols:
-        clean_df[col] = pd.to_numeric(clean_df[col], errors="coerce")
-
-    # Convert datetime columns
-    clean_df["approximate_creation_date_time"] = pd.to_datetime(
-        clean_df["approximate_creation_date_time"], unit="ms"
-    )
-    clean_df["expired_at"] = pd.to_datetime(clean_df["expired_at"], unit="s")
-    clean_df["created_at"] = pd.to_datetime(clean_df["created_at"], unit="s")
-    clean_df["updated_at"] = pd.to_datetime(clean_df["updated_at"], unit="s")
+        decoder.append(
+            image,
+            event_id=record.get("eventID"),
+            event_name=record.get("eventName"),
+            table_name=record.get("tableName"),
+            approximate_creation_date_time=dynamodb.get("ApproximateCreationDateTime"),
+        )
+    clean_df = decoder.to_frame()
 
     # Add columns for partitioning
-    clean_df["year"] = clean_df["approximate_creation_date_time"].dt.year
-    clean_df["month"] = clean_df["approximate_creation_date_time"].dt.month
+    creation_time = clean_df["approximate_creation_date_time"].dt
+    clean_df["year"] = creation_time.year.astype("Int64")
+    clean_df["month"] = creation_time.month.astype("Int64")
 
     # Map platform name
-    clean_df["platform_name"] = clean_df["platform_name"].map(
-        {"lazada": "Lazada", "shopee": "Shopee"}
+    clean_df["platform_name"] = (
+        clean_df["platform_name"]
+        .map({"lazada": "Lazada", "shopee": "Shopee"})
+        .astype("string")
     )
 
-    # Enforce data types
-    clean_df = clean_df.astype(CLEAN_CDC_DTYPES)
+    return clean_df
+
+
+def drop_duplicate_events(
+    clean_df: pd.DataFrame, seen_event_ids: Optional[Set[str]] = None
+) -> pd.DataFrame:
+    """Drop records whose event ID appeared before, e.g. by Firehose retries.
+
+    Event IDs of kept records are added to `seen_event_ids`, so duplicates
+    across chunks of the same stream are dropped too.
+    """
+
+    if seen_event_ids is None:
+        seen_event_ids = set()
+
+    event_ids = clean_df["event_id"]
+    duplicated = event_ids.duplicated() | event_ids.isin(seen_event_ids)
+    clean_df = clean_df[~(duplicated & event_ids.notna()).to_numpy()]
+    seen_event_ids.update(clean_df["event_id"].dropna())
 
     return clean_df
+
+
+def collapse_latest_images(
+    clean_df: pd.DataFrame, keys: List[str] = LATEST_KEY_COLUMNS
+) -> pd.DataFrame:
+    """Keep only the latest record of each key by creation time.
+
+    Records with a missing key, e.g. platforms which are not mapped, are
+    all kept rather than collapsed into a single unknown key.
+    """
+
+    sorted_df = clean_df.sort_values("approximate_creation_date_time", kind="mergesort")
+    duplicated = sorted_df.duplicated(subset=keys, keep="last")
+    has_key = sorted_df[keys].notna().all(axis=1)
+    return sorted_df[~(duplicated & has_key).to_numpy()].sort_index()
@@ -0,0 +1,121 @@
+import zlib
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+from flowaccount.dynamodb import ItemDecoder, iter_export_items
+from flowaccount.utils import ChecksumReader, column_names, map_concurrently
+
+EXPORT_DTYPES = {
+    "company_id": "Int64",
+    "shop_id": "string",
+    "platform_info": "string",
+    "is_delete": "boolean",
+    "expired_at": "datetime64",
+    "payment_channel_id": "Int64",
+    "created_at": "datetime64",
+    "expires_in": "Int64",
+    "is_vat": "boolean",
+    "payload": "string",
+    "guid": "string",
+    "refresh_expires_in": "Int64",
+    "user_id": "Int64",
+    "updated_at": "datetime64",
+    "platform_name": "string",
+    "refresh_token": "string",
+    "remarks": "string",
+    "access_token": "string",
+    "email": "string",
+}
+
+
+def make_export_decoder() -> ItemDecoder:
+    return ItemDecoder(EXPORT_DTYPES, column_name=column_names.translate)
+
+
+class ExportFileMismatchError(ValueError):
+    """Export data file does not match its manifest entry."""
+
+    def __init__(self, key: str, field: str, expected, actual):
+        super().__init__(f"{key} {field} is {actual}, expected {expected}")
+        self.key = key
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+
+
+def read_exported_file(
+    s3,
+    bucket: str,
+    key: str,
+    md5_checksum: Optional[str] = None,
+    item_count: Optional[int] = None,
+) -> pd.DataFrame:
+    """Read a gzip DynamoDB JSON export data file into typed columns.
+
+    The object is decompressed and decoded while it is downloaded, so it is
+    never held in memory as a whole. MD5 and item count are computed on the
+    way and checked against the manifest values if given.
+    """
+
+    decoder = make_export_decoder()
+    body = ChecksumReader(s3.get_object(Bucket=bucket, Key=key)["Body"])
+    try:
+        for item in iter_export_items(body):
+            decoder.append(item)
+    except (OSError, EOFError, zlib.error, ValueError):
+        # A corrupted file is reported as a checksum mismatch
+        body.drain()
+        if md5_checksum is None or body.b64digest() == md5_checksum:
+            raise
+    body.drain()
+
+    if md5_checksum is not None and body.b64digest() != md5_checksum:
+        raise ExportFileMismatchError(
+            key, "md5_checksum", md5_checksum, body.b64digest()
+        )
+    if item_count is not None and decoder.count != item_count:
+        raise ExportFileMismatchError(key, "item_count", item_count, decoder.count)
+
+    return decoder.to_frame()
+
+
+def read_exported_files(
+    s3,
+    bucket: str,
+    files_df: pd.DataFrame,
+    max_workers: int = 8,
+    skip_mismatched: bool = False,
+) -> Tuple[pd.DataFrame, List[ExportFileMismatchError]]:
+    """Read export data files concurrently and merge them in manifest order.
+
+    Files are verified against `md5_checksum` and `item_count` columns of
+    the cleaned manifest files when present. A mismatched file fails the
+    read, or is left out and returned when `skip_mismatched` is set.
+    """
+
+    def read(file: dict) -> Union[pd.DataFrame, ExportFileMismatchError]:
+        md5_checksum = file.get("md5_checksum")
+        item_count = file.get("item_count")
+        try:
+            return read_exported_file(
+                s3,
+                bucket,
+                file["data_file_s3_key"],
+                md5_checksum=None if pd.isna(md5_checksum) else md5_checksum,
+                item_count=None if pd.isna(item_count) else int(item_count),
+            )
+        except ExportFileMismatchError as e:
+            if not skip_mismatched:
+                raise
+            return e
+
+    results = map_concurrently(
+        read, files_df.to_dict("records"), max_workers=max_workers
+    )
+    df_list = [result for result in results if isinstance(result, pd.DataFrame)]
+    mismatches = [result for result in results if not isinstance(result, pd.DataFrame)]
+    if len(df_list) == 0:
+        return make_export_decoder().to_frame(), mismatches
+
+    # Files may have different extra columns, which are unioned by concat
+    return pd.concat(df_list, ignore_index=True), mismatches
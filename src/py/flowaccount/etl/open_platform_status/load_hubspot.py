@@ -0,0 +1,134 @@
+import os
+from typing import List
+
+import awswrangler as wr
+import numpy as np
+import pandas as pd
+from flowaccount.etl.open_platform_status.platforms import (get_platform_index,
+                                                            platforms)
+
+status_columns = [platform.status_column for platform in platforms]
+snapshot_columns = ["hubspot_id"] + status_columns
+
+
+def aggregate_open_platform_status(
+    platform_df: pd.DataFrame, hubspot_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Get whether each HubSpot company is connected to each platform.
+
+    Connections not deleted are set in a boolean matrix of HubSpot
+    companies by platforms, positioned by their categorical codes.
+    Platforms not in the registry are ignored.
+    """
+
+    # Rows of HubSpot companies sorted by ID, a company may have several
+    codes, hubspot_ids = pd.factorize(hubspot_df["hubspot_id"], sort=True)
+    mapping_df = pd.DataFrame({"company_id": hubspot_df["id"], "row": codes})
+    mapping_df = mapping_df[mapping_df["row"] >= 0]
+
+    # Columns of platforms by either name
+    platform_index = get_platform_index()
+    names = list(platform_index.keys())
+    columns = np.append(np.array(list(platform_index.values())), -1)
+
+    connected_df = platform_df[~platform_df["is_delete"]]
+    name_codes = pd.Categorical(connected_df["platform_name"], categories=names).codes
+    connected_df = pd.DataFrame(
+        {
+            "company_id": connected_df["company_id"].to_numpy(),
+            "column": columns[name_codes],
+        }
+    )
+    connected_df = connected_df[connected_df["column"] >= 0].merge(
+        mapping_df, on="company_id"
+    )
+
+    matrix = np.zeros((len(hubspot_ids), len(platforms)), dtype=bool)
+    matrix[connected_df["row"].to_numpy(), connected_df["column"].to_numpy()] = True
+
+    agg_df = pd.DataFrame(matrix, columns=status_columns)
+    agg_df.insert(0, "hubspot_id", hubspot_ids)
+    return agg_df
+
+
+def convert_to_hubspot_inputs(agg_df: pd.DataFrame) -> List[dict]:
+    """Convert aggregated status to HubSpot batch update inputs.
+
+    Each row of the status matrix is encoded as bits of platforms, which
+    select one of the properties built for every combination. Inputs with
+    the same status share their properties, which must not be modified.
+    """
+
+    keys = [platform.hubspot_key for platform in platforms]
+    properties = [
+        {key: "yes" if code >> bit & 1 else "no" for bit, key in enumerate(keys)}
+        for code in range(1 << len(keys))
+    ]
+    matrix = agg_df[status_columns].to_numpy(dtype=bool)
+    codes = matrix @ (1 << np.arange(len(keys)))
+    return [
+        {"id": hubspot_id, "properties": properties[code]}
+        for hubspot_id, code in zip(agg_df["hubspot_id"].tolist(), codes.tolist())
+    ]
+
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    """Read the last pushed status of companies, empty if never written."""
+
+    if path.startswith("s3://"):
+        if not wr.s3.does_object_exist(path):
+            return pd.DataFrame(columns=snapshot_columns)
+        df = wr.s3.read_parquet(path)
+    else:
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=snapshot_columns)
+        df = pd.read_parquet(path)
+    return df[snapshot_columns]
+
+
+def write_snapshot(df: pd.DataFrame, path: str):
+    """Replace the snapshot with a single parquet file."""
+
+    df = df[snapshot_columns].reset_index(drop=True)
+    if path.startswith("s3://"):
+        wr.s3.to_parquet(df, path)
+    else:
+        # Readers never see a partially written file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+
+def get_changed_status(agg_df: pd.DataFrame, snapshot_df: pd.DataFrame) -> pd.DataFrame:
+    """Get companies whose status differs from the snapshot or is not in it."""
+
+    if snapshot_df.shape[0] == 0:
+        return agg_df
+
+    merge_df = agg_df.merge(
+        snapshot_df[snapshot_columns],
+        how="left",
+        on="hubspot_id",
+        suffixes=("", "_pushed"),
+        indicator=True,
+    )
+    changed = merge_df["_merge"] == "left_only"
+    for column in status_columns:
+        changed |= merge_df[column] != merge_df[f"{column}_pushed"]
+    return agg_df[changed.to_numpy()]
+
+
+def update_snapshot(
+    snapshot_df: pd.DataFrame, agg_df: pd.DataFrame, pushed_ids: List
+) -> pd.DataFrame:
+    """Replace the status of pushed companies in the snapshot.
+
+    Companies of failed batches keep their previous status, so they are
+    pushed again by the next run.
+    """
+
+    pushed_df = agg_df[agg_df["hubspot_id"].isin(pushed_ids)][snapshot_columns]
+    kept_df = snapshot_df[~snapshot_df["hubspot_id"].isin(pushed_df["hubspot_id"])]
+    if kept_df.shape[0] == 0:
+        return pushed_df.reset_index(drop=True)
+    return pd.concat([kept_df[snapshot_columns], pushed_df], ignore_index=True)
@@ -1,16 +1,13 @@
 import json
-from typing import List, Tuple, Union
+from typing import IO, Iterable, Iterator, List, Tuple, Union
 
-import awswrangler as wr
 import pandas as pd
+from flowaccount.etl.open_platform_status.platforms import platforms
+from flowaccount.redshift import read_sql_by_keys
+from flowaccount.utils import chunked
 from redshift_connector import Connection as RedShiftConnection
 
-platform_mapping = {
-    "Lazada": "lazada_api",
-    "Shopee": "shopee_api",
-    "K-Cash": "k_cash_connect_api",
-    "FoodStory": "foodstory_api",
-}
+platform_mapping = {platform.name: platform.hubspot_key for platform in platforms}
 supported_platforms = list(platform_mapping.keys())
 
 
@@ -24,9 +21,10 @@ def get_hubspot_mapping(
             hubspot_id,
             CAST(flowaccount_id AS BIGINT) AS company_id
         FROM {schema}.{table}
-        WHERE company_id IN ({str(companies)[1:-1]})
         """
-    rs_df = wr.redshift.read_sql_query(query, con=conn)
+    rs_df = read_sql_by_keys(
+        query, "CAST(flowaccount_id AS BIGINT)", companies, con=conn
+    )
 
     return rs_df
 
@@ -85,3 +83,40 @@ def convert_to_json_line(inputs: List[dict]) -> str:
     """Convert a list of dict into one line one json string."""
 
     return "\n".join([json.dumps(input) for input in inputs])
+
+
+def iter_hubspot_inputs(agg_df: pd.DataFrame) -> Iterator[dict]:
+    """Build HubSpot update inputs from the latest status in one pass.
+
+    Rows of a HubSpot ID are expected next to each other, as returned by
+    aggregate_latest_status.
+    """
+
+    hubspot_id, properties = None, None
+    for row_id, hubspot_key, status in zip(
+        agg_df.index.tolist(), agg_df["hubspot_key"].tolist(), agg_df["status"].tolist()
+    ):
+        if properties is None or row_id != hubspot_id:
+            if properties is not None:
+                yield {"id": hubspot_id, "properties": properties}
+            hubspot_id, properties = row_id, {}
+        properties[hubspot_key] = status
+
+    if properties is not None:
+        yield {"id": hubspot_id, "properties": properties}
+
+
+def write_json_lines(
+    fileobj: IO[bytes], inputs: Iterable[dict], chunk_size: int = 1000
+) -> int:
+    """Write inputs like convert_to_json_line, chunk by chunk.
+
+    Return the number of inputs written.
+    """
+
+    count = 0
+    for chunk in chunked(inputs, chunk_size):
+        lines = "\n".join([json.dumps(input) for input in chunk])
+        fileobj.write(("\n" + lines if count > 0 else lines).encode("utf-8"))
+        count += len(chunk)
+    return count
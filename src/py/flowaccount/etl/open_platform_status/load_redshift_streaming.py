@@ -1,4 +1,5 @@
 import pandas as pd
+from flowaccount.keys import get_date_keys, get_time_keys
 
 
 def filter_new_company(cdc_df: pd.DataFrame, company_df: pd.DataFrame) -> pd.DataFrame:
@@ -13,27 +14,9 @@ def convert_to_fact_table(
 ) -> pd.DataFrame:
     fact_df = pd.merge(cdc_df, company_df, on="company_id", how="inner")
 
-    # Create date key
-    fact_df["year"] = fact_df["approximate_creation_date_time"].dt.year
-    fact_df["month"] = fact_df["approximate_creation_date_time"].dt.month
-    fact_df["day"] = fact_df["approximate_creation_date_time"].dt.day
-    fact_df["date_key"] = pd.to_numeric(
-        fact_df["year"].astype("str")
-        + fact_df["month"].astype("str").str.zfill(2)
-        + fact_df["day"].astype("str").str.zfill(2),
-        errors="coerce",
-    )
-
-    # Create time key
-    fact_df["hour"] = fact_df["approximate_creation_date_time"].dt.hour
-    fact_df["minute"] = fact_df["approximate_creation_date_time"].dt.minute
-    fact_df["second"] = fact_df["approximate_creation_date_time"].dt.second
-    fact_df["time_key"] = pd.to_numeric(
-        fact_df["hour"].astype("str")
-        + fact_df["minute"].astype("str").str.zfill(2)
-        + fact_df["second"].astype("str").str.zfill(2),
-        errors="coerce",
-    )
+    # Create date and time keys
+    fact_df["date_key"] = get_date_keys(fact_df["approximate_creation_date_time"])
+    fact_df["time_key"] = get_time_keys(fact_df["approximate_creation_date_time"])
 
     # Rename column
     fact_df = fact_df.rename(columns={"platform_name": "platform"})
@@ -0,0 +1,30 @@
+from typing import Dict, List, NamedTuple
+
+
+class Platform(NamedTuple):
+    # Name in cleaned data, e.g. CDC cleaned by clean_open_platform
+    name: str
+    # Name in DynamoDB, kept by the Glue export
+    source_name: str
+    # HubSpot company property of the connection status
+    hubspot_key: str
+    # Column of the connection status aggregated per HubSpot company
+    status_column: str
+
+
+platforms: List[Platform] = [
+    Platform("Lazada", "lazada", "lazada_api", "has_lazada_connection"),
+    Platform("Shopee", "shopee", "shopee_api", "has_shopee_connection"),
+    Platform("K-Cash", "kcash", "k_cash_connect_api", "has_kcash_connection"),
+    Platform("FoodStory", "foodstory", "foodstory_api", "has_foodstory_connection"),
+]
+
+
+def get_platform_index() -> Dict[str, int]:
+    """Get the position of each platform by its cleaned and source name."""
+
+    index = {}
+    for i, platform in enumerate(platforms):
+        index[platform.name] = i
+        index[platform.source_name] = i
+    return index
@@ -0,0 +1,211 @@
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+COUPON_NA_KEY = 1
+
+WATERMARK_TABLE = "etl_watermarks"
+
+# Rows filled per committed batch, and hours of arrivals checked again for
+# coupons loaded into the dimension after the rows arrived
+DEFAULT_BATCH_ROWS = 1_000_000
+DEFAULT_LOOKBACK_HOURS = 24
+
+
+def fill_coupon_keys(
+    cursor,
+    fact: str,
+    dim: str,
+    condition: str = "TRUE",
+    params: Optional[dict] = None,
+) -> Tuple[int, int]:
+    """Fill missing coupon keys of fact rows matching a condition on alias f.
+
+    Rows without coupon get the N/A key, others the key of their coupon in
+    the dimension. Returns the numbers of rows filled by each.
+    """
+
+    cursor.execute(
+        f"""
+        UPDATE {fact} AS f
+        SET
+            coupon_key = {COUPON_NA_KEY}
+        WHERE f.coupon IS NULL AND f.coupon_key IS NULL AND ({condition});
+    """,
+        params,
+    )
+    na_rows = cursor.rowcount
+
+    cursor.execute(
+        f"""
+        UPDATE {fact} AS f
+        SET
+            coupon_key = d.coupon_key
+        FROM {dim} AS d
+        WHERE f.coupon_key IS NULL AND d.mysql_id = f.coupon AND ({condition});
+    """,
+        params,
+    )
+    return na_rows, cursor.rowcount
+
+
+class CouponKeyBackfill:
+    """Fill missing coupon keys of fact rows arrived since a watermark.
+
+    Rows are taken in order of an arrival timestamp column, e.g. the time
+    they were loaded, in batches of about `batch_rows` rows. Each batch is
+    committed together with the latest arrival time it covers, stored in
+    the watermark table of the fact schema, so an invocation stopped by
+    its timeout resumes from the last committed batch.
+
+    Rows arrived within `lookback_hours` before the watermark are checked
+    again on every run, as their coupons may have been loaded into the
+    dimension after them. Rows whose coupons arrive later than that, and
+    rows without arrival time, are only filled by a sweep, e.g. once a day.
+    """
+
+    def __init__(
+        self,
+        fact_schema: str,
+        fact_table: str,
+        dim_schema: str,
+        dim_table: str,
+        arrival_column: str,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+        lookback_hours: int = DEFAULT_LOOKBACK_HOURS,
+    ):
+        self.fact = f"{fact_schema}.{fact_table}"
+        self.dim = f"{dim_schema}.{dim_table}"
+        self.watermark_table = f"{fact_schema}.{WATERMARK_TABLE}"
+        self.name = f"{self.fact}.coupon_key"
+        self.arrival_column = arrival_column
+        self.batch_rows = batch_rows
+        self.lookback_hours = lookback_hours
+
+    def create_watermark_table(self, cursor):
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.watermark_table} (
+                name VARCHAR(256) NOT NULL,
+                watermark TIMESTAMP NOT NULL,
+                modified_on TIMESTAMP NOT NULL DEFAULT GETDATE()
+            )
+        """
+        )
+
+    def get_watermark(self, cursor) -> Optional[datetime]:
+        cursor.execute(
+            f"SELECT MAX(watermark) FROM {self.watermark_table} WHERE name = %s",
+            (self.name,),
+        )
+        return cursor.fetchone()[0]
+
+    def set_watermark(self, cursor, watermark: datetime):
+        cursor.execute(
+            f"DELETE FROM {self.watermark_table} WHERE name = %s", (self.name,)
+        )
+        cursor.execute(
+            f"INSERT INTO {self.watermark_table} (name, watermark) VALUES (%s, %s)",
+            (self.name, watermark),
+        )
+
+    def get_batch_end(
+        self, cursor, watermark: Optional[datetime]
+    ) -> Optional[datetime]:
+        """Get the arrival time of the last row of the batch after watermark.
+
+        Rows arrived at the same time always end up in the same batch.
+        Returns None when no rows arrived after watermark.
+        """
+
+        cursor.execute(
+            f"""
+            SELECT MAX(arrived_on)
+            FROM (
+                SELECT {self.arrival_column} AS arrived_on
+                FROM {self.fact}
+                WHERE %(watermark)s IS NULL OR {self.arrival_column} > %(watermark)s
+                ORDER BY {self.arrival_column}
+                LIMIT {int(self.batch_rows)}
+            )
+        """,
+            {"watermark": watermark},
+        )
+        return cursor.fetchone()[0]
+
+    def sweep(self, conn, watermark: Optional[datetime]) -> int:
+        """Fill rows before the lookback window or without arrival time.
+
+        The fact is scanned for them, so sweep less often than runs. Returns
+        the number of filled rows.
+        """
+
+        condition = f"f.{self.arrival_column} IS NULL"
+        if watermark is not None:
+            condition += (
+                f" OR f.{self.arrival_column} <= %(watermark)s - "
+                f"INTERVAL '{int(self.lookback_hours)} hours'"
+            )
+        with conn, conn.cursor() as cursor:
+            swept_rows = fill_coupon_keys(
+                cursor, self.fact, self.dim, condition, {"watermark": watermark}
+            )
+        return sum(swept_rows)
+
+    def run(
+        self,
+        conn,
+        has_time: Callable[[], bool] = lambda: True,
+        sweep: bool = False,
+    ) -> dict:
+        """Fill batches until no rows are left or has_time returns False.
+
+        With `sweep`, rows missed by the batches are swept first.
+        """
+
+        with conn, conn.cursor() as cursor:
+            self.create_watermark_table(cursor)
+            watermark = self.get_watermark(cursor)
+
+        result = {"batches": 0, "na_rows": 0, "key_rows": 0, "late_rows": 0}
+        if sweep:
+            result["swept_rows"] = self.sweep(conn, watermark)
+        if watermark is not None:
+            with conn, conn.cursor() as cursor:
+                late_rows = fill_coupon_keys(
+                    cursor,
+                    self.fact,
+                    self.dim,
+                    f"f.{self.arrival_column} > %(watermark)s - "
+                    f"INTERVAL '{int(self.lookback_hours)} hours' "
+                    f"AND f.{self.arrival_column} <= %(watermark)s",
+                    {"watermark": watermark},
+                )
+            result["late_rows"] = sum(late_rows)
+
+        done = False
+        while not done and has_time():
+            with conn, conn.cursor() as cursor:
+                batch_end = self.get_batch_end(cursor, watermark)
+                if batch_end is None:
+                    done = True
+                    continue
+
+                na_rows, key_rows = fill_coupon_keys(
+                    cursor,
+                    self.fact,
+                    self.dim,
+                    f"(%(start)s IS NULL OR f.{self.arrival_column} > %(start)s) "
+                    f"AND f.{self.arrival_column} <= %(end)s",
+                    {"start": watermark, "end": batch_end},
+                )
+                self.set_watermark(cursor, batch_end)
+
+            watermark = batch_end
+            result["batches"] += 1
+            result["na_rows"] += na_rows
+            result["key_rows"] += key_rows
+            print(f"Filled coupon keys of rows arrived until {watermark}")
+
+        result["watermark"] = None if watermark is None else watermark.isoformat()
+        result["done"] = done
+        return result
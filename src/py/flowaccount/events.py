@@ -0,0 +1,44 @@
+import json
+import urllib.parse
+from typing import Iterator, List, NamedTuple
+
+
+class S3Object(NamedTuple):
+    bucket: str
+    key: str
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+
+def iter_s3_objects(event: dict) -> Iterator[S3Object]:
+    """Yield S3 objects from S3, SNS-wrapped S3 and SQS batch events."""
+
+    for record in event.get("Records", []):
+        if "s3" in record:
+            yield S3Object(
+                bucket=record["s3"]["bucket"]["name"],
+                key=urllib.parse.unquote_plus(
+                    record["s3"]["object"]["key"], encoding="utf-8"
+                ),
+            )
+        elif "Sns" in record:
+            yield from iter_s3_objects(json.loads(record["Sns"]["Message"]))
+        elif record.get("eventSource") == "aws:sqs":
+            body = json.loads(record["body"])
+
+            # SNS to SQS subscription without raw message delivery
+            if body.get("Type") == "Notification":
+                body = json.loads(body["Message"])
+
+            yield from iter_s3_objects(body)
+
+
+def get_s3_objects(event: dict) -> List[S3Object]:
+    """Get distinct S3 objects referenced by an event, keeping their order.
+
+    S3 test events and records of other sources are ignored.
+    """
+
+    return list(dict.fromkeys(iter_s3_objects(event)))
@@ -0,0 +1,265 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from flowaccount.utils import chunked, map_concurrently
+
+# HubSpot rejects batch requests with more inputs
+MAX_BATCH_SIZE = 100
+
+# Private apps of Free and Starter accounts may send 100 requests per 10
+# seconds, Professional and Enterprise ones 150
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Backoff before the nth retry is drawn from 0 to base * 2^(n - 1) seconds,
+# capped at the maximum
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+
+
+class TokenBucket:
+    """Limit the rate of requests shared by threads.
+
+    Tokens are added at `rate` per second up to `capacity`, which allows
+    short bursts. Each request takes one token, waiting for it if needed.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token and return the seconds waited for it."""
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+
+            self.sleep(wait)
+            waited += wait
+
+
+def get_status(error: Exception) -> Optional[int]:
+    """Get the HTTP status of an API exception, if any."""
+
+    return getattr(error, "status", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    status = get_status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Get seconds to wait from the Retry-After header of an API exception."""
+
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class InputCoalescer:
+    """Merge batch inputs of the same object ID, later properties winning.
+
+    Merged inputs keep the position of the first input of their ID. IDs
+    are compared as strings, so 1001 and "1001" are the same object.
+    """
+
+    def __init__(self):
+        self.inputs: Dict[str, dict] = {}
+        self.count = 0
+
+    @property
+    def coalesced(self) -> int:
+        """Number of inputs merged into an earlier input of their ID."""
+
+        return self.count - len(self.inputs)
+
+    def add(self, update_input: dict):
+        self.count += 1
+        properties = update_input.get("properties") or {}
+        merged = self.inputs.get(str(update_input["id"]))
+        if merged is None:
+            self.inputs[str(update_input["id"])] = {
+                "id": update_input["id"],
+                "properties": dict(properties),
+            }
+        else:
+            merged["properties"].update(properties)
+
+    def merge(self, other: "InputCoalescer"):
+        """Add the inputs of another coalescer, e.g. of a later file."""
+
+        count = self.count + other.count
+        for update_input in other.inputs.values():
+            self.add(update_input)
+        self.count = count
+
+    def get_inputs(self) -> List[dict]:
+        return list(self.inputs.values())
+
+
+class BatchResult(NamedTuple):
+    index: int
+    size: int
+    attempts: int
+    # Seconds from the first attempt until the batch succeeded or failed,
+    # including waiting for the limiter and backoff
+    latency: float
+    error: Optional[str] = None
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+class BatchUpdater:
+    """Send batch update requests concurrently within a rate limit.
+
+    Inputs are split into batches of `batch_size`, sent by `max_workers`
+    threads with `update`, which takes a list of inputs. Every attempt
+    takes a token from `limiter`. Requests failing with 429 or 5xx are
+    retried after Retry-After, or after a backoff with full jitter. Other
+    errors, errors of the last attempt, or retries that would wait past
+    the seconds left by `remaining`, e.g. of a Lambda context, fail the
+    batch. Inputs of failed batches are kept in `failed` and reported.
+    """
+
+    def __init__(
+        self,
+        update: Callable[[List[dict]], object],
+        batch_size: int = MAX_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        limiter: Optional[TokenBucket] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        sleep: Callable[[float], None] = time.sleep,
+        remaining: Optional[Callable[[], float]] = None,
+    ):
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                f"Batch size must be from 1 to {MAX_BATCH_SIZE}: {batch_size}"
+            )
+
+        self.update = update
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.limiter = limiter or TokenBucket(DEFAULT_REQUESTS_PER_SECOND)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.remaining = remaining
+        self.failed: List[dict] = []
+
+    def get_backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    def update_batch(self, index: int, batch: List[dict]) -> BatchResult:
+        start = time.perf_counter()
+        error: Optional[Exception] = None
+        for attempt in range(1, self.max_attempts + 1):
+            if self.remaining is not None and self.remaining() <= 0:
+                error = TimeoutError("No time left to update the batch")
+                break
+
+            self.limiter.acquire()
+            try:
+                self.update(batch)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    break
+
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = self.get_backoff(attempt)
+                if self.remaining is not None and delay >= self.remaining():
+                    print(f"No time left to retry batch {index} in {delay:.2f}s")
+                    break
+                print(
+                    f"Retry batch {index} in {delay:.2f}s after status {get_status(e)}"
+                )
+                self.sleep(delay)
+
+        result = BatchResult(
+            index,
+            len(batch),
+            attempt,
+            time.perf_counter() - start,
+            None if error is None else f"{type(error).__name__}: {error}",
+        )
+        if error is None:
+            print(f"Batch {index} of {len(batch)} inputs in {result.latency:.3f}s")
+        else:
+            print(f"Failed batch {index} after {attempt} attempts: {result.error}")
+        return result
+
+    def update_all(self, inputs: List[dict]) -> Dict[str, float]:
+        """Update all inputs and return a report of the batches."""
+
+        batches = list(chunked(inputs, self.batch_size))
+        start = time.perf_counter()
+        results = map_concurrently(
+            lambda item: self.update_batch(*item),
+            enumerate(batches),
+            max_workers=self.max_workers,
+        )
+        self.failed = [
+            update_input
+            for result in results
+            if result.error is not None
+            for update_input in batches[result.index]
+        ]
+        return self.get_report(results, time.perf_counter() - start)
+
+    @staticmethod
+    def get_report(results: List[BatchResult], elapsed: float) -> Dict[str, float]:
+        failed = [result for result in results if result.error is not None]
+        latencies = [result.latency for result in results]
+        updated = sum(result.size for result in results if result.error is None)
+        return {
+            "batches": len(results),
+            "updated": updated,
+            "failed_batches": len(failed),
+            "failed_inputs": sum(result.size for result in failed),
+            "retries": sum(result.attempts - 1 for result in results),
+            "elapsed": round(elapsed, 3),
+            "inputs_per_sec": round(updated / elapsed, 1) if elapsed > 0 else 0.0,
+            "latency_p50": round(get_percentile(latencies, 50), 3),
+            "latency_p95": round(get_percentile(latencies, 95), 3),
+            "latency_max": round(max(latencies, default=0.0), 3),
+        }
@@ -0,0 +1,121 @@
+from datetime import date, time
+from typing import TYPE_CHECKING, Callable, Optional
+
+# numpy and pandas are imported by the array functions, so formatting keys
+# of scalars stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Fetch dim_date keys greater than the given key
+DateKeyFetcher = Callable[[int], "pd.Series"]
+
+
+def format_date_key(date_obj: date) -> int:
+    """Format a date as date dimension key e.g. 20220308."""
+
+    return date_obj.year * 10000 + date_obj.month * 100 + date_obj.day
+
+
+def format_time_key(time_obj: time) -> int:
+    """Format a time as time dimension key e.g. 90508 for 09:05:08."""
+
+    return time_obj.hour * 10000 + time_obj.minute * 100 + time_obj.second
+
+
+def _to_datetime64(timestamps: "pd.Series") -> "np.ndarray":
+    import pandas as pd
+
+    timestamps = pd.to_datetime(timestamps)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]")
+
+
+def _to_keys(keys: "np.ndarray", nat: "np.ndarray", index: "pd.Index") -> "pd.Series":
+    import pandas as pd
+
+    return pd.Series(pd.arrays.IntegerArray(keys, nat), index=index)
+
+
+def get_date_keys(timestamps: "pd.Series") -> "pd.Series":
+    """Get date dimension keys of timestamps with integer arithmetic.
+
+    Missing timestamps get missing keys.
+    """
+
+    import numpy as np
+
+    values = _to_datetime64(timestamps)
+    nat = np.isnat(values)
+    days = values.astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months).astype(np.int64) + 1
+
+    keys = years * 10000 + month * 100 + day
+    return _to_keys(np.where(nat, 0, keys), nat, timestamps.index)
+
+
+def get_time_keys(timestamps: "pd.Series") -> "pd.Series":
+    """Get time dimension keys of timestamps with integer arithmetic.
+
+    Missing timestamps get missing keys.
+    """
+
+    import numpy as np
+
+    values = _to_datetime64(timestamps)
+    nat = np.isnat(values)
+    seconds = (values - values.astype("datetime64[D]")).astype("timedelta64[s]")
+    seconds = seconds.astype(np.int64)
+
+    keys = seconds // 3600 * 10000 + seconds % 3600 // 60 * 100 + seconds % 60
+    return _to_keys(np.where(nat, 0, keys), nat, timestamps.index)
+
+
+class DateKeySet:
+    """Cache date keys of the date dimension to validate fact date keys.
+
+    Keys are kept sorted in module state, so warm containers validate keys
+    with a binary search per key. Keys later than the cached ones trigger
+    fetching only the keys after the latest cached key.
+    """
+
+    def __init__(self):
+        # Set by the first refresh, so creating the set stays cheap
+        self.keys: Optional["np.ndarray"] = None
+        self.refreshes = 0
+
+    def refresh(self, fetch: DateKeyFetcher):
+        import numpy as np
+
+        keys = np.array([], dtype=np.int64) if self.keys is None else self.keys
+        after_key = int(keys[-1]) if len(keys) > 0 else 0
+        new_keys = np.asarray(fetch(after_key), dtype=np.int64)
+        self.keys = np.unique(np.concatenate([keys, new_keys]))
+        self.refreshes += 1
+
+    def is_valid(self, date_keys: "pd.Series", fetch: DateKeyFetcher) -> "np.ndarray":
+        """Get whether each date key exists in the date dimension."""
+
+        import numpy as np
+        import pandas as pd
+
+        values = pd.Series(date_keys).to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0).astype(np.int64)
+
+        if present.any() and (
+            self.keys is None
+            or len(self.keys) == 0
+            or values[present].max() > self.keys[-1]
+        ):
+            self.refresh(fetch)
+
+        if self.keys is None or len(self.keys) == 0:
+            return np.zeros(len(values), dtype=bool)
+
+        positions = np.searchsorted(self.keys, values).clip(max=len(self.keys) - 1)
+        return present & (self.keys[positions] == values)
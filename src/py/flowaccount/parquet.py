@@ -0,0 +1,78 @@
+import os
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+# pyarrow is imported by the writer, so importing format_partition_path
+# e.g. for compaction stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+def format_partition_path(partition_cols: List[str], values: Tuple) -> str:
+    """Format Hive partition path e.g. year=2022/month=3."""
+
+    return "/".join(f"{col}={value}" for col, value in zip(partition_cols, values))
+
+
+class PartitionedParquetWriter:
+    """Append DataFrame chunks as row groups of partitioned parquet files.
+
+    Files are kept open per partition so each written chunk becomes a row
+    group instead of a new file. A chunk whose schema differs from the open
+    files, e.g. because of new columns, starts a new file in that partition.
+    Partition columns are not stored in the files, like Hive datasets.
+    """
+
+    def __init__(
+        self, root: str, partition_cols: List[str], compression: str = "snappy"
+    ):
+        self.root = root
+        self.partition_cols = partition_cols
+        self.compression = compression
+        self.writers: Dict[Tuple, List["pq.ParquetWriter"]] = {}
+        self.files: Dict[str, List[str]] = {}
+        self.row_count = 0
+
+    def write(self, df: "pd.DataFrame"):
+        import pyarrow as pa
+
+        if df.shape[0] == 0:
+            return
+
+        for values, part_df in df.groupby(self.partition_cols, dropna=False):
+            if not isinstance(values, tuple):
+                values = (values,)
+            table = pa.Table.from_pandas(
+                part_df.drop(columns=self.partition_cols), preserve_index=False
+            )
+            self._get_writer(values, table.schema).write_table(table)
+            self.row_count += part_df.shape[0]
+
+    def close(self) -> Dict[str, List[str]]:
+        """Close all files and return their partition values by relative path."""
+
+        for writers in self.writers.values():
+            for writer in writers:
+                writer.close()
+        self.writers = {}
+        return self.files
+
+    def _get_writer(self, values: Tuple, schema: "pa.Schema") -> "pq.ParquetWriter":
+        import pyarrow.parquet as pq
+
+        writers = self.writers.setdefault(values, [])
+        for writer in writers:
+            if writer.schema.equals(schema, check_metadata=False):
+                return writer
+
+        partition_path = format_partition_path(self.partition_cols, values)
+        path = f"{partition_path}/{uuid.uuid4().hex}.{self.compression}.parquet"
+        local_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        writer = pq.ParquetWriter(local_path, schema, compression=self.compression)
+        writers.append(writer)
+        self.files[path] = [str(value) for value in values]
+        return writer
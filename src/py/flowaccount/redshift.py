@@ -0,0 +1,376 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import awswrangler as wr
+import pandas as pd
+from flowaccount.utils import chunked
+from redshift_connector import Connection as RedShiftConnection
+from redshift_connector import InterfaceError, OperationalError
+
+# Errors leaving a connection unusable, e.g. dropped by the cluster when idle
+CONNECTION_ERRORS = (InterfaceError, OperationalError)
+
+# Below this many rows, multi-row INSERTs finish before COPY would have
+# staged its files
+DEFAULT_COPY_MIN_ROWS = 5_000
+
+# Keys bound as parameters of one IN list, and keys above which they are
+# loaded into a temporary table instead
+DEFAULT_LOOKUP_CHUNK_SIZE = 1_000
+DEFAULT_LOOKUP_TEMP_TABLE_MIN_KEYS = 10_000
+
+
+class RedShiftSession:
+    """Reuse one RedShift connection across steps and warm invocations.
+
+    Connecting authenticates with Secrets Manager and RedShift, which takes
+    longer than most statements of streaming loads. The connection is kept
+    in module state and checked with `SELECT 1` before use when it has been
+    idle for longer than `check_after` seconds. Broken connections are
+    closed and replaced on the next use.
+    """
+
+    def __init__(
+        self, connect: Callable[[], RedShiftConnection], check_after: float = 30.0
+    ):
+        self.connect = connect
+        self.check_after = check_after
+        self.conn: Optional[RedShiftConnection] = None
+        self.last_used = 0.0
+        self.connects = 0
+
+    def connection(self) -> RedShiftConnection:
+        """Get a healthy connection, connecting if needed."""
+
+        idle = time.monotonic() - self.last_used
+        if self.conn is not None and idle > self.check_after and not self.is_alive():
+            print("Reconnect RedShift session")
+            self.close()
+
+        if self.conn is None:
+            self.conn = self.connect()
+            self.connects += 1
+
+        self.last_used = time.monotonic()
+        return self.conn
+
+    def is_alive(self) -> bool:
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            self.conn.rollback()
+        except CONNECTION_ERRORS:
+            return False
+        return True
+
+    @contextmanager
+    def transaction(self) -> Iterator[RedShiftConnection]:
+        """Run statements in one transaction, committed when the block exits.
+
+        Statements in the block must not commit themselves e.g. use
+        `commit_transaction=False` with `wr.redshift.to_sql`.
+        """
+
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except CONNECTION_ERRORS:
+            self.close()
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except CONNECTION_ERRORS:
+                self.close()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.close()
+        except CONNECTION_ERRORS:
+            pass
+        self.conn = None
+
+
+def read_sql_by_keys(
+    query: str,
+    key_expr: str,
+    keys: Iterable,
+    con,
+    key_type: str = "BIGINT",
+    chunk_size: int = DEFAULT_LOOKUP_CHUNK_SIZE,
+    temp_table_min_keys: int = DEFAULT_LOOKUP_TEMP_TABLE_MIN_KEYS,
+) -> pd.DataFrame:
+    """Run a SELECT query for rows whose key is one of keys.
+
+    `query` selects from a table without a WHERE clause and `key_expr` is
+    the key column or expression to match. Fewer than `temp_table_min_keys`
+    keys are bound as parameters of IN lists of at most `chunk_size` keys,
+    one statement per list. More keys are inserted into a temporary table
+    joined with the query, so statements stay small and RedShift plans a
+    join instead of a huge IN list.
+    """
+
+    keys = pd.Series(list(keys)).drop_duplicates().tolist()
+    if len(keys) == 0:
+        return wr.redshift.read_sql_query(f"{query} WHERE 1 = 0", con=con)
+
+    if len(keys) < temp_table_min_keys:
+        frames = [
+            wr.redshift.read_sql_query(
+                f"{query} WHERE {key_expr} IN ({', '.join(['%s'] * len(chunk))})",
+                con=con,
+                params=chunk,
+            )
+            for chunk in chunked(keys, chunk_size)
+        ]
+        return pd.concat(frames, ignore_index=True)
+
+    table = f"lookup_keys_{uuid.uuid4().hex[:8]}"
+    cursor = con.cursor()
+    try:
+        cursor.execute(f"CREATE TEMP TABLE {table} (lookup_key {key_type})")
+        for chunk in chunked(keys, chunk_size):
+            values = ", ".join(["(%s)"] * len(chunk))
+            cursor.execute(f"INSERT INTO {table} VALUES {values}", chunk)
+
+        df = wr.redshift.read_sql_query(
+            f"{query} JOIN {table} ON {key_expr} = {table}.lookup_key", con=con
+        )
+    except Exception:
+        # Statements fail in the aborted transaction, so roll it back, which
+        # also drops the table, rather than hide the error with a failed DROP
+        cursor.close()
+        con.rollback()
+        raise
+
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.close()
+    return df
+
+
+class TableLoader:
+    """Load DataFrames into RedShift tables by INSERT or by COPY.
+
+    Frames with at least `copy_min_rows` rows are staged as parquet files
+    under a unique prefix of `staging_path` and loaded with COPY. Staged
+    files are deleted afterwards, whether COPY succeeds or not. Smaller
+    frames are inserted with multi-row INSERTs. COPY needs `staging_path`
+    and an `iam_role` RedShift can assume to read it, without them every
+    frame is inserted.
+
+    COPY maps parquet columns to table columns by position, so frames are
+    copied in the column order of the table, and frames without every
+    column of the table, e.g. of an IDENTITY key, are inserted instead.
+
+    With mode "upsert", rows are loaded into a temporary table and merged
+    into the table by `primary_keys`.
+    """
+
+    def __init__(
+        self,
+        staging_path: Optional[str] = None,
+        iam_role: Optional[str] = None,
+        copy_min_rows: int = DEFAULT_COPY_MIN_ROWS,
+    ):
+        self.staging_path = staging_path.rstrip("/") if staging_path else None
+        self.iam_role = iam_role
+        self.copy_min_rows = copy_min_rows
+        self.counts = {"insert": 0, "copy": 0}
+
+    def can_copy(self) -> bool:
+        return self.staging_path is not None and self.iam_role is not None
+
+    def choose_method(self, df: pd.DataFrame) -> str:
+        if self.can_copy() and df.shape[0] >= self.copy_min_rows:
+            return "copy"
+        return "insert"
+
+    def load(
+        self,
+        df: pd.DataFrame,
+        con,
+        schema: str,
+        table: str,
+        mode: str = "append",
+        primary_keys: Optional[List[str]] = None,
+        commit_transaction: bool = True,
+    ) -> str:
+        """Load df into schema.table and return the method used."""
+
+        method = self.choose_method(df)
+        if method == "copy":
+            copy_df = self.get_copy_frame(df, con, schema, table)
+            if copy_df is None:
+                print(f"Insert {schema}.{table} without every column of it")
+                method = "insert"
+            else:
+                df = copy_df
+
+        if method == "copy":
+            path = f"{self.staging_path}/{schema}.{table}/{uuid.uuid4().hex}/"
+            try:
+                self.copy(
+                    df, path, con, schema, table, mode, primary_keys, commit_transaction
+                )
+            finally:
+                self.delete_staged(path)
+        else:
+            self.insert(df, con, schema, table, mode, primary_keys, commit_transaction)
+
+        self.counts[method] += 1
+        return method
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    def get_table_columns(self, con, schema: str, table: str) -> List[str]:
+        df = wr.redshift.read_sql_query(
+            "SELECT column_name FROM svv_columns"
+            " WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position",
+            con=con,
+            params=[schema, table],
+        )
+        return df["column_name"].tolist()
+
+    def get_copy_frame(
+        self, df: pd.DataFrame, con, schema: str, table: str
+    ) -> Optional[pd.DataFrame]:
+        """Order columns of df like the table, or None without all of them."""
+
+        columns = self.get_table_columns(con, schema, table)
+        if sorted(columns) != sorted(df.columns):
+            return None
+        return df[columns]
+
+    def insert(
+        self,
+        df: pd.DataFrame,
+        con,
+        schema: str,
+        table: str,
+        mode: str,
+        primary_keys: Optional[List[str]],
+        commit_transaction: bool,
+    ):
+        wr.redshift.to_sql(
+            df=df,
+            con=con,
+            schema=schema,
+            table=table,
+            mode=mode,
+            primary_keys=primary_keys,
+            use_column_names=True,
+            commit_transaction=commit_transaction,
+        )
+
+    def copy(
+        self,
+        df: pd.DataFrame,
+        path: str,
+        con,
+        schema: str,
+        table: str,
+        mode: str,
+        primary_keys: Optional[List[str]],
+        commit_transaction: bool,
+    ):
+        # wr.redshift.copy of awswrangler 2.14 always commits, so stage the
+        # files and copy them within the transaction of the caller
+        wr.s3.to_parquet(df=df, path=path, dataset=True, mode="append")
+        wr.redshift.copy_from_files(
+            path=path,
+            con=con,
+            table=table,
+            schema=schema,
+            iam_role=self.iam_role,
+            mode=mode,
+            primary_keys=primary_keys,
+            commit_transaction=commit_transaction,
+        )
+
+    def delete_staged(self, path: str):
+        wr.s3.delete_objects(path)
+
+
+class PostgresTableLoader(TableLoader):
+    """Stand-in for TableLoader against a local PostgreSQL, e.g. in benchmarks.
+
+    PostgreSQL cannot COPY parquet files from S3, so frames are staged as
+    CSV files in a local directory and streamed with COPY FROM STDIN. Only
+    mode "append" is supported. Connections are pg8000 connections, and
+    statements are always committed.
+    """
+
+    def __init__(
+        self,
+        staging_dir: Optional[str] = None,
+        copy_min_rows: int = DEFAULT_COPY_MIN_ROWS,
+    ):
+        super().__init__(
+            staging_path=staging_dir or tempfile.gettempdir(),
+            copy_min_rows=copy_min_rows,
+        )
+
+    def can_copy(self) -> bool:
+        return True
+
+    def get_copy_frame(self, df, con, schema, table):
+        # COPY FROM STDIN names the columns of the frame
+        return df
+
+    def load(
+        self,
+        df: pd.DataFrame,
+        con,
+        schema: str,
+        table: str,
+        mode: str = "append",
+        **kwargs,
+    ) -> str:
+        if mode != "append":
+            raise ValueError(f"Unsupported mode for PostgreSQL stand-in: {mode}")
+        return super().load(df, con, schema, table, mode, **kwargs)
+
+    def insert(self, df, con, schema, table, mode, primary_keys, commit_transaction):
+        wr.postgresql.to_sql(
+            df=df,
+            con=con,
+            schema=schema,
+            table=table,
+            mode=mode,
+            use_column_names=True,
+        )
+
+    def copy(
+        self, df, path, con, schema, table, mode, primary_keys, commit_transaction
+    ):
+        os.makedirs(path, exist_ok=True)
+        file_path = os.path.join(path, "part-00000.csv")
+        df.to_csv(file_path, index=False, header=False)
+
+        columns = ", ".join(f'"{column}"' for column in df.columns)
+        cursor = con.cursor()
+        try:
+            with open(file_path, "rb") as f:
+                cursor.execute(
+                    f"COPY {schema}.{table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                    stream=f,
+                )
+            con.commit()
+        finally:
+            cursor.close()
+
+    def delete_staged(self, path: str):
+        shutil.rmtree(path, ignore_errors=True)
@@ -1,9 +1,288 @@
+import base64
+import hashlib
 import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import (IO, Callable, Dict, Iterable, Iterator, List, Optional,
+                    TypeVar)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+CAPITAL_PATTERN = re.compile(r"[A-Z]")
+
+# S3 rejects multipart upload parts smaller than 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# Type suffixes of flattened DynamoDB JSON columns e.g. companyId.N
+DYNAMODB_TYPES = {"S", "N", "B", "BOOL", "NULL", "M", "L", "SS", "NS", "BS"}
+
+# Attribute names known to the pipelines, mapped to names which do not
+# follow the camel case convention
+KNOWN_COLUMN_NAMES = {
+    # DynamoDB stream record
+    "awsRegion": None,
+    "eventID": "event_id",
+    "eventName": None,
+    "eventSource": None,
+    "userIdentity": None,
+    "recordFormat": None,
+    "tableName": None,
+    "ApproximateCreationDateTime": None,
+    "SizeBytes": None,
+    # DynamoDB export manifest
+    "version": None,
+    "exportArn": None,
+    "startTime": None,
+    "endTime": None,
+    "tableArn": None,
+    "exportTime": None,
+    "s3Bucket": None,
+    "s3Prefix": None,
+    "s3SseAlgorithm": None,
+    "s3SseKmsKeyId": None,
+    "manifestFilesS3Key": None,
+    "billedSizeBytes": None,
+    "itemCount": None,
+    "outputFormat": None,
+    "md5Checksum": None,
+    "etag": None,
+    "dataFileS3Key": None,
+    # Open platform company user
+    "companyId": None,
+    "shopId": None,
+    "isDelete": None,
+    "userId": None,
+    "platformName": None,
+    "platformInfo": None,
+    "expiredAt": None,
+    "paymentChannelId": None,
+    "createdAt": None,
+    "expiresIn": None,
+    "isVat": None,
+    "payload": None,
+    "guid": None,
+    "refreshExpiresIn": None,
+    "updatedAt": None,
+    "refreshToken": None,
+    "remarks": None,
+    "accessToken": None,
+    "email": None,
+    # Coupon
+    "id": None,
+    "code": None,
+    "description": None,
+    "renewType": None,
+    "changeType": None,
+    "newType": None,
+    "discountType": None,
+    "discountValue": None,
+    "startDate": None,
+    "endDate": None,
+    "status": None,
+    "createon": "created_on",
+    "createdBy": None,
+    "modifiedOn": None,
+    "modifiedBy": None,
+}
 
 
 def format_snake_case(camel_case: str) -> str:
-    pattern = re.compile(r"[A-Z]")
-    lower_words = pattern.split(camel_case)
-    big_chars = pattern.findall(camel_case)
+    lower_words = CAPITAL_PATTERN.split(camel_case)
+    big_chars = CAPITAL_PATTERN.findall(camel_case)
     words = [t[0] + t[1] for t in zip([""] + big_chars, lower_words)]
     return ("_").join(words).lower()
+
+
+class ColumnNameTranslator:
+    """Translate camel and pascal case column names to snake case.
+
+    Translations are memoized, so renaming many frames with the same columns
+    only formats each name once. DynamoDB type suffixes are dropped e.g.
+    companyId.N becomes company_id.
+    """
+
+    def __init__(self, known_names: Optional[Dict[str, Optional[str]]] = None):
+        self.table: Dict[str, str] = {}
+        for name, column in (known_names or {}).items():
+            self.table[name] = column if column is not None else self._format(name)
+
+    def translate(self, name: str) -> str:
+        column = self.table.get(name)
+        if column is None:
+            column = self.table[name] = self._format(name)
+        return column
+
+    def translate_columns(self, columns: Iterable[str]) -> List[str]:
+        """Translate a whole column index e.g. `df.columns` at once."""
+
+        table = self.table
+        return [table[c] if c in table else self.translate(c) for c in columns]
+
+    def _format(self, name: str) -> str:
+        base, _, suffix = name.rpartition(".")
+        if base and suffix in DYNAMODB_TYPES:
+            return self.translate(base)
+        return format_snake_case(name[:1].lower() + name[1:])
+
+
+column_names = ColumnNameTranslator(KNOWN_COLUMN_NAMES)
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of at most `size` items."""
+
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_concurrently(
+    func: Callable[[T], R], items: Iterable[T], max_workers: int = 8
+) -> List[R]:
+    """Apply `func` to items in a thread pool, keeping the order of items."""
+
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def iter_lines(fileobj: IO[bytes], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Yield non-empty lines of a binary stream, reading it chunk by chunk.
+
+    Memory is bounded by the chunk size and the longest line, e.g. for an
+    S3 object body. Blank lines, such as after a trailing newline, are
+    skipped.
+    """
+
+    pending = b""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+class ChecksumReader:
+    """Compute MD5 and size of a binary file object's bytes as they are read.
+
+    Wrap a stream such as an S3 object body to verify it without reading
+    the bytes a second time.
+    """
+
+    def __init__(self, fileobj: IO[bytes]):
+        self.fileobj = fileobj
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.md5.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self, chunk_size: int = 1024 * 1024):
+        """Read the rest of the stream, e.g. bytes after a gzip member."""
+
+        while self.read(chunk_size):
+            pass
+
+    def b64digest(self) -> str:
+        """Get MD5 digest in base64 like DynamoDB export manifests."""
+
+        return base64.b64encode(self.md5.digest()).decode("ascii")
+
+
+class MultipartUploadWriter:
+    """Write bytes to an S3 object as they are produced.
+
+    Bytes are buffered up to `part_size` and uploaded as parts of a
+    multipart upload, so the object is never held in memory as a whole.
+    Objects smaller than a part are put with a single request. The upload
+    is aborted if the writer exits with an exception.
+    """
+
+    def __init__(self, s3, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"Part size must be at least {MIN_PART_SIZE} bytes")
+
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        self.size += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def close(self):
+        """Upload the buffered bytes and complete the object."""
+
+        if self.upload_id is None:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer)
+            )
+        else:
+            if len(self.buffer) > 0:
+                self._upload_part(bytes(self.buffer))
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self.buffer = bytearray()
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+        self.buffer = bytearray()
+
+    def __enter__(self) -> "MultipartUploadWriter":
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _upload_part(self, body: bytes):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )["UploadId"]
+
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self.parts.append({"PartNumber": number, "ETag": response["ETag"]})
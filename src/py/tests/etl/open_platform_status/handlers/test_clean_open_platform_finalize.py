@@ -0,0 +1,67 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+STAGING_PREFIX = "dynamodb/staging/tables/t/e"
+
+
+class PublishExportPartsTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+
+        with patch.dict(
+            os.environ, {"CLEAN_BUCKET": "clean", "CLEAN_CATALOG": "clean"}
+        ):
+            from etl.open_platform_status.handlers import clean_open_platform
+
+        self.handler = clean_open_platform
+        self.handler.clean_bucket = "clean"
+        self.handler.s3 = boto3.client("s3", region_name="us-east-1")
+        self.handler.s3.create_bucket(Bucket="clean")
+
+        self.part_paths = []
+        for name in ["a", "b"]:
+            key = f"{STAGING_PREFIX}/{name}.parquet"
+            self.handler.s3.put_object(Bucket="clean", Key=key, Body=name.encode())
+            self.part_paths.append(f"s3://clean/{key}")
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def list_keys(self, prefix: str) -> list:
+        response = self.handler.s3.list_objects_v2(Bucket="clean", Prefix=prefix)
+        return [content["Key"] for content in response.get("Contents", [])]
+
+    def test_publish_export_parts_succeeds(self):
+        result = self.handler.publish_export_parts("t", "e", self.part_paths)
+
+        self.assertListEqual(
+            result,
+            [
+                "s3://clean/dynamodb/tables/t/e-part-00000.parquet",
+                "s3://clean/dynamodb/tables/t/e-part-00001.parquet",
+            ],
+        )
+        self.assertListEqual(self.list_keys(STAGING_PREFIX), [])
+
+    def test_retry_publish_export_parts_succeeds(self):
+        first = self.handler.publish_export_parts("t", "e", self.part_paths)
+        result = self.handler.publish_export_parts("t", "e", self.part_paths)
+
+        self.assertListEqual(result, first)
+        body = self.handler.s3.get_object(
+            Bucket="clean", Key="dynamodb/tables/t/e-part-00001.parquet"
+        )["Body"].read()
+        self.assertEqual(body, b"b")
+
+    def test_keep_staged_parts_on_failure_fails(self):
+        paths = self.part_paths + [f"s3://clean/{STAGING_PREFIX}/missing.parquet"]
+
+        with self.assertRaises(self.handler.ClientError):
+            self.handler.publish_export_parts("t", "e", paths)
+
+        self.assertEqual(len(self.list_keys(STAGING_PREFIX)), 2)
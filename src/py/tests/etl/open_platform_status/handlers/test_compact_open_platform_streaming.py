@@ -0,0 +1,84 @@
+import os
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+TABLE = "dynamodb_streaming_flowaccount-open-platform-company-user-v2"
+TABLE_LOCATION = "s3://clean/dynamodb/streaming/tables/t"
+
+
+def months_ago(months: int) -> list:
+    now = datetime.utcnow()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return [str(year), str(month + 1)]
+
+
+class GetClosedPartitionsTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+
+        with patch.dict(os.environ, {"CLEAN_CATALOG": "clean"}):
+            from etl.open_platform_status.handlers import \
+                compact_open_platform_streaming
+
+        self.handler = compact_open_platform_streaming
+        self.handler.clean_catalog = "clean"
+        self.handler.s3 = boto3.client("s3", region_name="us-east-1")
+        self.handler.s3.create_bucket(Bucket="clean")
+        self.handler.glue = boto3.client("glue", region_name="us-east-1")
+        self.handler.glue.create_database(DatabaseInput={"Name": "clean"})
+        self.handler.glue.create_table(
+            DatabaseName="clean",
+            TableInput={
+                "Name": TABLE,
+                "StorageDescriptor": {"Location": f"{TABLE_LOCATION}/"},
+                "PartitionKeys": [
+                    {"Name": "year", "Type": "int"},
+                    {"Name": "month", "Type": "int"},
+                ],
+            },
+        )
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def create_partition(self, values: list, run_id: str = None):
+        location = f"{TABLE_LOCATION}/year={values[0]}/month={values[1]}/"
+        if run_id is not None:
+            location += f"_compacted/{run_id}/"
+        self.handler.glue.create_partition(
+            DatabaseName="clean",
+            TableName=TABLE,
+            PartitionInput={
+                "Values": values,
+                "StorageDescriptor": {"Location": location},
+            },
+        )
+
+    def put_file(self, values: list):
+        self.handler.s3.put_object(
+            Bucket="clean",
+            Key=(
+                "dynamodb/streaming/tables/t/"
+                f"year={values[0]}/month={values[1]}/late.snappy.parquet"
+            ),
+            Body=b"",
+        )
+
+    def test_get_uncompacted_and_late_partitions_succeeds(self):
+        self.create_partition(months_ago(0))
+        self.create_partition(months_ago(1), run_id="20220901T000000-abcdef12")
+        self.create_partition(months_ago(2), run_id="20220901T000000-abcdef12")
+        self.put_file(months_ago(2))
+        self.create_partition(months_ago(3))
+        # Written before the last compaction, which merged it already
+        self.create_partition(months_ago(4), run_id="29990101T000000-abcdef12")
+        self.put_file(months_ago(4))
+
+        result = self.handler.get_closed_partitions()
+
+        self.assertListEqual(result, [months_ago(3), months_ago(2)])
@@ -7,7 +7,7 @@ import pandas as pd
 import pandas.testing as pdtest
 from etl.open_platform_status.handlers.load_open_platform import (
     format_date_key, format_time_key, get_export_datetime,
-    get_open_platform_from_s3, get_platform_status)
+    get_open_platform_from_s3, get_platform_status, get_status_changes)
 
 
 class LoadOpenPlatformTestCase(TestCase):
@@ -68,7 +68,9 @@ class LoadOpenPlatformTestCase(TestCase):
 
         pdtest.assert_frame_equal(result, expected)
 
-    def test_get_open_platform_from_s3(self):
+
+class GetPlatformStatusTestCase(TestCase):
+    def test_get_platform_status_keeps_connected_rows(self):
         platform_sr = pd.Series(["Lazada", "Shopee"], name="platform")
         company_df = pd.DataFrame({"company_key": [3], "dynamodb_key": [5]})
         s3_df = pd.DataFrame({"company_id": [5], "platform_name": ["Lazada"]})
@@ -84,3 +86,30 @@ class LoadOpenPlatformTestCase(TestCase):
         result = get_platform_status(company_df, s3_df, platform_sr)
 
         pdtest.assert_frame_equal(result, expected)
+
+    def test_get_status_changes_succeeds(self):
+        company_df = pd.DataFrame(
+            {"company_key": [1, 2, 3, 4], "dynamodb_key": [10, 20, 30, 40]}
+        )
+        s3_df = pd.DataFrame(
+            {
+                "company_id": [10, 20, 20, 50],
+                "platform_name": ["Lazada", "Lazada", "Shopee", "Shopee"],
+            }
+        ).astype({"platform_name": "category"})
+        connected_df = pd.DataFrame(
+            {"company_key": [1, 2, 3], "platform": ["Lazada", "Lazada", "Shopee"]}
+        )
+
+        expected = pd.DataFrame(
+            {
+                "company_key": [2, 3],
+                "platform": ["Shopee", "Shopee"],
+                "status": [True, False],
+            }
+        )
+
+        result = get_status_changes(company_df, s3_df, connected_df)
+        result = result.sort_values("company_key").reset_index(drop=True)
+
+        pdtest.assert_frame_equal(result, expected)
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+from flowaccount.keys import DateKeySet
+
+
+class LoadCdcTestCase(TestCase):
+    def setUp(self):
+        with patch.dict(
+            os.environ,
+            {
+                "REDSHIFT_SECRET_ARN": "arn",
+                "REDSHIFT_DB": "db",
+                "REDSHIFT_DIMENSION_SCHEMA": "dim",
+                "REDSHIFT_FACT_SCHEMA": "fact",
+            },
+        ):
+            from etl.open_platform_status.handlers import \
+                load_redshift_streaming
+
+        self.handler = load_redshift_streaming
+        self.cdc_df = pd.DataFrame(
+            {
+                "approximate_creation_date_time": [
+                    datetime(2022, 3, 1, 9, 15, 0),
+                    datetime(2022, 3, 2, 14, 30, 0),
+                ],
+                "event_name": ["INSERT", "REMOVE"],
+                "company_id": [5, 5],
+                "platform_name": ["Lazada", "Lazada"],
+            }
+        )
+        company_df = pd.DataFrame({"company_key": [3], "company_id": [5]})
+
+        self.patches = [
+            patch.object(self.handler, "loader", MagicMock()),
+            patch.object(self.handler, "date_key_set", DateKeySet()),
+            patch.object(
+                self.handler, "get_company_dimension", return_value=company_df
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_load_cdc_succeeds(self):
+        with patch.object(
+            self.handler,
+            "get_date_dimension_from_redshift",
+            return_value=pd.Series([20220301, 20220302]),
+        ):
+            _, fact_df = self.handler.load_cdc(None, self.cdc_df)
+
+        self.assertListEqual(fact_df["date_key"].tolist(), [20220301, 20220302])
+        self.handler.loader.load.assert_called_once()
+
+    def test_missing_date_keys_fails(self):
+        with patch.object(
+            self.handler,
+            "get_date_dimension_from_redshift",
+            return_value=pd.Series([20220301]),
+        ):
+            with self.assertRaisesRegex(ValueError, r"1 facts .* \[20220302\]"):
+                self.handler.load_cdc(None, self.cdc_df)
+
+        self.handler.loader.load.assert_not_called()
+
+    def test_get_company_by_keys_binds_keys_succeeds(self):
+        with patch(
+            "awswrangler.redshift.read_sql_query", return_value=pd.DataFrame()
+        ) as read_sql_query:
+            self.handler.get_company_by_keys_from_redshift(None, [5, 7, 5])
+
+        sql = read_sql_query.call_args.args[0]
+        self.assertIn("dynamodb_key IN (%s, %s)", sql)
+        self.assertListEqual(read_sql_query.call_args.kwargs["params"], [5, 7])
@@ -0,0 +1,123 @@
+import json
+from unittest import TestCase
+
+import boto3
+from moto import mock_aws
+
+PREFIX = "dynamodb/tables/t/AWSDynamoDB/01659745230216-b6539576"
+
+
+class ParseExportManifestTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+
+        from etl.open_platform_status.handlers import parse_export_manifest
+
+        self.handler = parse_export_manifest
+        self.handler.s3 = boto3.client("s3", region_name="us-east-1")
+        self.handler.s3.create_bucket(Bucket="raw")
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def put_manifest(self, prefix: str, export_id: str, table: str):
+        s3 = self.handler.s3
+        table_arn = f"arn:aws:dynamodb:r:1:table/{table}"
+        s3.put_object(
+            Bucket="raw",
+            Key=f"{prefix}/manifest-summary.json",
+            Body=json.dumps(
+                {
+                    "exportArn": f"{table_arn}/export/{export_id}",
+                    "tableArn": table_arn,
+                    "manifestFilesS3Key": f"{prefix}/manifest-files.json",
+                }
+            ),
+        )
+        s3.put_object(
+            Bucket="raw",
+            Key=f"{prefix}/manifest-files.json",
+            Body=json.dumps(
+                {
+                    "itemCount": 2,
+                    "md5Checksum": "abc==",
+                    "etag": "x",
+                    "dataFileS3Key": f"{prefix}/data/a.json.gz",
+                }
+            ),
+        )
+
+    def test_parse_manifest_succeeds(self):
+        self.put_manifest(PREFIX, "01659745230216-b6539576", "t")
+        event = {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": "raw"},
+                        "object": {"key": f"{PREFIX}/manifest-summary.json"},
+                    }
+                }
+            ]
+        }
+
+        result = self.handler.handle(event, None)
+
+        self.assertEqual(len(result["manifests"]), 1)
+        manifest = result["manifests"][0]
+        self.assertEqual(manifest["export_id"], "01659745230216-b6539576")
+        self.assertEqual(manifest["table_name"], "t")
+        self.assertListEqual(manifest["export_file_keys"], [f"{PREFIX}/data/a.json.gz"])
+        self.assertListEqual(
+            result["export_files"],
+            [
+                {
+                    "bucket": "raw",
+                    "export_id": "01659745230216-b6539576",
+                    "table_name": "t",
+                    "data_file_s3_key": f"{PREFIX}/data/a.json.gz",
+                    "md5_checksum": "abc==",
+                    "item_count": 2,
+                }
+            ],
+        )
+
+    def test_parse_every_manifest_succeeds(self):
+        other_prefix = "dynamodb/tables/u/AWSDynamoDB/01659745230217-c6539577"
+        self.put_manifest(PREFIX, "01659745230216-b6539576", "t")
+        self.put_manifest(other_prefix, "01659745230217-c6539577", "u")
+        event = {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": "raw"},
+                        "object": {"key": f"{prefix}/manifest-summary.json"},
+                    }
+                }
+                for prefix in [PREFIX, other_prefix]
+            ]
+        }
+
+        result = self.handler.handle(event, None)
+
+        self.assertListEqual(
+            [manifest["table_name"] for manifest in result["manifests"]], ["t", "u"]
+        )
+        self.assertListEqual(
+            [export_file["export_id"] for export_file in result["export_files"]],
+            ["01659745230216-b6539576", "01659745230217-c6539577"],
+        )
+
+    def test_invalid_key_fails(self):
+        event = {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": "raw"},
+                        "object": {"key": f"{PREFIX}/x.json"},
+                    }
+                }
+            ]
+        }
+        result = self.handler.handle(event, None)
+        self.assertEqual(result["status"], 400)
@@ -0,0 +1,106 @@
+import os
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+ENVIRONMENT = {
+    "REDSHIFT_SECRET_ARN": "redshift",
+    "CLEAN_TABLE": "coupon",
+    "REDSHIFT_DB": "etl",
+    "REDSHIFT_SPECTRUM_SCHEMA": "spectrum",
+    "REDSHIFT_DIM_SCHEMA": "dim",
+    "REDSHIFT_DIM_TABLE": "dim_coupon",
+}
+
+
+class FakeCursor:
+    def __init__(self, watermark, rowcounts):
+        self.watermark = watermark
+        self.rowcounts = rowcounts
+        self.statements = []
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        statement = " ".join(sql.split())
+        self.statements.append((statement, params))
+        self.rowcount = next(
+            (count for prefix, count in self.rowcounts if statement.startswith(prefix)),
+            -1,
+        )
+
+    def fetchone(self):
+        return (self.watermark,)
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.commits += 1
+
+    def cursor(self):
+        return self._cursor
+
+
+class LoadCouponToDimensionTestCase(TestCase):
+    def setUp(self):
+        with patch.dict(os.environ, ENVIRONMENT):
+            from etl.subscription.handlers import load_coupon_to_dimension
+
+        self.handler = load_coupon_to_dimension
+        self.cursor = FakeCursor(
+            datetime(2022, 8, 1, 9, 30),
+            [
+                ("INSERT INTO coupon_staging", 3),
+                ("UPDATE dim.dim_coupon", 2),
+                ("INSERT INTO dim.dim_coupon", 1),
+            ],
+        )
+        self.conn = FakeConnection(self.cursor)
+
+    def handle(self, event: dict) -> dict:
+        with patch.object(
+            self.handler, "get_psycopg2_connection", return_value=self.conn
+        ):
+            return self.handler.handle(event, None)
+
+    def test_handle_stages_coupons_changed_since_watermark(self):
+        response = self.handle({"bucket": "clean", "key": "coupon.parquet"})
+
+        self.assertEqual(
+            response,
+            {
+                "status": 200,
+                "watermark": "2022-08-01T09:30:00",
+                "staged": 3,
+                "updated": 2,
+                "inserted": 1,
+            },
+        )
+        self.assertEqual(self.conn.commits, 1)
+
+        statement, params = self.cursor.statements[2]
+        self.assertTrue(statement.startswith("INSERT INTO coupon_staging"))
+        self.assertIn("modified_on >= %(watermark)s", statement)
+        self.assertEqual(params, {"watermark": datetime(2022, 8, 1, 9, 30)})
+
+    def test_handle_stages_all_coupons_on_full_load(self):
+        response = self.handle({"full_load": True})
+
+        self.assertIsNone(response["watermark"])
+        self.assertFalse(
+            any("MAX(" in statement for statement, _ in self.cursor.statements)
+        )
+        self.assertEqual(self.cursor.statements[1][1], {"watermark": None})
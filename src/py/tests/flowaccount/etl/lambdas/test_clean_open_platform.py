@@ -3,7 +3,9 @@ from unittest import TestCase
 
 import pandas as pd
 import pandas.testing as pdtest
-from flowaccount.etl.lambdas.clean_open_platform import clean_open_platform_cdc
+from fixtures.cdc_workload import make_cdc_records
+from flowaccount.etl.lambdas.clean_open_platform import (
+    clean_open_platform_cdc, collapse_latest_images, drop_duplicate_events)
 
 
 class CleanOpenPlatformCdcTestCase(TestCase):
@@ -247,3 +249,58 @@ class CleanOpenPlatformCdcTestCase(TestCase):
         e_col_set = set(list(expected.columns.values))
         r_col_set = set(list(result.columns.values))
         self.assertFalse(r_col_set.symmetric_difference(e_col_set))
+
+    def test_clean_generated_workload_succeeds(self):
+        data = make_cdc_records(1000, missing_rate=0.5, extra_rate=0.5)
+        result = clean_open_platform_cdc(data)
+
+        self.assertEqual(result.shape[0], 1000)
+        self.assertSetEqual(
+            set(result.columns).difference(self.clean_cdc_columns),
+            {"seller_id", "region", "sync_count", "tags", "settings"},
+        )
+        self.assertSetEqual(
+            set(result["event_name"].unique()), {"INSERT", "MODIFY", "REMOVE"}
+        )
+        self.assertFalse(result["company_id"].isna().any())
+        self.assertTrue(result["access_token"].isna().any())
+
+
+class CollapseOpenPlatformCdcTestCase(TestCase):
+    def setUp(self):
+        self.clean_df = pd.DataFrame(
+            {
+                "event_id": pd.array(["a", "b", "a", None, None], dtype="string"),
+                "company_id": pd.array([1, 1, 1, 2, 2], dtype="Int64"),
+                "platform_name": ["Lazada", "Lazada", "Lazada", "Shopee", "Shopee"],
+                "approximate_creation_date_time": pd.to_datetime(
+                    [
+                        "2022-02-01",
+                        "2022-02-03",
+                        "2022-02-01",
+                        "2022-02-02",
+                        "2022-02-01",
+                    ]
+                ),
+            }
+        )
+
+    def test_drop_duplicate_events_succeeds(self):
+        seen_event_ids = {"b"}
+        result = drop_duplicate_events(self.clean_df, seen_event_ids)
+
+        self.assertListEqual(result.index.tolist(), [0, 3, 4])
+        self.assertSetEqual(seen_event_ids, {"a", "b"})
+
+    def test_collapse_latest_images_succeeds(self):
+        result = collapse_latest_images(self.clean_df)
+
+        self.assertListEqual(result.index.tolist(), [1, 3])
+
+    def test_collapse_keeps_unknown_platforms_succeeds(self):
+        self.clean_df["platform_name"] = pd.array(
+            ["Lazada", "Lazada", None, None, None], dtype="string"
+        )
+        result = collapse_latest_images(self.clean_df)
+
+        self.assertListEqual(result.index.tolist(), [1, 2, 3, 4])
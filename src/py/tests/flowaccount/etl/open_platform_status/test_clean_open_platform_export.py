@@ -0,0 +1,140 @@
+import base64
+import gzip
+import hashlib
+import json
+from unittest import TestCase
+
+import boto3
+import pandas as pd
+import pandas.testing as pdtest
+from flowaccount.etl.open_platform_status.clean_open_platform import (
+    EXPORT_DTYPES, ExportFileMismatchError, read_exported_files)
+from moto import mock_aws
+
+BUCKET = "test-bucket"
+
+
+def make_export_file(*items: dict) -> bytes:
+    lines = [json.dumps({"Item": item}) for item in items]
+    return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+def get_md5_checksum(body: bytes) -> str:
+    return base64.b64encode(hashlib.md5(body).digest()).decode("ascii")
+
+
+class ReadExportedFilesTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def test_read_files_concurrently_succeeds(self):
+        self.s3.put_object(
+            Bucket=BUCKET,
+            Key="data/a.json.gz",
+            Body=make_export_file(
+                {
+                    "companyId": {"N": "1"},
+                    "isDelete": {"BOOL": False},
+                    "platformName": {"S": "lazada"},
+                    "createdAt": {"N": "1646021721"},
+                },
+                {"companyId": {"N": "2"}, "platformName": {"S": "shopee"}},
+            ),
+        )
+        self.s3.put_object(
+            Bucket=BUCKET,
+            Key="data/b.json.gz",
+            Body=make_export_file({"companyId": {"N": "3"}, "newAttr": {"S": "x"}}),
+        )
+
+        files_df = pd.DataFrame(
+            {"data_file_s3_key": ["data/a.json.gz", "data/b.json.gz"]}
+        )
+        result, mismatches = read_exported_files(
+            self.s3, BUCKET, files_df, max_workers=2
+        )
+
+        self.assertListEqual(mismatches, [])
+
+        self.assertListEqual(
+            result.columns.tolist(), list(EXPORT_DTYPES) + ["new_attr"]
+        )
+        pdtest.assert_series_equal(
+            result["company_id"], pd.Series([1, 2, 3], dtype="Int64", name="company_id")
+        )
+        self.assertListEqual(
+            result["platform_name"].tolist(), ["lazada", "shopee", pd.NA]
+        )
+        self.assertEqual(result["is_delete"].dtype, "boolean")
+        self.assertEqual(result["created_at"][0], pd.Timestamp("2022-02-28 04:15:21"))
+        self.assertListEqual(result["new_attr"].tolist()[2:], ["x"])
+
+    def test_read_no_files_succeeds(self):
+        files_df = pd.DataFrame({"data_file_s3_key": []})
+        result, _ = read_exported_files(self.s3, BUCKET, files_df)
+        self.assertListEqual(result.columns.tolist(), list(EXPORT_DTYPES))
+        self.assertEqual(result.shape[0], 0)
+
+
+class VerifyExportedFilesTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+
+        self.body = make_export_file(
+            {"companyId": {"N": "1"}}, {"companyId": {"N": "2"}}
+        )
+        self.s3.put_object(Bucket=BUCKET, Key="data/a.json.gz", Body=self.body)
+        self.s3.put_object(Bucket=BUCKET, Key="data/b.json.gz", Body=self.body[:-8])
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def test_verify_matching_file_succeeds(self):
+        files_df = pd.DataFrame(
+            {
+                "data_file_s3_key": ["data/a.json.gz"],
+                "md5_checksum": [get_md5_checksum(self.body)],
+                "item_count": [2],
+            }
+        )
+        result, mismatches = read_exported_files(self.s3, BUCKET, files_df)
+        self.assertEqual(result.shape[0], 2)
+        self.assertListEqual(mismatches, [])
+
+    def test_verify_item_count_fails(self):
+        files_df = pd.DataFrame(
+            {
+                "data_file_s3_key": ["data/a.json.gz"],
+                "md5_checksum": [get_md5_checksum(self.body)],
+                "item_count": [3],
+            }
+        )
+        with self.assertRaises(ExportFileMismatchError) as cm:
+            read_exported_files(self.s3, BUCKET, files_df)
+        self.assertEqual(cm.exception.field, "item_count")
+        self.assertEqual(cm.exception.actual, 2)
+
+    def test_skip_corrupted_file_succeeds(self):
+        files_df = pd.DataFrame(
+            {
+                "data_file_s3_key": ["data/a.json.gz", "data/b.json.gz"],
+                "md5_checksum": [get_md5_checksum(self.body)] * 2,
+                "item_count": [2, 2],
+            }
+        )
+        result, mismatches = read_exported_files(
+            self.s3, BUCKET, files_df, skip_mismatched=True
+        )
+        self.assertEqual(result.shape[0], 2)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0].key, "data/b.json.gz")
+        self.assertEqual(mismatches[0].field, "md5_checksum")
@@ -0,0 +1,117 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+import pandas.testing as pdtest
+from flowaccount.etl.open_platform_status.load_hubspot import (
+    aggregate_open_platform_status, convert_to_hubspot_inputs,
+    get_changed_status, read_snapshot, snapshot_columns, update_snapshot,
+    write_snapshot)
+
+
+def make_status_df(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=snapshot_columns)
+
+
+class LoadHubSpotSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.agg_df = make_status_df(
+            [
+                [1001, True, False, False, False],
+                [1002, False, True, False, False],
+                [1003, False, False, False, False],
+            ]
+        )
+
+    def test_get_changed_status_without_snapshot(self):
+        result = get_changed_status(self.agg_df, make_status_df([]))
+        pdtest.assert_frame_equal(result, self.agg_df)
+
+    def test_get_changed_status_against_snapshot(self):
+        snapshot_df = make_status_df(
+            [
+                [1001, True, False, False, False],
+                [1002, False, False, False, False],
+                [1004, True, True, True, True],
+            ]
+        )
+
+        result = get_changed_status(self.agg_df, snapshot_df)
+
+        self.assertEqual(list(result["hubspot_id"]), [1002, 1003])
+
+    def test_update_snapshot_keeps_failed_companies(self):
+        snapshot_df = make_status_df(
+            [[1001, False, False, False, False], [1002, False, False, False, False]]
+        )
+
+        result = update_snapshot(snapshot_df, self.agg_df, [1001, 1003])
+
+        self.assertEqual(
+            result.sort_values("hubspot_id").values.tolist(),
+            [
+                [1001, True, False, False, False],
+                [1002, False, False, False, False],
+                [1003, False, False, False, False],
+            ],
+        )
+        self.assertEqual(get_changed_status(self.agg_df, result).shape[0], 1)
+
+    def test_write_and_read_local_snapshot(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "hubspot", "last_pushed.parquet")
+            self.assertEqual(read_snapshot(path).shape[0], 0)
+
+            write_snapshot(self.agg_df, path)
+            result = read_snapshot(path)
+
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["last_pushed.parquet"])
+        pdtest.assert_frame_equal(result, self.agg_df)
+        self.assertEqual(get_changed_status(self.agg_df, result).shape[0], 0)
+
+
+class AggregateOpenPlatformStatusTestCase(TestCase):
+    def test_aggregate_succeeds(self):
+        platform_df = pd.DataFrame(
+            {
+                "company_id": [1, 1, 2, 2, 3, 4],
+                "platform_name": ["lazada", "Shopee", "kcash", "grab", "lazada", None],
+                "is_delete": [False, False, False, False, True, False],
+            }
+        )
+        hubspot_df = pd.DataFrame(
+            {"id": [1, 2, 3, 4, 5], "hubspot_id": [1002, 1001, 1003, 1001, 1004]}
+        )
+        expected = make_status_df(
+            [
+                [1001, False, False, True, False],
+                [1002, True, True, False, False],
+                [1003, False, False, False, False],
+                [1004, False, False, False, False],
+            ]
+        )
+
+        result = aggregate_open_platform_status(platform_df, hubspot_df)
+
+        pdtest.assert_frame_equal(result, expected)
+
+    def test_convert_to_hubspot_inputs_succeeds(self):
+        agg_df = make_status_df([[1001, True, False, False, True]])
+
+        result = convert_to_hubspot_inputs(agg_df)
+
+        self.assertEqual(
+            result,
+            [
+                {
+                    "id": 1001,
+                    "properties": {
+                        "lazada_api": "yes",
+                        "shopee_api": "no",
+                        "k_cash_connect_api": "no",
+                        "foodstory_api": "yes",
+                    },
+                }
+            ],
+        )
@@ -1,3 +1,4 @@
+import io
 import json
 from datetime import datetime
 from unittest import TestCase
@@ -6,7 +7,8 @@ import pandas as pd
 import pandas.testing as pdtest
 from flowaccount.etl.open_platform_status.load_hubspot_streaming import (
     aggregate_latest_status, attach_hubspot_id, convert_to_json_line,
-    convert_to_platform_status_dict, filter_event, filter_platform)
+    convert_to_platform_status_dict, filter_event, filter_platform,
+    iter_hubspot_inputs, write_json_lines)
 
 
 class AttachHubSpotIdTestCase(TestCase):
@@ -153,3 +155,37 @@ class ConvertToJsonLineTestCase(TestCase):
         expected = json.dumps(inputs[0]) + "\n" + json.dumps(inputs[1])
         result = convert_to_json_line(inputs)
         self.assertEqual(result, expected)
+
+
+class IterHubSpotInputsTestCase(TestCase):
+    def test_group_adjacent_rows_succeeds(self):
+        agg_df = pd.DataFrame(
+            {
+                "hubspot_id": [1001, 1001, 1002],
+                "hubspot_key": ["lazada_api", "shopee_api", "shopee_api"],
+                "status": ["yes", "no", "yes"],
+            }
+        ).set_index("hubspot_id")
+        expected = [
+            {"id": 1001, "properties": {"lazada_api": "yes", "shopee_api": "no"}},
+            {"id": 1002, "properties": {"shopee_api": "yes"}},
+        ]
+        result = list(iter_hubspot_inputs(agg_df))
+        self.assertListEqual(result, expected)
+
+    def test_empty_succeeds(self):
+        agg_df = pd.DataFrame(
+            {"hubspot_id": [], "hubspot_key": [], "status": []}
+        ).set_index("hubspot_id")
+        self.assertListEqual(list(iter_hubspot_inputs(agg_df)), [])
+
+
+class WriteJsonLinesTestCase(TestCase):
+    def test_write_like_convert_to_json_line_succeeds(self):
+        inputs = [{"id": i, "properties": {"lazada_api": "yes"}} for i in range(5)]
+        buffer = io.BytesIO()
+        result = write_json_lines(buffer, iter(inputs), chunk_size=2)
+        self.assertEqual(result, 5)
+        self.assertEqual(
+            buffer.getvalue().decode("utf-8"), convert_to_json_line(inputs)
+        )
@@ -0,0 +1,141 @@
+from datetime import datetime
+from unittest import TestCase
+
+from flowaccount.etl.subscription.load_coupon_to_fact import (
+    CouponKeyBackfill, fill_coupon_keys)
+
+
+class FakeFact:
+    """Arrival times of fact rows and the stored watermark."""
+
+    def __init__(self, arrivals):
+        self.arrivals = sorted(arrivals)
+        self.watermark = None
+        self.updates = []
+
+
+class FakeCursor:
+    def __init__(self, fact: FakeFact):
+        self.fact = fact
+        self.result = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        statement = " ".join(sql.split())
+        self.rowcount = -1
+        if statement.startswith("SELECT MAX(watermark)"):
+            self.result = self.fact.watermark
+        elif statement.startswith("SELECT MAX(arrived_on)"):
+            watermark = params["watermark"]
+            limit = int(statement.split("LIMIT ")[1].split()[0])
+            arrivals = [
+                arrival
+                for arrival in self.fact.arrivals
+                if watermark is None or arrival > watermark
+            ]
+            self.result = max(arrivals[:limit], default=None)
+        elif statement.startswith("INSERT INTO etl.etl_watermarks"):
+            self.fact.watermark = params[1]
+        elif statement.startswith("UPDATE"):
+            self.fact.updates.append((statement, params))
+            self.rowcount = 1
+
+    def fetchone(self):
+        return (self.result,)
+
+
+class FakeConnection:
+    def __init__(self, fact: FakeFact):
+        self.fact = fact
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.commits += 1
+
+    def cursor(self):
+        return FakeCursor(self.fact)
+
+
+class LoadCouponToFactTestCase(TestCase):
+    def setUp(self):
+        self.fact = FakeFact([datetime(2022, 8, day) for day in [1, 2, 2, 3, 4, 5]])
+        self.conn = FakeConnection(self.fact)
+        self.backfill = CouponKeyBackfill(
+            "etl", "subscriptions", "dim", "dim_coupon", "loaded_on", batch_rows=2
+        )
+
+    def test_fill_coupon_keys_without_condition(self):
+        cursor = FakeCursor(self.fact)
+        result = fill_coupon_keys(cursor, "etl.subscriptions", "dim.dim_coupon")
+
+        self.assertEqual(result, (1, 1))
+        self.assertTrue(
+            all("AND (TRUE);" in statement for statement, _ in self.fact.updates)
+        )
+
+    def test_run_fills_batches_until_done(self):
+        result = self.backfill.run(self.conn)
+
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(result["watermark"], "2022-08-05T00:00:00")
+        self.assertTrue(result["done"])
+        self.assertEqual(self.fact.watermark, datetime(2022, 8, 5))
+
+        # Rows arrived at the same time are filled in the same batch
+        batches = [params for _, params in self.fact.updates[::2]]
+        self.assertEqual(
+            batches,
+            [
+                {"start": None, "end": datetime(2022, 8, 2)},
+                {"start": datetime(2022, 8, 2), "end": datetime(2022, 8, 4)},
+                {"start": datetime(2022, 8, 4), "end": datetime(2022, 8, 5)},
+            ],
+        )
+
+    def test_run_resumes_from_stored_watermark(self):
+        times = iter([True, False])
+        result = self.backfill.run(self.conn, lambda: next(times))
+
+        self.assertEqual(result["batches"], 1)
+        self.assertFalse(result["done"])
+        self.assertEqual(self.fact.watermark, datetime(2022, 8, 2))
+
+        self.fact.updates = []
+        result = self.backfill.run(self.conn)
+
+        self.assertEqual(result["batches"], 2)
+        self.assertEqual(result["late_rows"], 2)
+        statement, params = self.fact.updates[0]
+        self.assertIn("INTERVAL '24 hours'", statement)
+        self.assertEqual(params, {"watermark": datetime(2022, 8, 2)})
+        self.assertEqual(self.fact.updates[2][1]["start"], datetime(2022, 8, 2))
+
+    def test_run_sweeps_rows_before_lookback(self):
+        self.fact.watermark = datetime(2022, 8, 5)
+        result = self.backfill.run(self.conn, sweep=True)
+
+        self.assertEqual(result["swept_rows"], 2)
+        self.assertEqual(result["batches"], 0)
+        statement, params = self.fact.updates[0]
+        self.assertIn(
+            "(f.loaded_on IS NULL OR f.loaded_on <= %(watermark)s - "
+            "INTERVAL '24 hours')",
+            statement,
+        )
+        self.assertEqual(params, {"watermark": datetime(2022, 8, 5)})
+
+    def test_sweep_without_watermark_fills_rows_without_arrival(self):
+        self.backfill.sweep(self.conn, None)
+
+        statement, _ = self.fact.updates[0]
+        self.assertIn("AND (f.loaded_on IS NULL);", statement)
@@ -0,0 +1,122 @@
+import json
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import boto3
+import psycopg2
+from flowaccount import clients
+from moto import mock_aws
+
+SECRET = {"host": "h", "port": 5439, "username": "u", "password": "p"}
+
+
+class ClientsTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+
+        clients._boto3_clients.clear()
+        clients._psycopg2_connections.clear()
+        clients._psycopg2_last_used.clear()
+        clients.secrets = clients.SecretCache()
+
+        self.sm = boto3.client("secretsmanager", region_name="us-east-1")
+        self.sm.create_secret(Name="redshift", SecretString=json.dumps(SECRET))
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def test_get_client_reuses_clients(self):
+        s3 = clients.get_client("s3", region_name="us-east-1")
+
+        self.assertIs(clients.get_client("s3", region_name="us-east-1"), s3)
+        self.assertIsNot(clients.get_client("s3", region_name="us-west-2"), s3)
+
+    def test_get_secret_caches_until_invalidated(self):
+        self.assertEqual(clients.get_secret("redshift"), SECRET)
+
+        rotated = dict(SECRET, password="rotated")
+        self.sm.put_secret_value(SecretId="redshift", SecretString=json.dumps(rotated))
+        self.assertEqual(clients.get_secret("redshift"), SECRET)
+
+        clients.secrets.invalidate("redshift")
+        self.assertEqual(clients.get_secret("redshift"), rotated)
+        self.assertEqual((clients.secrets.hits, clients.secrets.misses), (1, 2))
+
+    def test_get_secret_expires_after_ttl(self):
+        clients.secrets = clients.SecretCache(ttl=0.0)
+        clients.get_secret("redshift")
+        clients.get_secret("redshift")
+
+        self.assertEqual(clients.secrets.misses, 2)
+
+    def test_get_psycopg2_connection_reuses_open_connection(self):
+        with patch("psycopg2.connect") as connect:
+            connect.return_value = MagicMock(closed=0)
+            conn = clients.get_psycopg2_connection("redshift", "etl")
+            self.assertIs(clients.get_psycopg2_connection("redshift", "etl"), conn)
+
+            conn.closed = 1
+            clients.get_psycopg2_connection("redshift", "etl")
+
+        self.assertEqual(connect.call_count, 2)
+        connect.assert_called_with(
+            host="h", port=5439, dbname="etl", user="u", password="p"
+        )
+
+    def test_get_psycopg2_connection_checks_idle_connection(self):
+        with patch("psycopg2.connect") as connect:
+            connect.return_value = MagicMock(closed=0)
+            conn = clients.get_psycopg2_connection("redshift", "etl")
+            self.assertIs(
+                clients.get_psycopg2_connection("redshift", "etl", check_after=0),
+                conn,
+            )
+
+            # Dropped by the server while idle, closed is still unset
+            cursor = conn.cursor.return_value.__enter__.return_value
+            cursor.execute.side_effect = psycopg2.OperationalError("SSL SYSCALL")
+            connect.return_value = MagicMock(closed=0)
+            result = clients.get_psycopg2_connection("redshift", "etl", check_after=0)
+
+        self.assertIsNot(result, conn)
+        self.assertEqual(connect.call_count, 2)
+        conn.close.assert_called_once()
+
+    def test_invalidate_psycopg2_connection_on_error(self):
+        @clients.invalidate_psycopg2_connection_on_error("redshift", "etl")
+        def handle(event, context):
+            clients.get_psycopg2_connection("redshift", "etl")
+            raise psycopg2.InterfaceError("connection already closed")
+
+        with patch("psycopg2.connect") as connect:
+            connect.return_value = MagicMock(closed=0)
+            with self.assertRaises(psycopg2.InterfaceError):
+                handle({}, None)
+
+        self.assertDictEqual(clients._psycopg2_connections, {})
+
+    def test_get_psycopg2_connection_retries_rotated_password(self):
+        clients.get_secret("redshift")
+        rotated = dict(SECRET, password="rotated")
+        self.sm.put_secret_value(SecretId="redshift", SecretString=json.dumps(rotated))
+
+        def connect(password, **kwargs):
+            if password != "rotated":
+                raise psycopg2.OperationalError(
+                    'FATAL:  password authentication failed for user "u"'
+                )
+            return MagicMock(closed=0)
+
+        with patch("psycopg2.connect", side_effect=connect) as mock_connect:
+            clients.get_psycopg2_connection("redshift", "etl")
+
+        self.assertEqual(mock_connect.call_count, 2)
+
+    def test_get_psycopg2_connection_raises_other_errors(self):
+        error = psycopg2.OperationalError("could not connect to server")
+        with patch("psycopg2.connect", side_effect=error) as connect:
+            with self.assertRaises(psycopg2.OperationalError):
+                clients.get_psycopg2_connection("redshift", "etl")
+
+        self.assertEqual(connect.call_count, 1)
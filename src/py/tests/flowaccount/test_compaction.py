@@ -0,0 +1,174 @@
+import io
+from unittest import TestCase
+
+import boto3
+import pandas as pd
+import pandas.testing as pdtest
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flowaccount.compaction import compact_partition, list_parquet_files
+from moto import mock_aws
+
+BUCKET = "test-bucket"
+DATABASE = "test_db"
+TABLE = "test_table"
+TABLE_PREFIX = "streaming/tables/test-table"
+
+
+class CompactPartitionTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.glue = boto3.client("glue", region_name="us-east-1")
+
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.glue.create_database(DatabaseInput={"Name": DATABASE})
+        self.glue.create_table(
+            DatabaseName=DATABASE,
+            TableInput={
+                "Name": TABLE,
+                "StorageDescriptor": {"Location": f"s3://{BUCKET}/{TABLE_PREFIX}/"},
+                "PartitionKeys": [
+                    {"Name": "year", "Type": "int"},
+                    {"Name": "month", "Type": "int"},
+                ],
+            },
+        )
+        self.glue.create_partition(
+            DatabaseName=DATABASE,
+            TableName=TABLE,
+            PartitionInput={
+                "Values": ["2022", "8"],
+                "StorageDescriptor": {
+                    "Location": f"s3://{BUCKET}/{TABLE_PREFIX}/year=2022/month=8/"
+                },
+            },
+        )
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def put_parquet(self, name: str, df: pd.DataFrame):
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+        self.s3.put_object(
+            Bucket=BUCKET,
+            Key=f"{TABLE_PREFIX}/year=2022/month=8/{name}.snappy.parquet",
+            Body=buffer.getvalue(),
+        )
+
+    def get_location(self) -> str:
+        partition = self.glue.get_partition(
+            DatabaseName=DATABASE, TableName=TABLE, PartitionValues=["2022", "8"]
+        )
+        return partition["Partition"]["StorageDescriptor"]["Location"]
+
+    def compact(self, **kwargs) -> dict:
+        return compact_partition(
+            self.s3,
+            self.glue,
+            DATABASE,
+            TABLE,
+            ["2022", "8"],
+            ["company_id", "t"],
+            **kwargs,
+        )
+
+    def test_compact_sorted_files_succeeds(self):
+        self.put_parquet("a", pd.DataFrame({"company_id": [2, 1], "t": [2, 3]}))
+        self.put_parquet("b", pd.DataFrame({"company_id": [1, 3], "t": [1, 1]}))
+        self.put_parquet(
+            "c", pd.DataFrame({"company_id": [2], "t": [1], "extra": ["x"]})
+        )
+
+        result = self.compact()
+
+        self.assertEqual(result["files_before"], 3)
+        self.assertEqual(result["files_after"], 1)
+        self.assertEqual(result["rows"], 5)
+        self.assertGreater(result["bytes_read"], 0)
+        self.assertEqual(self.get_location(), result["location"])
+        self.assertIn("/year=2022/month=8/_compacted/", result["location"])
+
+        # Sources are removed from the Hive partition directory
+        files = list_parquet_files(
+            self.s3, BUCKET, f"{TABLE_PREFIX}/year=2022/month=8/"
+        )
+        self.assertDictEqual(files, {})
+
+        key = result["location"][len(f"s3://{BUCKET}/") :]
+        files = list_parquet_files(self.s3, BUCKET, key)
+        self.assertEqual(len(files), 1)
+        body = self.s3.get_object(Bucket=BUCKET, Key=next(iter(files)))["Body"]
+        df = pq.read_table(io.BytesIO(body.read())).to_pandas()
+        pdtest.assert_frame_equal(
+            df[["company_id", "t"]],
+            pd.DataFrame({"company_id": [1, 1, 2, 2, 3], "t": [1, 3, 1, 2, 1]}),
+        )
+        self.assertListEqual(df["extra"].tolist(), [None, None, "x", None, None])
+
+    def test_split_by_target_file_size_succeeds(self):
+        for i in range(4):
+            self.put_parquet(str(i), pd.DataFrame({"company_id": [i], "t": [i]}))
+
+        files = list_parquet_files(
+            self.s3, BUCKET, f"{TABLE_PREFIX}/year=2022/month=8/"
+        )
+
+        # Two rows per file by the size of the sources
+        result = self.compact(target_file_size=sum(files.values()) // 2)
+
+        self.assertEqual(result["files_before"], 4)
+        self.assertEqual(result["files_after"], 2)
+        self.assertFalse(result["skipped"])
+
+    def test_skip_files_at_target_size_succeeds(self):
+        for i in range(4):
+            self.put_parquet(str(i), pd.DataFrame({"company_id": [i], "t": [i]}))
+        location = self.get_location()
+
+        result = self.compact(target_file_size=1)
+
+        self.assertTrue(result["skipped"])
+        self.assertEqual(result["bytes_read"], 0)
+        self.assertEqual(self.get_location(), location)
+
+    def test_recompact_with_new_files_succeeds(self):
+        self.put_parquet("a", pd.DataFrame({"company_id": [1], "t": [1]}))
+        self.put_parquet("b", pd.DataFrame({"company_id": [2], "t": [1]}))
+        first = self.compact()
+
+        # Late file written to the Hive partition directory
+        self.put_parquet("c", pd.DataFrame({"company_id": [3], "t": [1]}))
+        second = self.compact()
+
+        self.assertEqual(second["previous_location"], first["location"])
+        self.assertEqual(second["files_before"], 2)
+        self.assertEqual(second["files_after"], 1)
+        self.assertEqual(second["rows"], 3)
+        self.assertEqual(self.get_location(), second["location"])
+
+    def test_skip_compacted_partition_without_new_files_succeeds(self):
+        self.put_parquet("a", pd.DataFrame({"company_id": [1], "t": [1]}))
+        self.put_parquet("b", pd.DataFrame({"company_id": [2], "t": [1]}))
+        first = self.compact()
+        self.assertFalse(first["skipped"])
+
+        second = self.compact()
+
+        self.assertTrue(second["skipped"])
+        self.assertEqual(second["files_before"], first["files_after"])
+        self.assertEqual(second["bytes_read"], 0)
+        self.assertEqual(self.get_location(), first["location"])
+
+    def test_skip_partition_with_few_files_succeeds(self):
+        self.put_parquet("a", pd.DataFrame({"company_id": [1], "t": [1]}))
+        location = self.get_location()
+
+        result = self.compact()
+
+        self.assertEqual(result["files_before"], 1)
+        self.assertEqual(result["files_after"], 1)
+        self.assertEqual(result["bytes_read"], 0)
+        self.assertEqual(self.get_location(), location)
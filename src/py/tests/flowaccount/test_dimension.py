@@ -0,0 +1,172 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+import pandas.testing as pdtest
+from flowaccount.dimension import DimensionCache
+
+
+class FakeDimension:
+    def __init__(self, company_ids):
+        self.df = pd.DataFrame(
+            {
+                "company_key": range(1, len(company_ids) + 1),
+                "dynamodb_key": company_ids,
+            }
+        )
+        self.after_keys = []
+
+    def add(self, company_id):
+        key = self.df["company_key"].max() + 1
+        row = pd.DataFrame({"company_key": [key], "dynamodb_key": [company_id]})
+        self.df = pd.concat([self.df, row], ignore_index=True)
+
+    def fetch(self, after_key):
+        self.after_keys.append(after_key)
+        return self.df[self.df["company_key"] > after_key]
+
+    def fetch_keys(self, company_ids):
+        return self.df[self.df["dynamodb_key"].isin(company_ids)]
+
+
+class DimensionCacheTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "dim_company.parquet")
+        self.dimension = FakeDimension([1000, 1001, 1002])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_cache(self):
+        return DimensionCache("dynamodb_key", "company_key", path=self.path)
+
+    def test_lookup_hits_cache_succeeds(self):
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        result = cache.lookup([1002, 1000, 1002], self.dimension.fetch)
+
+        expected = pd.DataFrame({"company_key": [3, 1], "dynamodb_key": [1002, 1000]})
+        pdtest.assert_frame_equal(result, expected)
+        self.assertListEqual(self.dimension.after_keys, [0])
+        self.assertDictEqual(
+            cache.stats(),
+            {"rows": 3, "hits": 3, "misses": 0, "refreshes": 1, "fetched_rows": 3},
+        )
+
+    def test_lookup_refreshes_missing_keys_succeeds(self):
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        self.dimension.add(1003)
+
+        result = cache.lookup([1003, 1004], self.dimension.fetch)
+
+        expected = pd.DataFrame({"company_key": [4], "dynamodb_key": [1003]})
+        pdtest.assert_frame_equal(result, expected)
+        self.assertListEqual(self.dimension.after_keys, [0, 3])
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_lookup_fetches_keys_committed_out_of_order_succeeds(self):
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        self.dimension.add(1003)
+        self.dimension.add(1004)
+
+        # Key 4 is committed after key 5 is cached
+        committed_df = self.dimension.df
+        self.dimension.df = committed_df[committed_df["company_key"] != 4]
+        cache.lookup([1004], self.dimension.fetch)
+        self.dimension.df = committed_df
+
+        result = cache.lookup(
+            [1003, 1004], self.dimension.fetch, self.dimension.fetch_keys
+        )
+
+        self.assertListEqual(result["company_key"].tolist(), [4, 5])
+        self.assertListEqual(self.dimension.after_keys, [0, 3, 5])
+        self.assertEqual(cache.stats()["rows"], 5)
+
+    def test_refresh_keys_skips_cached_rows_succeeds(self):
+        cache = self.make_cache()
+        cache.refresh(self.dimension.fetch)
+        self.dimension.add(1003)
+
+        fetched = cache.refresh_keys([1000, 1003, 1005], self.dimension.fetch_keys)
+
+        self.assertEqual(fetched, 1)
+        self.assertListEqual(
+            cache.df["dynamodb_key"].tolist(), [1000, 1001, 1002, 1003]
+        )
+
+    def test_warm_start_from_file_succeeds(self):
+        self.make_cache().lookup([1000], self.dimension.fetch)
+        self.dimension.add(1003)
+
+        cache = self.make_cache()
+        cache.refresh(self.dimension.fetch)
+
+        self.assertListEqual(self.dimension.after_keys, [0, 3])
+        self.assertListEqual(
+            cache.df["dynamodb_key"].tolist(), [1000, 1001, 1002, 1003]
+        )
+
+    def test_duplicate_natural_keys_use_lowest_key_succeeds(self):
+        self.dimension.add(1000)
+        cache = self.make_cache()
+        result = cache.lookup([1000], self.dimension.fetch)
+        self.assertListEqual(result["company_key"].tolist(), [1])
+        self.assertEqual(cache.max_key, 4)
+
+    def test_unreadable_file_is_ignored_succeeds(self):
+        with open(self.path, "w") as f:
+            f.write("not parquet")
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        self.assertListEqual(self.dimension.after_keys, [0])
+        self.assertEqual(cache.stats()["rows"], 3)
+
+    def test_restore_rolled_back_keys_succeeds(self):
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        snapshot = cache.snapshot()
+        self.dimension.add(1003)
+        cache.lookup([1003], self.dimension.fetch)
+
+        cache.restore(snapshot)
+
+        self.assertEqual(cache.max_key, 3)
+        warm_cache = self.make_cache()
+        warm_cache.load()
+        self.assertListEqual(warm_cache.df["dynamodb_key"].tolist(), [1000, 1001, 1002])
+
+    def test_restore_rolled_back_keys_below_max_succeeds(self):
+        self.dimension.df = pd.DataFrame(
+            {"company_key": [1, 2, 4], "dynamodb_key": [1000, 1001, 1003]}
+        )
+        cache = self.make_cache()
+        cache.lookup([1000], self.dimension.fetch)
+        snapshot = cache.snapshot()
+
+        # An insert rolled back afterwards got key 3, below the cached maximum
+        row = pd.DataFrame({"company_key": [3], "dynamodb_key": [1002]})
+        self.dimension.df = pd.concat([self.dimension.df, row], ignore_index=True)
+        cache.lookup([1002], self.dimension.fetch, self.dimension.fetch_keys)
+        self.assertEqual(cache.max_key, 4)
+
+        cache.restore(snapshot)
+
+        self.assertListEqual(cache.df["dynamodb_key"].tolist(), [1000, 1001, 1003])
+        warm_cache = self.make_cache()
+        warm_cache.load()
+        self.assertListEqual(warm_cache.df["dynamodb_key"].tolist(), [1000, 1001, 1003])
+
+    def test_restore_empty_cache_succeeds(self):
+        cache = self.make_cache()
+        snapshot = cache.snapshot()
+        cache.lookup([1000], self.dimension.fetch)
+
+        cache.restore(snapshot)
+
+        self.assertIsNone(cache.df)
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,103 @@
+import gzip
+import io
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+import pandas.testing as pdtest
+from flowaccount.dynamodb import (ItemDecoder, deserialize_attribute,
+                                  iter_export_items)
+from flowaccount.utils import format_snake_case
+
+
+class DeserializeAttributeTestCase(TestCase):
+    def test_deserialize_scalar_succeeds(self):
+        self.assertEqual(deserialize_attribute({"S": "a"}), "a")
+        self.assertEqual(deserialize_attribute({"N": "1.50"}), "1.50")
+        self.assertEqual(deserialize_attribute({"BOOL": False}), False)
+        self.assertIsNone(deserialize_attribute({"NULL": True}))
+
+    def test_deserialize_nested_succeeds(self):
+        data = {
+            "M": {
+                "tags": {"SS": ["a", "b"]},
+                "items": {"L": [{"N": "1"}, {"M": {"ok": {"BOOL": True}}}]},
+            }
+        }
+        expected = {"tags": ["a", "b"], "items": ["1", {"ok": True}]}
+        self.assertDictEqual(deserialize_attribute(data), expected)
+
+    def test_unknown_type_fails(self):
+        with self.assertRaises(ValueError):
+            deserialize_attribute({"X": "1"})
+
+
+class ItemDecoderTestCase(TestCase):
+    def test_decode_typed_columns_succeeds(self):
+        decoder = ItemDecoder(
+            {
+                "company_id": "Int64",
+                "shop_id": "string",
+                "is_delete": "boolean",
+                "created_at": "datetime64",
+            },
+            column_name=format_snake_case,
+        )
+        decoder.append(
+            {
+                "companyId": {"N": "1"},
+                "shopId": {"S": "0"},
+                "isDelete": {"BOOL": True},
+                "createdAt": {"N": "1646021721"},
+            }
+        )
+        decoder.append({"companyId": {"N": "2"}, "isDelete": {"NULL": True}})
+        expected = pd.DataFrame(
+            {
+                "company_id": [1, 2],
+                "shop_id": ["0", None],
+                "is_delete": [True, None],
+                "created_at": [datetime.utcfromtimestamp(1646021721), None],
+            }
+        ).astype(
+            {
+                "company_id": "Int64",
+                "shop_id": "string",
+                "is_delete": "boolean",
+                "created_at": "datetime64[ns]",
+            }
+        )
+        pdtest.assert_frame_equal(decoder.to_frame(), expected)
+
+    def test_keep_unknown_attributes_succeeds(self):
+        decoder = ItemDecoder({"company_id": "Int64"}, column_name=format_snake_case)
+        decoder.append({"companyId": {"N": "1"}})
+        decoder.append({"newColumn": {"N": "5"}}, event_name="INSERT")
+        result = decoder.to_frame()
+        self.assertListEqual(
+            list(result.columns), ["company_id", "event_name", "new_column"]
+        )
+        self.assertListEqual(list(result["new_column"]), [None, "5"])
+        self.assertListEqual(list(result["event_name"]), [None, "INSERT"])
+
+    def test_decode_millisecond_datetime_succeeds(self):
+        decoder = ItemDecoder(
+            {"created": "datetime64"},
+            column_name=str,
+            datetime_units={"created": "ms"},
+        )
+        decoder.append({}, created=1646021721575)
+        result = decoder.to_frame()
+        self.assertEqual(
+            result["created"][0], pd.Timestamp("2022-02-28 04:15:21.575000")
+        )
+
+
+class IterExportItemsTestCase(TestCase):
+    def test_iter_gzip_lines_succeeds(self):
+        body = gzip.compress(
+            b'{"Item":{"companyId":{"N":"1"}}}\n\n{"Item":{"companyId":{"N":"2"}}}\n'
+        )
+        result = list(iter_export_items(io.BytesIO(body)))
+        expected = [{"companyId": {"N": "1"}}, {"companyId": {"N": "2"}}]
+        self.assertListEqual(result, expected)
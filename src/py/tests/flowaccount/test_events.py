@@ -0,0 +1,70 @@
+import json
+from unittest import TestCase
+
+from flowaccount.events import S3Object, get_s3_objects
+
+
+def make_s3_event(*keys: str) -> dict:
+    return {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "s3": {"bucket": {"name": "test-bucket"}, "object": {"key": key}},
+            }
+            for key in keys
+        ]
+    }
+
+
+class GetS3ObjectsTestCase(TestCase):
+    def test_get_from_s3_event_succeeds(self):
+        event = make_s3_event("path/a.json", "path/b+c.json")
+        expected = [
+            S3Object("test-bucket", "path/a.json"),
+            S3Object("test-bucket", "path/b c.json"),
+        ]
+        self.assertListEqual(get_s3_objects(event), expected)
+
+    def test_get_from_sns_event_succeeds(self):
+        event = {
+            "Records": [
+                {"Sns": {"Message": json.dumps(make_s3_event("a.parquet"))}},
+                {"Sns": {"Message": json.dumps(make_s3_event("b.parquet"))}},
+            ]
+        }
+        expected = [
+            S3Object("test-bucket", "a.parquet"),
+            S3Object("test-bucket", "b.parquet"),
+        ]
+        self.assertListEqual(get_s3_objects(event), expected)
+
+    def test_get_from_sqs_event_succeeds(self):
+        sns_message = {
+            "Type": "Notification",
+            "Message": json.dumps(make_s3_event("b.parquet")),
+        }
+        event = {
+            "Records": [
+                {
+                    "eventSource": "aws:sqs",
+                    "body": json.dumps(make_s3_event("a.parquet")),
+                },
+                {"eventSource": "aws:sqs", "body": json.dumps(sns_message)},
+                {
+                    "eventSource": "aws:sqs",
+                    "body": json.dumps({"Event": "s3:TestEvent"}),
+                },
+            ]
+        }
+        expected = [
+            S3Object("test-bucket", "a.parquet"),
+            S3Object("test-bucket", "b.parquet"),
+        ]
+        self.assertListEqual(get_s3_objects(event), expected)
+
+    def test_drop_duplicates_succeeds(self):
+        event = make_s3_event("a.json", "b.json", "a.json")
+        result = [s3_object.uri for s3_object in get_s3_objects(event)]
+        self.assertListEqual(
+            result, ["s3://test-bucket/a.json", "s3://test-bucket/b.json"]
+        )
@@ -0,0 +1,191 @@
+from unittest import TestCase
+
+import hubspot
+from fixtures.hubspot_stub import HubSpotStub
+from flowaccount.hubspot import BatchUpdater, InputCoalescer, TokenBucket
+from hubspot.crm.companies import BatchInputSimplePublicObjectBatchInput
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeApiException(Exception):
+    def __init__(self, status: int, headers: dict = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class FakeUpdate:
+    def __init__(self, errors: list):
+        self.errors = list(errors)
+        self.batches = []
+
+    def __call__(self, batch: list):
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+        self.batches.append(batch)
+
+
+class HubSpotTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = TokenBucket(100.0, clock=self.clock, sleep=self.clock.sleep)
+
+    def make_updater(self, update, **kwargs) -> BatchUpdater:
+        return BatchUpdater(
+            update, limiter=self.limiter, sleep=self.clock.sleep, **kwargs
+        )
+
+    def test_token_bucket_waits_for_tokens(self):
+        limiter = TokenBucket(2.0, capacity=2, clock=self.clock, sleep=self.clock.sleep)
+
+        waits = [limiter.acquire() for _ in range(4)]
+
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 0.5])
+        self.assertEqual(self.clock.now, 1.0)
+
+    def test_update_all_splits_batches(self):
+        update = FakeUpdate([])
+        inputs = [{"id": i, "properties": {}} for i in range(250)]
+
+        report = self.make_updater(update, batch_size=100).update_all(inputs)
+
+        self.assertEqual(sorted(len(batch) for batch in update.batches), [50, 100, 100])
+        self.assertEqual(report["batches"], 3)
+        self.assertEqual(report["updated"], 250)
+        self.assertEqual(report["failed_batches"], 0)
+
+    def test_update_all_retries_rate_limits_and_server_errors(self):
+        update = FakeUpdate(
+            [FakeApiException(429, {"Retry-After": "2"}), FakeApiException(502)]
+        )
+
+        report = self.make_updater(update, backoff_base=1.0).update_all([{"id": 1}])
+
+        self.assertEqual(report["updated"], 1)
+        self.assertEqual(report["retries"], 2)
+        self.assertEqual(self.clock.sleeps[0], 2.0)
+        self.assertLessEqual(self.clock.sleeps[1], 2.0)
+
+    def test_update_all_drops_failed_batches(self):
+        update = FakeUpdate([FakeApiException(400)] + [FakeApiException(500)] * 3)
+
+        report = self.make_updater(
+            update, batch_size=1, max_workers=1, max_attempts=3
+        ).update_all([{"id": 1}, {"id": 2}, {"id": 3}])
+
+        self.assertEqual(report["updated"], 1)
+        self.assertEqual(report["failed_batches"], 2)
+        self.assertEqual(report["failed_inputs"], 2)
+        self.assertEqual(report["retries"], 2)
+
+    def test_update_all_keeps_inputs_of_failed_batches(self):
+        update = FakeUpdate([FakeApiException(400)])
+        updater = self.make_updater(update, batch_size=2, max_workers=1)
+
+        report = updater.update_all([{"id": 1}, {"id": 2}, {"id": 3}])
+
+        self.assertEqual(report["failed_inputs"], 2)
+        self.assertListEqual(updater.failed, [{"id": 1}, {"id": 2}])
+
+    def test_update_all_stops_retrying_without_time_left(self):
+        update = FakeUpdate([FakeApiException(429, {"Retry-After": "10"})])
+
+        report = self.make_updater(
+            update, remaining=lambda: 5.0 - self.clock.now
+        ).update_all([{"id": 1}])
+
+        self.assertEqual(report["failed_inputs"], 1)
+        self.assertEqual(report["retries"], 0)
+        self.assertListEqual(self.clock.sleeps, [])
+
+    def test_update_all_skips_batches_without_time_left(self):
+        update = FakeUpdate([])
+
+        report = self.make_updater(update, remaining=lambda: 0.0).update_all(
+            [{"id": 1}]
+        )
+
+        self.assertEqual(report["failed_batches"], 1)
+        self.assertListEqual(update.batches, [])
+
+    def test_batch_size_is_limited(self):
+        with self.assertRaises(ValueError):
+            BatchUpdater(FakeUpdate([]), batch_size=101)
+
+    def test_update_all_with_stub_server(self):
+        with HubSpotStub(fail_statuses=[429, 503], retry_after=0.01) as stub:
+            client = hubspot.Client.create(
+                access_token="token", api_factory=stub.api_factory
+            )
+
+            def update(batch: list):
+                client.crm.companies.batch_api.update(
+                    batch_input_simple_public_object_batch_input=(
+                        BatchInputSimplePublicObjectBatchInput(inputs=batch)
+                    )
+                )
+
+            inputs = [
+                {"id": i, "properties": {"lazada_api": "true"}} for i in range(250)
+            ]
+            report = BatchUpdater(update, backoff_base=0.01).update_all(inputs)
+
+        self.assertEqual(report["updated"], 250)
+        self.assertEqual(report["retries"], 2)
+        self.assertEqual(stub.updated, 250)
+        self.assertSetEqual(
+            {str(item["id"]) for batch in stub.batches for item in batch},
+            {str(i) for i in range(250)},
+        )
+        self.assertEqual(sorted(stub.statuses), [200, 200, 200, 429, 503])
+
+
+class InputCoalescerTestCase(TestCase):
+    def test_add_merges_properties_of_same_id(self):
+        coalescer = InputCoalescer()
+        coalescer.add({"id": 1001, "properties": {"lazada_api": "yes"}})
+        coalescer.add({"id": 1002, "properties": {"shopee_api": "yes"}})
+        coalescer.add(
+            {"id": "1001", "properties": {"lazada_api": "no", "shopee_api": "yes"}}
+        )
+
+        self.assertEqual(
+            coalescer.get_inputs(),
+            [
+                {"id": 1001, "properties": {"lazada_api": "no", "shopee_api": "yes"}},
+                {"id": 1002, "properties": {"shopee_api": "yes"}},
+            ],
+        )
+        self.assertEqual(coalescer.count, 3)
+        self.assertEqual(coalescer.coalesced, 1)
+
+    def test_merge_keeps_later_file_properties(self):
+        first, second = InputCoalescer(), InputCoalescer()
+        first.add({"id": 1001, "properties": {"lazada_api": "yes"}})
+        first.add({"id": 1001, "properties": {"shopee_api": "yes"}})
+        second.add({"id": 1001, "properties": {"lazada_api": "no"}})
+        second.add({"id": 1002, "properties": {"lazada_api": "yes"}})
+
+        first.merge(second)
+
+        self.assertEqual(
+            first.get_inputs(),
+            [
+                {"id": 1001, "properties": {"lazada_api": "no", "shopee_api": "yes"}},
+                {"id": 1002, "properties": {"lazada_api": "yes"}},
+            ],
+        )
+        self.assertEqual(first.count, 4)
+        self.assertEqual(first.coalesced, 2)
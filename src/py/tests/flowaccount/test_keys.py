@@ -0,0 +1,75 @@
+from datetime import date, datetime, time
+from unittest import TestCase
+
+import pandas as pd
+from flowaccount.keys import (DateKeySet, format_date_key, format_time_key,
+                              get_date_keys, get_time_keys)
+
+
+class FormatKeyTestCase(TestCase):
+    def test_format_date_key_succeeds(self):
+        self.assertEqual(format_date_key(date(2022, 3, 8)), 20220308)
+
+    def test_format_time_key_succeeds(self):
+        self.assertEqual(format_time_key(time(0, 5, 8)), 508)
+        self.assertEqual(format_time_key(time(23, 59, 59)), 235959)
+
+
+class GetKeysTestCase(TestCase):
+    def setUp(self):
+        self.timestamps = pd.Series(
+            [
+                datetime(2022, 3, 1, 9, 15, 0),
+                datetime(2024, 2, 29, 23, 59, 59),
+                None,
+                datetime(1969, 12, 31, 0, 0, 1),
+            ],
+            dtype="datetime64[ns]",
+            index=[10, 11, 12, 13],
+        )
+
+    def test_get_date_keys_succeeds(self):
+        result = get_date_keys(self.timestamps)
+        self.assertListEqual(result.tolist(), [20220301, 20240229, pd.NA, 19691231])
+        self.assertListEqual(result.index.tolist(), [10, 11, 12, 13])
+
+    def test_get_time_keys_succeeds(self):
+        result = get_time_keys(self.timestamps)
+        self.assertListEqual(result.tolist(), [91500, 235959, pd.NA, 1])
+
+    def test_get_keys_of_aware_timestamps_succeeds(self):
+        timestamps = pd.Series(
+            pd.to_datetime(["2022-03-01 06:30:00+07:00"]),
+        )
+        self.assertListEqual(get_date_keys(timestamps).tolist(), [20220228])
+        self.assertListEqual(get_time_keys(timestamps).tolist(), [233000])
+
+
+class DateKeySetTestCase(TestCase):
+    def setUp(self):
+        self.dim_keys = [20220301, 20220302, 20220303]
+        self.after_keys = []
+
+    def fetch(self, after_key):
+        self.after_keys.append(after_key)
+        return pd.Series([key for key in self.dim_keys if key > after_key])
+
+    def test_validate_keys_succeeds(self):
+        key_set = DateKeySet()
+        date_keys = pd.Series([20220302, 20220228, None, 20220303], dtype="Int64")
+
+        result = key_set.is_valid(date_keys, self.fetch)
+
+        self.assertListEqual(result.tolist(), [True, False, False, True])
+        self.assertListEqual(self.after_keys, [0])
+
+    def test_refresh_later_keys_succeeds(self):
+        key_set = DateKeySet()
+        key_set.is_valid(pd.Series([20220301]), self.fetch)
+        key_set.is_valid(pd.Series([20220302]), self.fetch)
+        self.dim_keys.append(20220304)
+
+        result = key_set.is_valid(pd.Series([20220304, 20220305]), self.fetch)
+
+        self.assertListEqual(result.tolist(), [True, False])
+        self.assertListEqual(self.after_keys, [0, 20220303])
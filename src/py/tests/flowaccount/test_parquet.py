@@ -0,0 +1,60 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+import pandas.testing as pdtest
+import pyarrow.parquet as pq
+from flowaccount.parquet import PartitionedParquetWriter
+
+
+class PartitionedParquetWriterTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_chunks_as_row_groups_succeeds(self):
+        writer = PartitionedParquetWriter(self.root, ["year", "month"])
+        writer.write(pd.DataFrame({"year": [2022, 2022], "month": [2, 3], "v": [1, 2]}))
+        writer.write(pd.DataFrame({"year": [2022], "month": [2], "v": [3]}))
+        files = writer.close()
+
+        self.assertEqual(writer.row_count, 3)
+        self.assertListEqual(sorted(files.values()), [["2022", "2"], ["2022", "3"]])
+        path = next(p for p, v in files.items() if v == ["2022", "2"])
+        self.assertTrue(path.startswith("year=2022/month=2/"))
+
+        parquet_file = pq.ParquetFile(os.path.join(self.root, path))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        pdtest.assert_frame_equal(
+            parquet_file.read().to_pandas(), pd.DataFrame({"v": [1, 3]})
+        )
+
+    def test_start_new_file_on_schema_change_succeeds(self):
+        writer = PartitionedParquetWriter(self.root, ["year"])
+        writer.write(pd.DataFrame({"year": [2022], "v": [1]}))
+        writer.write(pd.DataFrame({"year": [2022], "v": [2], "extra": ["a"]}))
+        files = writer.close()
+
+        self.assertEqual(len(files), 2)
+        columns = sorted(
+            tuple(pq.read_schema(os.path.join(self.root, path)).names) for path in files
+        )
+        self.assertListEqual(columns, [("v",), ("v", "extra")])
+
+    def test_reuse_file_with_same_schema_succeeds(self):
+        writer = PartitionedParquetWriter(self.root, ["year"])
+        writer.write(pd.DataFrame({"year": [2022], "v": [1]}))
+        writer.write(pd.DataFrame({"year": [2022], "v": [2], "extra": ["a"]}))
+        writer.write(pd.DataFrame({"year": [2022], "v": [3]}))
+        files = writer.close()
+
+        self.assertEqual(len(files), 2)
+        row_counts = sorted(
+            pq.ParquetFile(os.path.join(self.root, path)).metadata.num_rows
+            for path in files
+        )
+        self.assertListEqual(row_counts, [1, 2])
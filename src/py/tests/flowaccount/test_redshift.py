@@ -0,0 +1,327 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import awswrangler as wr
+import boto3
+import pandas as pd
+from flowaccount.redshift import (PostgresTableLoader, RedShiftSession,
+                                  TableLoader, read_sql_by_keys)
+from moto import mock_aws
+from redshift_connector import InterfaceError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if not self.conn.alive:
+            raise InterfaceError("connection is closed")
+
+    def fetchall(self):
+        return [[1]]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class RedShiftSessionTestCase(TestCase):
+    def setUp(self):
+        self.connections = []
+        self.session = RedShiftSession(self.connect, check_after=0)
+
+    def connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def test_reuse_connection_succeeds(self):
+        with self.session.transaction() as conn:
+            pass
+        with self.session.transaction() as next_conn:
+            pass
+
+        self.assertIs(conn, next_conn)
+        self.assertEqual(self.session.connects, 1)
+        self.assertEqual(conn.commits, 2)
+
+    def test_reconnect_broken_connection_succeeds(self):
+        conn = self.session.connection()
+        conn.alive = False
+
+        self.assertIsNot(self.session.connection(), conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.session.connects, 2)
+
+    def test_rollback_on_error_fails(self):
+        with self.assertRaises(ValueError):
+            with self.session.transaction() as conn:
+                raise ValueError("bad record")
+
+        self.assertEqual(conn.commits, 0)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(self.session.conn, conn)
+
+    def test_close_on_connection_error_fails(self):
+        with self.assertRaises(InterfaceError):
+            with self.session.transaction() as conn:
+                raise InterfaceError("network error")
+
+        self.assertTrue(conn.closed)
+        self.assertIsNone(self.session.conn)
+
+
+class TableLoaderTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket="clean")
+        self.loader = TableLoader(
+            staging_path="s3://clean/redshift/staging/",
+            iam_role="arn:aws:iam::1:role/copy",
+            copy_min_rows=3,
+        )
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def test_choose_method_succeeds(self):
+        self.assertEqual(
+            self.loader.choose_method(pd.DataFrame({"a": [1, 2]})), "insert"
+        )
+        self.assertEqual(
+            self.loader.choose_method(pd.DataFrame({"a": [1, 2, 3]})), "copy"
+        )
+
+        loader = TableLoader(copy_min_rows=0)
+        self.assertEqual(loader.choose_method(pd.DataFrame({"a": [1, 2, 3]})), "insert")
+
+    @patch("awswrangler.redshift.to_sql", autospec=True)
+    def test_insert_small_frame_succeeds(self, to_sql):
+        df = pd.DataFrame({"a": [1]})
+        method = self.loader.load(df, None, "fact", "t", commit_transaction=False)
+
+        self.assertEqual(method, "insert")
+        self.assertFalse(to_sql.call_args.kwargs["commit_transaction"])
+        self.assertDictEqual(self.loader.stats(), {"insert": 1, "copy": 0})
+
+    # Mocks keep the signatures of the installed awswrangler, so arguments
+    # it does not take fail here rather than in Lambda
+    @patch("awswrangler.redshift.copy_from_files", autospec=True)
+    def test_copy_in_table_column_order_succeeds(self, copy_from_files):
+        staged = []
+        copy_from_files.side_effect = lambda path, **kwargs: staged.append(
+            wr.s3.read_parquet(path)
+        )
+        df = pd.DataFrame({"b": ["x", "y", "z"], "a": [1, 2, 3]})
+
+        with patch.object(self.loader, "get_table_columns", return_value=["a", "b"]):
+            method = self.loader.load(df, None, "fact", "t", commit_transaction=False)
+
+        self.assertEqual(method, "copy")
+        self.assertListEqual(staged[0].columns.tolist(), ["a", "b"])
+        self.assertFalse(copy_from_files.call_args.kwargs["commit_transaction"])
+        self.assertDictEqual(self.loader.stats(), {"insert": 0, "copy": 1})
+
+    @patch("awswrangler.redshift.to_sql", autospec=True)
+    @patch("awswrangler.redshift.copy_from_files", autospec=True)
+    def test_insert_frame_without_every_column_succeeds(self, copy_from_files, to_sql):
+        df = pd.DataFrame({"a": [1, 2, 3]})
+
+        with patch.object(self.loader, "get_table_columns", return_value=["key", "a"]):
+            method = self.loader.load(df, None, "dim", "t")
+
+        self.assertEqual(method, "insert")
+        copy_from_files.assert_not_called()
+        to_sql.assert_called_once()
+
+    @patch("awswrangler.redshift.copy_from_files", autospec=True)
+    def test_copy_cleans_staged_files_fails(self, copy_from_files):
+        copy_from_files.side_effect = InterfaceError("COPY failed")
+        df = pd.DataFrame({"a": [1, 2, 3]})
+
+        with patch.object(self.loader, "get_table_columns", return_value=["a"]):
+            with self.assertRaises(InterfaceError):
+                self.loader.load(df, None, "fact", "t")
+
+        self.assertTrue(
+            copy_from_files.call_args.kwargs["path"].startswith(
+                "s3://clean/redshift/staging/fact.t/"
+            )
+        )
+        response = self.s3.list_objects_v2(Bucket="clean")
+        self.assertEqual(response["KeyCount"], 0)
+
+
+class FakePostgresCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql, stream=None):
+        self.statements.append((sql, stream.read()))
+
+    def close(self):
+        pass
+
+
+class FakePostgresConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakePostgresCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+
+class PostgresTableLoaderTestCase(TestCase):
+    def test_copy_from_staged_csv_succeeds(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            loader = PostgresTableLoader(staging_dir=tmp_dir, copy_min_rows=2)
+            conn = FakePostgresConnection()
+            df = pd.DataFrame({"company_key": [1, 2], "platform": ["Lazada", "Shopee"]})
+
+            method = loader.load(df, conn, "fact", "t")
+
+            self.assertEqual(method, "copy")
+            self.assertListEqual(
+                conn.statements,
+                [
+                    (
+                        'COPY fact.t ("company_key", "platform")'
+                        " FROM STDIN WITH (FORMAT csv)",
+                        b"1,Lazada\n2,Shopee\n",
+                    )
+                ],
+            )
+            self.assertEqual(conn.commits, 1)
+            self.assertListEqual(os.listdir(os.path.join(tmp_dir, "fact.t")), [])
+
+    def test_upsert_fails(self):
+        with self.assertRaises(ValueError):
+            PostgresTableLoader().load(pd.DataFrame(), None, "fact", "t", mode="upsert")
+
+
+class FakeSqlCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def close(self):
+        pass
+
+
+class FakeSqlConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeSqlCursor(self.statements)
+
+    def rollback(self):
+        self.statements.append(("ROLLBACK", None))
+
+
+class ReadSqlByKeysTestCase(TestCase):
+    def setUp(self):
+        self.conn = FakeSqlConnection()
+
+    def read_sql_query(self, sql, con, params=None):
+        con.statements.append((sql, params))
+        return pd.DataFrame({"id": params or []})
+
+    def test_bind_keys_in_chunks_succeeds(self):
+        with patch("awswrangler.redshift.read_sql_query", self.read_sql_query):
+            result = read_sql_by_keys(
+                "SELECT id FROM t", "id", [1, 2, 3, 2], self.conn, chunk_size=2
+            )
+
+        self.assertListEqual(result["id"].tolist(), [1, 2, 3])
+        self.assertListEqual(
+            self.conn.statements,
+            [
+                ("SELECT id FROM t WHERE id IN (%s, %s)", [1, 2]),
+                ("SELECT id FROM t WHERE id IN (%s)", [3]),
+            ],
+        )
+
+    def test_join_temp_table_succeeds(self):
+        with patch("awswrangler.redshift.read_sql_query", self.read_sql_query):
+            read_sql_by_keys(
+                "SELECT id FROM t",
+                "id",
+                pd.Series([1, 2, 3]),
+                self.conn,
+                chunk_size=2,
+                temp_table_min_keys=3,
+            )
+
+        statements = [sql.split(" lookup_keys_")[0] for sql, _ in self.conn.statements]
+        self.assertListEqual(
+            statements,
+            [
+                "CREATE TEMP TABLE",
+                "INSERT INTO",
+                "INSERT INTO",
+                "SELECT id FROM t JOIN",
+                "DROP TABLE IF EXISTS",
+            ],
+        )
+        self.assertListEqual(
+            [params for _, params in self.conn.statements[1:3]], [[1, 2], [3]]
+        )
+        self.assertIsInstance(self.conn.statements[1][1][0], int)
+
+    def test_rollback_temp_table_on_error_fails(self):
+        def read_sql_query(sql, con, params=None):
+            raise ValueError("query failed")
+
+        with patch("awswrangler.redshift.read_sql_query", read_sql_query):
+            with self.assertRaisesRegex(ValueError, "query failed"):
+                read_sql_by_keys(
+                    "SELECT id FROM t",
+                    "id",
+                    [1, 2, 3],
+                    self.conn,
+                    temp_table_min_keys=3,
+                )
+
+        self.assertEqual(self.conn.statements[-1], ("ROLLBACK", None))
+        self.assertNotIn("DROP", " ".join(sql for sql, _ in self.conn.statements))
+
+    def test_no_keys_succeeds(self):
+        with patch("awswrangler.redshift.read_sql_query", self.read_sql_query):
+            result = read_sql_by_keys("SELECT id FROM t", "id", [], self.conn)
+
+        self.assertEqual(result.shape[0], 0)
+        self.assertEqual(self.conn.statements[0][0], "SELECT id FROM t WHERE 1 = 0")
@@ -1,6 +1,15 @@
+import base64
+import hashlib
+import io
 from unittest import TestCase
 
-from flowaccount.utils import format_snake_case
+import boto3
+import pandas as pd
+from flowaccount.utils import (MIN_PART_SIZE, ChecksumReader,
+                               ColumnNameTranslator, MultipartUploadWriter,
+                               chunked, column_names, format_snake_case,
+                               iter_lines, map_concurrently)
+from moto import mock_aws
 
 
 class FormatSnakeCaseTestCase(TestCase):
@@ -9,3 +18,116 @@ class FormatSnakeCaseTestCase(TestCase):
         expected = "manifest_files_s3_key"
         result = format_snake_case(data)
         self.assertEqual(result, expected)
+
+
+class ChunkedTestCase(TestCase):
+    def test_split_with_remainder_succeeds(self):
+        result = list(chunked(range(5), 2))
+        self.assertListEqual(result, [[0, 1], [2, 3], [4]])
+
+    def test_split_empty_succeeds(self):
+        self.assertListEqual(list(chunked([], 2)), [])
+
+
+class ColumnNameTranslatorTestCase(TestCase):
+    def test_translate_succeeds(self):
+        translator = ColumnNameTranslator()
+        self.assertEqual(
+            translator.translate("manifestFilesS3Key"), "manifest_files_s3_key"
+        )
+        self.assertEqual(translator.translate("SizeBytes"), "size_bytes")
+
+    def test_strip_dynamodb_type_suffix_succeeds(self):
+        translator = ColumnNameTranslator()
+        self.assertEqual(translator.translate("companyId.N"), "company_id")
+        self.assertEqual(
+            translator.translate("platformInfo.M.shopName.S"),
+            "platform_info._m.shop_name",
+        )
+
+    def test_known_names_succeeds(self):
+        translator = ColumnNameTranslator({"eventID": "event_id", "shopId": None})
+        self.assertDictEqual(
+            translator.table, {"eventID": "event_id", "shopId": "shop_id"}
+        )
+        self.assertEqual(translator.translate("eventID"), "event_id")
+
+    def test_translate_columns_succeeds(self):
+        columns = pd.Index(["companyId.N", "isDelete.BOOL", "createon"])
+        result = column_names.translate_columns(columns)
+        self.assertListEqual(result, ["company_id", "is_delete", "created_on"])
+
+
+class MapConcurrentlyTestCase(TestCase):
+    def test_keep_order_succeeds(self):
+        result = map_concurrently(lambda x: x * 2, range(20), max_workers=4)
+        self.assertListEqual(result, [x * 2 for x in range(20)])
+
+
+class ChecksumReaderTestCase(TestCase):
+    def test_checksum_read_bytes_succeeds(self):
+        data = b"0123456789" * 100
+        reader = ChecksumReader(io.BytesIO(data))
+        self.assertEqual(reader.read(10), b"0123456789")
+        reader.drain(chunk_size=64)
+
+        expected = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+        self.assertEqual(reader.b64digest(), expected)
+        self.assertEqual(reader.size, len(data))
+
+
+class MultipartUploadWriterTestCase(TestCase):
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket="test-bucket")
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def read(self, key: str) -> bytes:
+        return self.s3.get_object(Bucket="test-bucket", Key=key)["Body"].read()
+
+    def test_write_parts_succeeds(self):
+        data = bytes(range(256)) * (MIN_PART_SIZE // 256 * 2 + 1)
+        with MultipartUploadWriter(
+            self.s3, "test-bucket", "parts.bin", part_size=MIN_PART_SIZE
+        ) as writer:
+            for start in range(0, len(data), 1024 * 1024):
+                writer.write(data[start : start + 1024 * 1024])
+
+        self.assertEqual(len(writer.parts), 3)
+        self.assertEqual(writer.size, len(data))
+        self.assertEqual(self.read("parts.bin"), data)
+
+    def test_write_small_object_succeeds(self):
+        with MultipartUploadWriter(self.s3, "test-bucket", "small.bin") as writer:
+            writer.write(b"small")
+
+        self.assertIsNone(writer.upload_id)
+        self.assertEqual(self.read("small.bin"), b"small")
+
+    def test_abort_on_error_succeeds(self):
+        with self.assertRaises(RuntimeError):
+            with MultipartUploadWriter(
+                self.s3, "test-bucket", "failed.bin", part_size=MIN_PART_SIZE
+            ) as writer:
+                writer.write(b"0" * MIN_PART_SIZE)
+                raise RuntimeError("Failed to produce bytes")
+
+        uploads = self.s3.list_multipart_uploads(Bucket="test-bucket")
+        self.assertEqual(uploads.get("Uploads", []), [])
+        objects = self.s3.list_objects_v2(Bucket="test-bucket")
+        self.assertEqual(objects["KeyCount"], 0)
+
+
+class IterLinesTestCase(TestCase):
+    def test_split_lines_across_chunks_succeeds(self):
+        data = b'{"id": 1}\n{"id": 22}\n\n{"id": 333}\n'
+        result = list(iter_lines(io.BytesIO(data), chunk_size=4))
+        self.assertListEqual(result, [b'{"id": 1}', b'{"id": 22}', b'{"id": 333}'])
+
+    def test_last_line_without_newline_succeeds(self):
+        result = list(iter_lines(io.BytesIO(b"a\nb"), chunk_size=1024))
+        self.assertListEqual(result, [b"a", b"b"])